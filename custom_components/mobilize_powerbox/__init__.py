@@ -1,24 +1,99 @@
 """Intégration Mobilize PowerBox pour Home Assistant."""
 from __future__ import annotations
 
+from datetime import timedelta
 import logging
 import requests
 
+from homeassistant.components import mqtt
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, CONF_USERNAME, CONF_PASSWORD, CONF_NAME, Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.storage import Store
 
 from .const import (
     DOMAIN,
     DATA_COORDINATOR,
     DATA_DEVICE_INFO,
     DATA_UNDO_UPDATE_LISTENER,
+    DATA_APPLIED_OPTIONS,
     CONF_VERIFY_SSL,
+    CONF_PRICE_HP,
+    CONF_PRICE_HC,
+    CONF_SCAN_INTERVAL_REALTIME,
+    CONF_SCAN_INTERVAL_CONFIG,
+    CONF_TIMEOUT,
+    CONF_MAX_RETRIES,
+    CONF_MAX_STALE_AGE,
+    CONF_METRICS_ENABLED,
+    CONF_STATISTICS_IMPORT,
+    CONF_PUBLISH_MODE,
+    CONF_PUBLISH_TOPIC,
+    CONF_SITE_POWER_LIMIT,
+    CONF_SCHEDULE_ENABLED,
+    CONF_SCHEDULE_WINDOWS,
+    CONF_SCHEDULE_CURRENT,
+    CONF_SCHEDULE_IDLE_CURRENT,
+    CONF_SCHEDULE_TARGET_KWH,
+    CONF_FLEET_ENABLED,
+    CONF_FLEET_WEIGHT,
+    CONF_SITE_METER,
+    CONF_ETA_TARGET_KWH,
+    DATA_PUBLISHER,
+    DATA_SCHEDULER,
+    DATA_STATISTICS,
+    DEFAULT_PRICE_HP,
+    DEFAULT_PRICE_HC,
+    DEFAULT_SCAN_INTERVAL_REALTIME,
+    DEFAULT_SCAN_INTERVAL_CONFIG,
+    DEFAULT_TIMEOUT,
+    DEFAULT_MAX_STALE_AGE,
+    DEFAULT_METRICS_ENABLED,
+    DEFAULT_STATISTICS_IMPORT,
+    DEFAULT_PUBLISH_TOPIC,
+    DEFAULT_SITE_POWER_LIMIT,
+    DEFAULT_SCHEDULE_ENABLED,
+    DEFAULT_SCHEDULE_WINDOWS,
+    DEFAULT_SCHEDULE_CURRENT,
+    DEFAULT_SCHEDULE_IDLE_CURRENT,
+    DEFAULT_SCHEDULE_TARGET_KWH,
+    DEFAULT_FLEET_ENABLED,
+    DEFAULT_FLEET_WEIGHT,
+    DEFAULT_SITE_METER,
+    DEFAULT_ETA_TARGET_KWH,
+    DEFAULT_NAME,
+    LIVE_OPTIONS,
+    OPTION_DEFAULTS,
+    PUBLISH_MODE_MQTT,
+    PUBLISH_MODE_NONE,
+    PUBLISH_MODE_SSE,
+    MAX_RETRIES,
     INTEGRATION_MANUFACTURER,
+    LEGACY_UNIQUE_ID_PREFIX,
+    SITE_UNIQUE_ID_PREFIX,
     INTEGRATION_MODEL,
+    STORAGE_KEY_SCHEMA,
+    STORAGE_KEY_STATISTICS,
+    STORAGE_KEY_TARIFF,
+    STORAGE_KEY_TOKENS,
+    STORAGE_VERSION,
+    TARIFF_PERIOD_HP,
+    TARIFF_PERIOD_HC,
 )
-from .coordinator import PowerBoxAPIClient, PowerBoxRealtimeCoordinator, PowerBoxConfigCoordinator
+from .api import PowerBoxAPIClient
+from .energy_statistics import EnergyStatisticsImporter
+from .coordinator import PowerBoxRealtimeCoordinator, PowerBoxConfigCoordinator, PowerBoxTokensCoordinator
+from .aggregate import get_site_aggregator
+from .charge_schedule import parse_windows
+from .charge_scheduler import ChargeScheduler
+from .fleet_allocator import get_fleet_allocator
+from .metrics import async_register_metrics_view
+from .publisher import SnapshotPublisher, async_register_stream_view
+from .schema import device_metadata
+from .services import async_setup_services, async_unload_services
+from .websocket_api import async_register_websocket_api
 
 # Désactiver les avertissements SSL
 requests.packages.urllib3.disable_warnings(
@@ -27,7 +102,53 @@ requests.packages.urllib3.disable_warnings(
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.SENSOR]
+PLATFORMS = [Platform.BINARY_SENSOR, Platform.SENSOR]
+
+
+def _get_option(entry: ConfigEntry, key: str, default):
+    """Retourne une option, avec repli sur la configuration initiale."""
+    return entry.options.get(key, entry.data.get(key, default))
+
+
+def _effective_options(entry: ConfigEntry) -> dict:
+    """Valeurs effectives des options (options, configuration initiale, défauts)."""
+    defaults = {CONF_NAME: DEFAULT_NAME, **OPTION_DEFAULTS}
+    return {
+        key: _get_option(entry, key, defaults.get(key))
+        for key in set(defaults) | set(entry.options)
+    }
+
+
+def _tariff_prices(entry: ConfigEntry) -> dict[str, float]:
+    """Prix du kWh par période tarifaire."""
+    return {
+        TARIFF_PERIOD_HP: _get_option(entry, CONF_PRICE_HP, DEFAULT_PRICE_HP),
+        TARIFF_PERIOD_HC: _get_option(entry, CONF_PRICE_HC, DEFAULT_PRICE_HC),
+    }
+
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Migre une entrée d'une version précédente."""
+    if entry.version > 2:
+        return False
+    
+    if entry.version == 1:
+        # Identifiants d'entités fixes (``powerbox_power``) : en collision dès la
+        # deuxième borne, ils sont préfixés par l'identifiant de l'entrée
+        @callback
+        def _migrate_unique_id(entity_entry: er.RegistryEntry) -> dict | None:
+            unique_id = entity_entry.unique_id
+            if not unique_id.startswith(LEGACY_UNIQUE_ID_PREFIX) or unique_id.startswith(SITE_UNIQUE_ID_PREFIX):
+                return None
+            new_unique_id = f"{entry.entry_id}_{unique_id.removeprefix(LEGACY_UNIQUE_ID_PREFIX)}"
+            _LOGGER.debug("Migration de l'entité %s: %s -> %s", entity_entry.entity_id, unique_id, new_unique_id)
+            return {"new_unique_id": new_unique_id}
+        
+        await er.async_migrate_entries(hass, entry.entry_id, _migrate_unique_id)
+        hass.config_entries.async_update_entry(entry, version=2)
+        _LOGGER.info("Entrée %s migrée en version 2 (identifiants d'entités par borne)", entry.title)
+    
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -37,8 +158,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     host = entry.data[CONF_HOST]
     username = entry.data[CONF_USERNAME]
     password = entry.data[CONF_PASSWORD]
-    verify_ssl = entry.data.get(CONF_VERIFY_SSL, False)
-    name = entry.data.get(CONF_NAME, "PowerBox Verso")
+    verify_ssl = _get_option(entry, CONF_VERIFY_SSL, False)
+    name = _get_option(entry, CONF_NAME, "PowerBox Verso")
     
     base_url = f"https://{host}/v1.0"
     
@@ -46,22 +167,52 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     # Créer le client API partagé
     api_client = PowerBoxAPIClient(base_url, username, password, verify_ssl)
+    api_client.configure(
+        _get_option(entry, CONF_TIMEOUT, DEFAULT_TIMEOUT),
+        _get_option(entry, CONF_MAX_RETRIES, MAX_RETRIES),
+    )
     
     # Créer les coordinateurs (temps réel + configuration)
-    coordinator_realtime = PowerBoxRealtimeCoordinator(hass, api_client)
-    coordinator_config = PowerBoxConfigCoordinator(hass, api_client)
+    coordinator_realtime = PowerBoxRealtimeCoordinator(
+        hass,
+        api_client,
+        timedelta(seconds=_get_option(entry, CONF_SCAN_INTERVAL_REALTIME, DEFAULT_SCAN_INTERVAL_REALTIME)),
+        _get_option(entry, CONF_MAX_STALE_AGE, DEFAULT_MAX_STALE_AGE),
+    )
+    coordinator_realtime.eta.target_wh = (
+        _get_option(entry, CONF_ETA_TARGET_KWH, DEFAULT_ETA_TARGET_KWH) * 1000
+    )
+    coordinator_config = PowerBoxConfigCoordinator(
+        hass,
+        api_client,
+        timedelta(seconds=_get_option(entry, CONF_SCAN_INTERVAL_CONFIG, DEFAULT_SCAN_INTERVAL_CONFIG)),
+    )
+    
+    # Restaurer les cumuls tarifaires avant la première mesure
+    await coordinator_realtime.async_load_tariff(entry.entry_id, _tariff_prices(entry))
     
     # Faire les premières mises à jour
     await coordinator_realtime.async_config_entry_first_refresh()
     await coordinator_config.async_config_entry_first_refresh()
     
-    # Informations sur l'appareil
+    # Schéma des paramètres (en cache, redécouvert seulement si le firmware change)
+    await coordinator_config.async_load_schema(entry.entry_id)
+    
+    # Badges : inventaire en cache, synchronisé rarement (non bloquant si /tokens est absent)
+    coordinator_tokens = PowerBoxTokensCoordinator(hass, api_client, coordinator_realtime)
+    await coordinator_tokens.async_load(entry.entry_id)
+    await coordinator_tokens.async_refresh()
+    coordinator_tokens.async_start()
+    
+    # Informations sur l'appareil (firmware et matériel annoncés par la borne)
+    metadata = device_metadata(coordinator_config.data.configs or {})
     device_info = DeviceInfo(
         identifiers={(DOMAIN, host)},
         name=name,
         manufacturer=INTEGRATION_MANUFACTURER,
-        model=INTEGRATION_MODEL,
-        sw_version="1.0.0",
+        model=metadata.get("model", INTEGRATION_MODEL),
+        sw_version=metadata.get("sw_version"),
+        hw_version=metadata.get("hw_version"),
         configuration_url=f"https://{host}",
     )
     
@@ -71,20 +222,119 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         DATA_COORDINATOR: coordinator_realtime,  # Pour compatibilité
         "coordinator_realtime": coordinator_realtime,
         "coordinator_config": coordinator_config,
+        "coordinator_tokens": coordinator_tokens,
         "api_client": api_client,
         DATA_DEVICE_INFO: device_info,
+        DATA_APPLIED_OPTIONS: _effective_options(entry),
     }
     
+    # Agrégats de site (capteurs créés dès qu'une deuxième PowerBox est chargée)
+    get_site_aggregator(hass).async_add_box(
+        entry.entry_id,
+        coordinator_realtime,
+        _get_option(entry, CONF_SITE_POWER_LIMIT, DEFAULT_SITE_POWER_LIMIT),
+    )
+    
+    # Planification de la charge (créée avant les plateformes pour son capteur)
+    scheduler = _create_scheduler(hass, entry)
+    if scheduler is not None:
+        hass.data[DOMAIN][entry.entry_id][DATA_SCHEDULER] = scheduler
+    
+    # Répartition du courant entre les bornes du site (avant les plateformes pour son capteur)
+    if _get_option(entry, CONF_FLEET_ENABLED, DEFAULT_FLEET_ENABLED):
+        get_fleet_allocator(hass).async_add_box(
+            entry.entry_id,
+            coordinator_realtime,
+            coordinator_config,
+            _get_option(entry, CONF_FLEET_WEIGHT, DEFAULT_FLEET_WEIGHT),
+            _get_option(entry, CONF_SITE_METER, DEFAULT_SITE_METER),
+            scheduler,
+        )
+    
     # Charger les plateformes
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
+    if scheduler is not None:
+        scheduler.async_start()
+    
+    # Enregistrer les services (une seule fois pour toutes les PowerBox)
+    async_setup_services(hass)
+    
+    # Courbes récentes pour les cartes (API websocket, depuis la mémoire)
+    async_register_websocket_api(hass)
+    
+    # Export OpenMetrics optionnel (servi depuis le cache des coordinateurs)
+    if _get_option(entry, CONF_METRICS_ENABLED, DEFAULT_METRICS_ENABLED):
+        async_register_metrics_view(hass)
+    
+    # Statistiques horaires d'énergie importées directement dans le recorder
+    if _get_option(entry, CONF_STATISTICS_IMPORT, DEFAULT_STATISTICS_IMPORT):
+        if "recorder" in hass.config.components:
+            statistics = EnergyStatisticsImporter(hass, coordinator_realtime, host, name)
+            await statistics.async_start(entry.entry_id)
+            hass.data[DOMAIN][entry.entry_id][DATA_STATISTICS] = statistics
+        else:
+            _LOGGER.warning("Recorder non chargé, import des statistiques d'énergie désactivé")
+    
+    # Diffusion optionnelle des instantanés (MQTT ou SSE)
+    await _async_setup_publisher(hass, entry)
+    
     # Écouter les mises à jour d'options
-    undo_listener = entry.add_update_listener(async_reload_entry)
+    undo_listener = entry.add_update_listener(async_update_options)
     hass.data[DOMAIN][entry.entry_id][DATA_UNDO_UPDATE_LISTENER] = undo_listener
     
     return True
 
 
+def _create_scheduler(hass: HomeAssistant, entry: ConfigEntry) -> ChargeScheduler | None:
+    """Crée le planificateur de charge s'il est activé et ses plages valides."""
+    if not _get_option(entry, CONF_SCHEDULE_ENABLED, DEFAULT_SCHEDULE_ENABLED):
+        return None
+    
+    try:
+        windows = parse_windows(_get_option(entry, CONF_SCHEDULE_WINDOWS, DEFAULT_SCHEDULE_WINDOWS))
+    except ValueError as err:
+        _LOGGER.error("Plages de charge invalides, planification désactivée: %s", err)
+        return None
+    
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    return ChargeScheduler(
+        hass,
+        entry_data["coordinator_realtime"],
+        entry_data["coordinator_config"],
+        windows,
+        _get_option(entry, CONF_SCHEDULE_CURRENT, DEFAULT_SCHEDULE_CURRENT),
+        _get_option(entry, CONF_SCHEDULE_IDLE_CURRENT, DEFAULT_SCHEDULE_IDLE_CURRENT),
+        _get_option(entry, CONF_SCHEDULE_TARGET_KWH, DEFAULT_SCHEDULE_TARGET_KWH),
+    )
+
+
+async def _async_setup_publisher(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Démarre la diffusion des instantanés si elle est activée."""
+    mode = _get_option(entry, CONF_PUBLISH_MODE, PUBLISH_MODE_NONE)
+    if mode == PUBLISH_MODE_NONE:
+        return
+    
+    if mode == PUBLISH_MODE_MQTT and not await mqtt.async_wait_for_mqtt_client(hass):
+        _LOGGER.error("MQTT n'est pas disponible, diffusion des instantanés désactivée")
+        return
+    
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    publisher = SnapshotPublisher(
+        hass,
+        entry_data["coordinator_realtime"],
+        entry_data["coordinator_config"],
+        mode,
+        _get_option(entry, CONF_PUBLISH_TOPIC, DEFAULT_PUBLISH_TOPIC),
+        entry.data[CONF_HOST],
+    )
+    publisher.async_start()
+    entry_data[DATA_PUBLISHER] = publisher
+    
+    if mode == PUBLISH_MODE_SSE:
+        async_register_stream_view(hass)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     # Supprimer le listener
@@ -96,16 +346,100 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     
     if unload_ok:
-        # Fermer proprement la session HTTP
+        # Arrêter la diffusion des instantanés
+        publisher = hass.data[DOMAIN][entry.entry_id].get(DATA_PUBLISHER)
+        if publisher:
+            publisher.async_stop()
+        
+        # Annuler le minuteur de la planification de charge
+        scheduler = hass.data[DOMAIN][entry.entry_id].get(DATA_SCHEDULER)
+        if scheduler:
+            scheduler.async_stop()
+        
+        # Retirer la borne de la flotte et des agrégats de site
+        get_fleet_allocator(hass).async_remove_box(entry.entry_id)
+        get_site_aggregator(hass).async_remove_box(entry.entry_id)
+        
+        # Sauvegarder les cumuls tarifaires
+        await hass.data[DOMAIN][entry.entry_id]["coordinator_realtime"].async_save_tariff()
+        
+        # Sauvegarder l'heure en cours des statistiques d'énergie
+        statistics = hass.data[DOMAIN][entry.entry_id].get(DATA_STATISTICS)
+        if statistics:
+            await statistics.async_stop()
+        
+        # Arrêter le suivi des sessions et sauvegarder les cumuls par badge
+        coordinator_tokens = hass.data[DOMAIN][entry.entry_id]["coordinator_tokens"]
+        coordinator_tokens.async_stop()
+        await coordinator_tokens.async_save()
+        
+        # Fermer la session HTTP sans attendre les requêtes en cours
         api_client = hass.data[DOMAIN][entry.entry_id].get("api_client")
         if api_client:
-            await hass.async_add_executor_job(api_client.close)
+            api_client.shutdown()
         
         hass.data[DOMAIN].pop(entry.entry_id)
+        async_unload_services(hass)
     
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Supprime les données persistantes d'une entrée supprimée."""
+    await Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_TARIFF}.{entry.entry_id}").async_remove()
+    await Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_SCHEMA}.{entry.entry_id}").async_remove()
+    await Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_TOKENS}.{entry.entry_id}").async_remove()
+    await Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_STATISTICS}.{entry.entry_id}").async_remove()
+
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Applique les options à chaud, ou recharge l'entrée si nécessaire."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    previous = entry_data[DATA_APPLIED_OPTIONS]
+    current = _effective_options(entry)
+    changed = {
+        key
+        for key in set(previous) | set(current)
+        if previous.get(key) != current.get(key)
+    }
+    
+    if not changed <= LIVE_OPTIONS:
+        _LOGGER.info("Options modifiées (%s), rechargement de l'entrée", ", ".join(sorted(changed)))
+        await async_reload_entry(hass, entry)
+        return
+    
+    entry_data["api_client"].configure(
+        _get_option(entry, CONF_TIMEOUT, DEFAULT_TIMEOUT),
+        _get_option(entry, CONF_MAX_RETRIES, MAX_RETRIES),
+    )
+    entry_data["coordinator_realtime"].set_scan_interval(
+        timedelta(seconds=_get_option(entry, CONF_SCAN_INTERVAL_REALTIME, DEFAULT_SCAN_INTERVAL_REALTIME))
+    )
+    if CONF_SCAN_INTERVAL_REALTIME in changed:
+        # Le rafraîchissement déjà planifié suit l'ancien intervalle : on relance
+        # la planification tout de suite
+        await entry_data["coordinator_realtime"].async_request_refresh()
+    entry_data["coordinator_realtime"].stale.max_age = _get_option(
+        entry, CONF_MAX_STALE_AGE, DEFAULT_MAX_STALE_AGE
+    )
+    entry_data["coordinator_realtime"].eta.target_wh = (
+        _get_option(entry, CONF_ETA_TARGET_KWH, DEFAULT_ETA_TARGET_KWH) * 1000
+    )
+    entry_data["coordinator_config"].update_interval = timedelta(
+        seconds=_get_option(entry, CONF_SCAN_INTERVAL_CONFIG, DEFAULT_SCAN_INTERVAL_CONFIG)
+    )
+    if CONF_SCAN_INTERVAL_CONFIG in changed:
+        await entry_data["coordinator_config"].async_request_refresh()
+    get_site_aggregator(hass).async_set_site_limit(
+        entry.entry_id, _get_option(entry, CONF_SITE_POWER_LIMIT, DEFAULT_SITE_POWER_LIMIT)
+    )
+    if entry_data["coordinator_realtime"].tariff is not None:
+        entry_data["coordinator_realtime"].tariff.prices = _tariff_prices(entry)
+    
+    entry_data[DATA_APPLIED_OPTIONS] = current
+    _LOGGER.info("Options appliquées sans rechargement: %s", ", ".join(sorted(changed)))
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload config entry."""
     await async_unload_entry(hass, entry)
@@ -0,0 +1,150 @@
+"""Agrégats de site sur plusieurs PowerBox.
+
+Les totaux sont maintenus incrémentalement : à chaque mise à jour d'une
+borne, son ancienne contribution est retirée et la nouvelle ajoutée, sans
+reparcourir les autres bornes.
+"""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DATA_SITE, METER_MODEL_VIRTUAL
+from .coordinator import PowerBoxRealtimeCoordinator
+from .derived import meter_sample
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def box_contribution(coordinator: PowerBoxRealtimeCoordinator) -> tuple[float, float]:
+    """Contribution d'une borne : (puissance W, énergie de session Wh)."""
+    if not coordinator.data or not coordinator.last_update_success:
+        return 0.0, 0.0
+    meters_parsed = coordinator.data.meters_parsed
+    power = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "ActivePower_W")
+    energy = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "SessionTotalEnergy_Ws")
+    return (
+        float(power[0]) if power else 0.0,
+        float(energy[0]) / 3600 if energy else 0.0,
+    )
+
+
+class SiteAggregator:
+    """Totaux de site et création des entités agrégées."""
+
+    def __init__(self) -> None:
+        """Initialisation."""
+        self.total_power = 0.0
+        self.total_session_energy_wh = 0.0
+        self._contributions: dict[str, tuple[float, float]] = {}
+        self._site_limits: dict[str, float] = {}
+        self._coordinators: dict[str, PowerBoxRealtimeCoordinator] = {}
+        self._unsubs: dict[str, CALLBACK_TYPE] = {}
+        self._listeners: set[CALLBACK_TYPE] = set()
+        self._platforms: dict[str, AddEntitiesCallback] = {}
+        self._entities_owner: str | None = None
+        self._entity_factory = None
+
+    @property
+    def box_count(self) -> int:
+        """Nombre de bornes suivies."""
+        return len(self._contributions)
+
+    @property
+    def site_power_limit(self) -> float | None:
+        """Limite de puissance du site (la plus grande configurée), ou None."""
+        limits = [limit for limit in self._site_limits.values() if limit]
+        return max(limits) if limits else None
+
+    @property
+    def headroom(self) -> float | None:
+        """Marge de puissance restante sur le site."""
+        limit = self.site_power_limit
+        return None if limit is None else limit - self.total_power
+
+    @callback
+    def async_add_box(
+        self, entry_id: str, coordinator: PowerBoxRealtimeCoordinator, site_power_limit: float
+    ) -> None:
+        """Commence à suivre une borne."""
+        self._coordinators[entry_id] = coordinator
+        self._site_limits[entry_id] = site_power_limit
+        self._contributions[entry_id] = (0.0, 0.0)
+        self._unsubs[entry_id] = coordinator.async_add_listener(
+            lambda: self._async_update_box(entry_id)
+        )
+        self._async_update_box(entry_id)
+
+    @callback
+    def async_remove_box(self, entry_id: str) -> None:
+        """Arrête de suivre une borne et retire sa contribution."""
+        if entry_id not in self._contributions:
+            return
+        self._unsubs.pop(entry_id)()
+        power, energy = self._contributions.pop(entry_id)
+        self.total_power -= power
+        self.total_session_energy_wh -= energy
+        self._site_limits.pop(entry_id, None)
+        self._coordinators.pop(entry_id, None)
+        self._platforms.pop(entry_id, None)
+
+        # Les entités du site disparaissent avec la plateforme qui les portait
+        if self._entities_owner == entry_id:
+            self._entities_owner = None
+        self._async_create_entities()
+        self._async_notify()
+
+    @callback
+    def async_set_site_limit(self, entry_id: str, site_power_limit: float) -> None:
+        """Met à jour la limite de site déclarée par une borne."""
+        self._site_limits[entry_id] = site_power_limit
+        self._async_notify()
+
+    @callback
+    def _async_update_box(self, entry_id: str) -> None:
+        """Remplace la contribution d'une borne dans les totaux."""
+        new = box_contribution(self._coordinators[entry_id])
+        old = self._contributions[entry_id]
+        if new == old:
+            return
+        self._contributions[entry_id] = new
+        self.total_power += new[0] - old[0]
+        self.total_session_energy_wh += new[1] - old[1]
+        self._async_notify()
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Abonne une entité aux changements des totaux."""
+        self._listeners.add(update_callback)
+        return lambda: self._listeners.discard(update_callback)
+
+    @callback
+    def _async_notify(self) -> None:
+        """Prévient les entités du site."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def async_register_platform(self, entry_id: str, async_add_entities: AddEntitiesCallback, entity_factory) -> None:
+        """Déclare la plateforme capteur d'une borne, utilisable pour les entités du site."""
+        self._platforms[entry_id] = async_add_entities
+        self._entity_factory = entity_factory
+        self._async_create_entities()
+
+    @callback
+    def _async_create_entities(self) -> None:
+        """Crée les entités du site dès que plusieurs bornes sont chargées."""
+        if self._entities_owner is not None or self.box_count < 2 or not self._platforms:
+            return
+        self._entities_owner, async_add_entities = next(iter(self._platforms.items()))
+        _LOGGER.debug("Création des capteurs de site (%d bornes)", self.box_count)
+        async_add_entities(self._entity_factory(self))
+
+
+def get_site_aggregator(hass: HomeAssistant) -> SiteAggregator:
+    """Retourne l'agrégateur de site (créé au premier appel)."""
+    if DATA_SITE not in hass.data:
+        hass.data[DATA_SITE] = SiteAggregator()
+    return hass.data[DATA_SITE]
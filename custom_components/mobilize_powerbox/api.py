@@ -0,0 +1,516 @@
+"""Client HTTP de la PowerBox, sans dépendance à Home Assistant.
+
+L'horloge et la fabrique de sessions HTTP sont injectables : le simulateur
+(``tools/simulate.py``) rejoue ainsi des journées entières de pannes en
+temps virtuel avec exactement le même code de retry.
+"""
+from __future__ import annotations
+
+from collections import deque
+import logging
+import math
+import threading
+from urllib.parse import urlsplit
+import requests
+
+from .clock import SYSTEM_CLOCK, Clock
+from .const import (
+    DEFAULT_TIMEOUT,
+    ENDPOINT_AUTH,
+    ENDPOINT_CONFIGS,
+    MAX_RETRIES,
+    RATE_LIMIT_MAX_WAIT,
+    RTT_MIN_SAMPLES,
+    RTT_TIMEOUT_FACTOR,
+    RTT_WINDOW,
+    TIMEOUT_CONNECT_MAX,
+    TIMEOUT_CONNECT_MIN,
+    TIMEOUT_READ_MIN,
+)
+from .limiter import PRIORITY_CONFIG, RateLimitTimeout, TokenBucketLimiter, get_limiter
+from .request_queue import RequestCancelled, RequestQueue
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PowerBoxApiError(Exception):
+    """Échec d'une requête vers la PowerBox."""
+
+
+class PowerBoxNotSupported(PowerBoxApiError):
+    """Endpoint absent du firmware de la borne (404) : ce n'est pas une panne."""
+
+
+class AdaptiveTimeout:
+    """Timeouts de connexion et de lecture déduits des temps de réponse d'un endpoint.
+
+    La connexion est bornée à partir de la médiane (un hôte injoignable échoue
+    vite), la lecture à partir du 95e percentile (une réponse lente mais réelle
+    aboutit). Un dépassement de lecture double le timeout de lecture suivant
+    (dans la limite du plafond) jusqu'à la prochaine réponse, et compte comme
+    un temps de réponse égal au timeout dans les percentiles.
+    """
+
+    def __init__(self) -> None:
+        """Initialisation."""
+        self._samples: deque[float] = deque(maxlen=RTT_WINDOW)
+        self._read_backoff = 0.0
+
+    def record(self, latency: float) -> None:
+        """Enregistre un temps de réponse."""
+        self._samples.append(latency)
+        self._read_backoff = 0.0
+
+    def record_timeout(self, read_timeout: float) -> None:
+        """Enregistre un dépassement du timeout de lecture."""
+        self._samples.append(read_timeout)
+        self._read_backoff = max(self._read_backoff, read_timeout * 2)
+
+    def percentile(self, quantile: float) -> float | None:
+        """Percentile des temps de réponse récents (rang le plus proche), ou None."""
+        if len(self._samples) < RTT_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[max(0, math.ceil(quantile * len(ordered)) - 1)]
+
+    def timeouts(self, read_ceiling: float) -> tuple[float, float]:
+        """Timeouts (connexion, lecture) à utiliser pour la prochaine requête."""
+        median = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        if median is None:
+            return min(TIMEOUT_CONNECT_MAX, read_ceiling), read_ceiling
+        connect = min(TIMEOUT_CONNECT_MAX, max(TIMEOUT_CONNECT_MIN, median * RTT_TIMEOUT_FACTOR))
+        read = min(
+            read_ceiling,
+            max(TIMEOUT_READ_MIN, p95 * RTT_TIMEOUT_FACTOR, self._read_backoff),
+        )
+        return round(connect, 3), round(read, 3)
+
+
+def parse_meters(meters: list) -> dict:
+    """Transforme la réponse de /meters en dictionnaire indexé par modèle."""
+    meters_parsed = {}
+    for meter in meters:
+        model = meter.get("Model", "")
+        values_dict = {}
+        for value in meter.get("Values", []):
+            values_dict[value["Name"]] = {
+                "value": value["Value"],
+                "timestamp": value.get("Timestamp", 0)
+            }
+        meters_parsed[model] = {
+            "connected": meter.get("Connected") == "true",
+            "id": meter.get("ID"),
+            "manufacturer": meter.get("Manufacturer"),
+            "serial": meter.get("Serial"),
+            "values": values_dict
+        }
+    return meters_parsed
+
+
+def flatten_meters(meters_parsed: dict) -> dict:
+    """Aplatit les compteurs parsés en {"Modèle.Valeur": valeur}."""
+    return {
+        f"{model}.{name}": value_data["value"]
+        for model, meter in meters_parsed.items()
+        for name, value_data in meter["values"].items()
+    }
+
+
+class PowerBoxAPIClient:
+    """Client API pour la PowerBox."""
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        verify_ssl: bool,
+        clock: Clock = SYSTEM_CLOCK,
+        session_factory=requests.Session,
+        limiter: TokenBucketLimiter | None = None,
+    ):
+        """Initialisation du client API."""
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.verify_ssl = verify_ssl
+        self.host = urlsplit(base_url).netloc
+        self._token = None
+        self._session = None
+        self._consecutive_errors = 0
+        self._last_error_time = None
+        self.clock = clock
+        self._session_factory = session_factory
+        # Paramètres modifiables à chaud (voir configure)
+        self.timeout = DEFAULT_TIMEOUT
+        self.max_retries = MAX_RETRIES
+        # Positionné à la fermeture pour interrompre attentes et retries en cours
+        self._closing = threading.Event()
+        # Compteurs de santé (exposés par l'export OpenMetrics)
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "retries": 0,
+            "auth": 0,
+            "latency_sum": 0.0,
+            "latency_last": None,
+        }
+        # Limiteur partagé par toutes les requêtes vers cette borne
+        self._limiter = limiter or get_limiter(self.host)
+        # File unique : seul le thread qui exécute une requête touche à la session et au token
+        self._queue = RequestQueue(clock)
+        # Temps de réponse par endpoint, pour les timeouts adaptatifs
+        self._rtt: dict[str, AdaptiveTimeout] = {}
+    
+    def _get_session(self):
+        """Récupère ou crée une session HTTP."""
+        if self._session is None:
+            self._session = self._session_factory()
+            # Configuration de la session pour éviter les problèmes de connexion
+            self._session.headers.update({
+                "Connection": "close",  # Évite les problèmes de keep-alive
+                "User-Agent": "HomeAssistant/MobilizePowerBox"
+            })
+        return self._session
+
+    def configure(self, timeout: float, max_retries: int) -> None:
+        """Applique à chaud le timeout et le budget de tentatives."""
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _throttle(self, priority: int) -> None:
+        """Attend un jeton du limiteur de la borne avant d'envoyer une requête."""
+        try:
+            waited = self._limiter.acquire(
+                priority, timeout=RATE_LIMIT_MAX_WAIT, cancel=self._closing
+            )
+        except RateLimitTimeout as err:
+            raise PowerBoxApiError(f"Trop de requêtes en attente vers la PowerBox: {err}") from err
+        if waited > 1:
+            _LOGGER.debug("Requête retardée de %.1fs par le limiteur", waited)
+        self._raise_if_closing()
+
+    def _raise_if_closing(self) -> None:
+        """Interrompt la requête si le client est en cours de fermeture."""
+        if self._closing.is_set():
+            raise PowerBoxApiError("Client PowerBox fermé")
+
+    def _record_error(self) -> None:
+        """Comptabilise une erreur (consécutive et cumulée)."""
+        self._consecutive_errors += 1
+        self._stats["errors"] += 1
+
+    def _adaptive_timeout(self, endpoint: str) -> AdaptiveTimeout:
+        """Suivi des temps de réponse d'un endpoint."""
+        if endpoint not in self._rtt:
+            self._rtt[endpoint] = AdaptiveTimeout()
+        return self._rtt[endpoint]
+
+    def _request_timeout(self, endpoint: str) -> tuple[float, float]:
+        """Timeouts (connexion, lecture) d'une requête, plafonnés par le timeout configuré."""
+        return self._adaptive_timeout(endpoint).timeouts(self.timeout)
+
+    def _record_timeout(self, endpoint: str, err: Exception) -> None:
+        """Un dépassement de lecture relâche le timeout de l'endpoint."""
+        if isinstance(err, requests.exceptions.ReadTimeout):
+            self._adaptive_timeout(endpoint).record_timeout(self._request_timeout(endpoint)[1])
+
+    def _record_success(self, started: float, endpoint: str) -> None:
+        """Comptabilise une requête réussie et sa latence."""
+        latency = self.clock.monotonic() - started
+        self._adaptive_timeout(endpoint).record(latency)
+        self._consecutive_errors = 0  # Réinitialiser le compteur d'erreurs
+        self._stats["requests"] += 1
+        self._stats["latency_sum"] += latency
+        self._stats["latency_last"] = latency
+
+    def _wait_before_retry(self, wait_time: float, priority: int) -> None:
+        """Attente entre deux tentatives, interrompue immédiatement à la fermeture.
+
+        La file est libérée pendant l'attente : les autres requêtes passent, et
+        la nouvelle tentative reprend son tour à sa priorité.
+        """
+        self._stats["retries"] += 1
+        _LOGGER.debug(f"Attente de {wait_time}s avant nouvelle tentative")
+        with self._queue.released(priority, cancel=self._closing):
+            self.clock.wait(self._closing, wait_time)
+        self._raise_if_closing()
+
+    def _get_auth_token(self, priority: int = PRIORITY_CONFIG):
+        """Récupère le token d'authentification avec mécanisme de retry."""
+        url = f"{self.base_url}/auth"
+        payload = {"username": self.username, "password": self.password}
+        headers = {"Content-Type": "application/json"}
+        
+        max_retries = self.max_retries
+        retry_delay = 3  # Augmenté à 3 secondes
+        
+        for attempt in range(max_retries):
+            try:
+                session = self._get_session()
+                _LOGGER.debug(f"Tentative d'authentification {attempt + 1}/{max_retries}")
+                
+                self._throttle(priority)
+                started = self.clock.monotonic()
+                response = session.post(
+                    url, 
+                    json=payload, 
+                    headers=headers, 
+                    verify=self.verify_ssl,
+                    timeout=self._request_timeout(ENDPOINT_AUTH)
+                )
+                response.raise_for_status()
+                token = response.json().get("id_token")
+                if token:
+                    _LOGGER.debug("Authentification réussie")
+                    self._record_success(started, ENDPOINT_AUTH)
+                    self._stats["auth"] += 1
+                    return token
+                else:
+                    _LOGGER.error("Pas de token dans la réponse")
+                    raise PowerBoxApiError("Pas de token dans la réponse d'authentification")
+                    
+            except requests.exceptions.HTTPError as err:
+                if err.response is not None and err.response.status_code == 503:
+                    _LOGGER.warning("PowerBox temporairement indisponible (503)")
+                    self._record_error()
+                    raise PowerBoxApiError("PowerBox temporairement indisponible") from err
+                _LOGGER.error(f"Erreur HTTP lors de l'authentification: {err}")
+                self._record_error()
+                raise PowerBoxApiError(f"Erreur HTTP: {err}") from err
+                
+            except (requests.exceptions.ConnectionError, ConnectionResetError, requests.exceptions.Timeout) as err:
+                _LOGGER.warning(f"Erreur de connexion (tentative {attempt + 1}/{max_retries}): {err}")
+                self._record_timeout(ENDPOINT_AUTH, err)
+                
+                # Réinitialiser la session en cas d'erreur de connexion
+                if self._session:
+                    try:
+                        self._session.close()
+                    except Exception:
+                        pass
+                    self._session = None
+                
+                if attempt < max_retries - 1:
+                    wait_time = retry_delay * (attempt + 1)  # Backoff progressif
+                    self._wait_before_retry(wait_time, priority)
+                    continue
+                else:
+                    _LOGGER.error(f"Échec de l'authentification après {max_retries} tentatives")
+                    self._record_error()
+                    self._last_error_time = self.clock.time()
+                    raise PowerBoxApiError(f"PowerBox inaccessible après {max_retries} tentatives: {err}") from err
+                    
+            except requests.exceptions.RequestException as err:
+                _LOGGER.error(f"Erreur lors de l'authentification: {err}")
+                self._record_error()
+                raise PowerBoxApiError(f"Erreur d'authentification: {err}") from err
+
+    def fetch_data(self, endpoint: str, priority: int = PRIORITY_CONFIG):
+        """Récupère les données d'un endpoint via la file de requêtes du client.
+
+        Thread-safe : les appels concurrents sont exécutés un par un par
+        priorité, et un appel identique déjà en file ou en cours est fusionné.
+        """
+        return self._run_queued(endpoint, priority, lambda: self._fetch_data(endpoint, priority))
+
+    def write_config(self, module: str, name: str, value, priority: int = PRIORITY_CONFIG) -> None:
+        """Écrit un paramètre de configuration (via la file de requêtes du client).
+
+        Une seule tentative (plus une réauthentification si le token a expiré) :
+        l'appelant relit la configuration pour confirmer l'écriture.
+        """
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        self._run_queued(
+            f"{ENDPOINT_CONFIGS}:{module}.{name}={value}",
+            priority,
+            lambda: self._write_config(module, name, str(value), priority),
+        )
+
+    def _run_queued(self, key: str, priority: int, func):
+        """Exécute une requête à son tour dans la file du client."""
+        self._raise_if_closing()
+        try:
+            return self._queue.run(key, priority, func, cancel=self._closing)
+        except RequestCancelled as err:
+            raise PowerBoxApiError("Client PowerBox fermé") from err
+        finally:
+            # Fermeture demandée pendant la requête : la session est libérée ici
+            if self._closing.is_set() and not self._queue.busy:
+                self.close()
+
+    def _write_config(self, module: str, name: str, value: str, priority: int) -> None:
+        """Envoie l'écriture d'un paramètre (``PUT /configs``)."""
+        if not self._token:
+            self._token = self._get_auth_token(priority)
+        
+        url = f"{self.base_url}/{ENDPOINT_CONFIGS}"
+        payload = [{"module_name": module, "config_name": name, "config_value": value}]
+        write_key = f"{ENDPOINT_CONFIGS}:write"
+        
+        for attempt in range(2):
+            headers = {
+                "accept": "application/json",
+                "authorization": f"Bearer {self._token}",
+            }
+            try:
+                session = self._get_session()
+                self._throttle(priority)
+                started = self.clock.monotonic()
+                response = session.put(
+                    url, json=payload, headers=headers, verify=self.verify_ssl,
+                    timeout=self._request_timeout(write_key)
+                )
+                if response.status_code == 401 and attempt == 0:
+                    _LOGGER.debug("Token expiré, récupération d'un nouveau token")
+                    self._token = self._get_auth_token(priority)
+                    continue
+                response.raise_for_status()
+                self._record_success(started, write_key)
+                _LOGGER.info(f"Paramètre {module}.{name} écrit: {value}")
+                return
+                
+            except requests.exceptions.RequestException as err:
+                self._record_timeout(write_key, err)
+                self._record_error()
+                if not isinstance(err, requests.exceptions.HTTPError):
+                    self.close()
+                raise PowerBoxApiError(f"Écriture de {module}.{name} impossible: {err}") from err
+
+    def _fetch_data(self, endpoint: str, priority: int):
+        """Récupère les données depuis un endpoint avec gestion d'erreurs améliorée."""
+        self._raise_if_closing()
+        if not self._token:
+            self._token = self._get_auth_token(priority)
+        
+        url = f"{self.base_url}/{endpoint}"
+        headers = {
+            "accept": "application/json",
+            "authorization": f"Bearer {self._token}",
+        }
+        
+        # Une tentative de moins que l'authentification, qui a ses propres retries
+        max_retries = max(1, self.max_retries - 1)
+        retry_delay = 2
+        
+        for attempt in range(max_retries):
+            try:
+                session = self._get_session()
+                self._throttle(priority)
+                started = self.clock.monotonic()
+                response = session.get(
+                    url, headers=headers, verify=self.verify_ssl, timeout=self._request_timeout(endpoint)
+                )
+                
+                if response.status_code == 401:
+                    # Token expiré, réessayer avec un nouveau token
+                    _LOGGER.debug("Token expiré, récupération d'un nouveau token")
+                    self._token = self._get_auth_token(priority)
+                    headers["authorization"] = f"Bearer {self._token}"
+                    self._throttle(priority)
+                    started = self.clock.monotonic()
+                    response = session.get(
+                        url, headers=headers, verify=self.verify_ssl, timeout=self._request_timeout(endpoint)
+                    )
+                
+                response.raise_for_status()
+                data = response.json()
+                self._record_success(started, endpoint)
+                return data
+                
+            except requests.exceptions.HTTPError as err:
+                if err.response is not None and err.response.status_code == 503:
+                    _LOGGER.warning(f"PowerBox temporairement indisponible pour {endpoint} (503)")
+                    self._record_error()
+                    raise PowerBoxApiError("PowerBox temporairement indisponible") from err
+                if err.response is not None and err.response.status_code == 404:
+                    # La borne répond : l'endpoint n'existe pas sur ce firmware
+                    _LOGGER.debug(f"Endpoint {endpoint} absent du firmware (404)")
+                    raise PowerBoxNotSupported(f"Endpoint {endpoint} non pris en charge") from err
+                _LOGGER.error(f"Erreur HTTP lors de la récupération de {endpoint}: {err}")
+                self._record_error()
+                raise PowerBoxApiError(f"Erreur HTTP: {err}") from err
+                
+            except (requests.exceptions.ConnectionError, ConnectionResetError, requests.exceptions.Timeout) as err:
+                _LOGGER.warning(f"Erreur de connexion sur {endpoint} (tentative {attempt + 1}/{max_retries}): {err}")
+                self._record_timeout(endpoint, err)
+                
+                # Réinitialiser la session et le token
+                if self._session:
+                    try:
+                        self._session.close()
+                    except Exception:
+                        pass
+                    self._session = None
+                self._token = None
+                
+                if attempt < max_retries - 1:
+                    wait_time = retry_delay * (attempt + 1)
+                    self._wait_before_retry(wait_time, priority)
+                    continue
+                else:
+                    _LOGGER.error(f"Échec de la récupération de {endpoint} après {max_retries} tentatives")
+                    self._record_error()
+                    self._last_error_time = self.clock.time()
+                    raise PowerBoxApiError(f"PowerBox inaccessible pour {endpoint} après {max_retries} tentatives") from err
+                    
+            except requests.exceptions.RequestException as err:
+                _LOGGER.error(f"Erreur lors de la récupération de {endpoint}: {err}")
+                self._record_error()
+                raise PowerBoxApiError(f"Erreur de connexion: {err}") from err
+        
+        raise PowerBoxApiError(f"Échec de la récupération de {endpoint}")
+    
+    def close(self):
+        """Ferme proprement la session HTTP."""
+        if self._session:
+            try:
+                self._session.close()
+            except Exception as err:
+                _LOGGER.debug(f"Erreur lors de la fermeture de la session: {err}")
+            finally:
+                self._session = None
+        self._token = None
+    
+    def shutdown(self):
+        """Fermeture non bloquante : annule les attentes et retries en cours.
+
+        Une requête déjà envoyée se termine dans son thread, mais son résultat
+        est ignoré et aucune nouvelle tentative n'est faite.
+        """
+        self._closing.set()
+        if not self._queue.busy:
+            self.close()
+    
+    def is_having_issues(self):
+        """Vérifie si la PowerBox rencontre des problèmes répétés."""
+        return self._consecutive_errors >= 3
+    
+    def get_consecutive_errors(self):
+        """Retourne le nombre d'erreurs consécutives."""
+        return self._consecutive_errors
+    
+    def get_stats(self):
+        """Retourne les compteurs de santé du client."""
+        return dict(self._stats, consecutive_errors=self._consecutive_errors)
+    
+    def get_timeout_stats(self):
+        """Retourne les percentiles de temps de réponse et les timeouts courants par endpoint."""
+        return {
+            endpoint: {
+                "p50": tracker.percentile(0.5),
+                "p95": tracker.percentile(0.95),
+                "timeouts": self._request_timeout(endpoint),
+            }
+            for endpoint, tracker in self._rtt.items()
+        }
+    
+    def get_queue_stats(self):
+        """Retourne les compteurs de la file de requêtes (exécutées, fusionnées, annulées)."""
+        return self._queue.get_stats()
+    
+    def get_limiter_stats(self):
+        """Retourne les métriques du limiteur de requêtes de la borne."""
+        return self._limiter.get_stats()
@@ -0,0 +1,95 @@
+"""Capteurs binaires pour Mobilize PowerBox."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass, BinarySensorEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import (
+    DOMAIN,
+    CHARGE_STATE_CHARGING,
+    CHARGE_STATE_UNPLUGGED,
+)
+from .coordinator import PowerBoxRealtimeCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+):
+    """Configuration des capteurs binaires depuis une config entry."""
+    domain_data = hass.data[DOMAIN][entry.entry_id]
+    coordinator_realtime: PowerBoxRealtimeCoordinator = domain_data["coordinator_realtime"]
+    device_info = domain_data["device_info"]
+
+    async_add_entities([
+        PowerBoxPluggedBinarySensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxChargingBinarySensor(coordinator_realtime, entry.entry_id, device_info),
+    ], True)
+
+
+class PowerBoxChargeStateBinarySensor(CoordinatorEntity, BinarySensorEntity):
+    """Base des capteurs binaires dérivés de l'état de charge anti-rebondi.
+
+    L'état n'est écrit que sur un front (ou un changement de disponibilité),
+    pas à chaque rafraîchissement du coordinateur.
+    """
+
+    def __init__(
+        self,
+        coordinator: PowerBoxRealtimeCoordinator,
+        device_info,
+        is_on_fn: Callable[[str], bool],
+    ):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_device_info = device_info
+        self._is_on_fn = is_on_fn
+        self._written: tuple[bool | None, bool] | None = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur, uniquement sur changement."""
+        charge_state = self.coordinator.data.charge_state if self.coordinator.data else None
+        self._attr_is_on = self._is_on_fn(charge_state) if charge_state else None
+        written = (self._attr_is_on, self.available)
+        if written != self._written:
+            self._written = written
+            self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxPluggedBinarySensor(PowerBoxChargeStateBinarySensor):
+    """Capteur binaire de véhicule branché."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        # Branché dans tout état sauf débranché
+        super().__init__(coordinator, device_info, lambda state: state != CHARGE_STATE_UNPLUGGED)
+        self._attr_name = "PowerBox Véhicule Branché"
+        self._attr_unique_id = f"{entry_id}_plugged"
+        self._attr_device_class = BinarySensorDeviceClass.PLUG
+
+
+class PowerBoxChargingBinarySensor(PowerBoxChargeStateBinarySensor):
+    """Capteur binaire de charge en cours."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        # En charge uniquement dans l'état charging
+        super().__init__(coordinator, device_info, lambda state: state == CHARGE_STATE_CHARGING)
+        self._attr_name = "PowerBox En Charge"
+        self._attr_unique_id = f"{entry_id}_charging"
+        self._attr_device_class = BinarySensorDeviceClass.BATTERY_CHARGING
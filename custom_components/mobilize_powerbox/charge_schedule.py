@@ -0,0 +1,102 @@
+"""Plages horaires de charge (heures creuses) par jour de la semaine.
+
+Syntaxe : règles séparées par ``;``, chacune composée de jours optionnels
+puis d'une plage ``HH:MM-HH:MM``. Une plage qui passe minuit appartient au
+jour où elle commence. Exemples :
+
+    22:00-06:00
+    lun-ven 22:30-06:30; sam,dim 00:00-08:00
+    mon-fri 22:30-06:30; sat,sun 00:00-08:00
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+import re
+
+# Abréviations acceptées (français et anglais), lundi = 0
+_DAYS = {
+    **{name: index for index, name in enumerate(("lun", "mar", "mer", "jeu", "ven", "sam", "dim"))},
+    **{name: index for index, name in enumerate(("mon", "tue", "wed", "thu", "fri", "sat", "sun"))},
+}
+ALL_DAYS = frozenset(range(7))
+
+_RULE = re.compile(r"^(?:(?P<days>[a-z,\-\s]+?)\s+)?(?P<start>\d{1,2}:\d{2})\s*-\s*(?P<end>\d{1,2}:\d{2})$")
+
+
+@dataclass(frozen=True)
+class ChargeWindow:
+    """Plage de charge, les jours désignant le jour de début."""
+
+    days: frozenset[int]
+    start: time
+    end: time
+
+
+def _parse_time(text: str) -> time:
+    """Heure ``HH:MM`` (``ValueError`` si invalide)."""
+    hours, minutes = (int(part) for part in text.split(":"))
+    return time(hours, minutes)
+
+
+def _parse_days(text: str) -> frozenset[int]:
+    """Jours ``lun-ven`` / ``sam,dim`` (``ValueError`` si invalide)."""
+    days: set[int] = set()
+    for part in text.replace(" ", "").split(","):
+        first, _, last = part.partition("-")
+        if first not in _DAYS or (last and last not in _DAYS):
+            raise ValueError(f"Jour inconnu: {part}")
+        start = _DAYS[first]
+        end = _DAYS[last] if last else start
+        days.update((start + offset) % 7 for offset in range((end - start) % 7 + 1))
+    return frozenset(days)
+
+
+def parse_windows(text: str) -> list[ChargeWindow]:
+    """Transforme la syntaxe des plages en liste de ``ChargeWindow``.
+
+    Lève ``ValueError`` si une règle est invalide.
+    """
+    windows = []
+    for rule in filter(None, (part.strip().lower() for part in text.split(";"))):
+        match = _RULE.match(rule)
+        if match is None:
+            raise ValueError(f"Règle invalide: {rule}")
+        start = _parse_time(match["start"])
+        end = _parse_time(match["end"])
+        if start == end:
+            raise ValueError(f"Plage vide: {rule}")
+        days = _parse_days(match["days"]) if match["days"] else ALL_DAYS
+        windows.append(ChargeWindow(days, start, end))
+    return windows
+
+
+def _intervals(windows: list[ChargeWindow], now: datetime) -> list[tuple[datetime, datetime]]:
+    """Plages concrètes (fusionnées) autour de ``now`` : de la veille à J+8."""
+    intervals = []
+    for offset in range(-1, 9):
+        day = (now + timedelta(days=offset)).date()
+        for window in windows:
+            if day.weekday() not in window.days:
+                continue
+            start = datetime.combine(day, window.start, tzinfo=now.tzinfo)
+            end_day = day if window.end > window.start else day + timedelta(days=1)
+            intervals.append((start, datetime.combine(end_day, window.end, tzinfo=now.tzinfo)))
+
+    merged: list[tuple[datetime, datetime]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def schedule_state(windows: list[ChargeWindow], now: datetime) -> tuple[bool, datetime | None]:
+    """Retourne (plage active maintenant, prochaine bascule) ; None si aucune bascule."""
+    for start, end in _intervals(windows, now):
+        if start <= now < end:
+            return True, end
+        if start > now:
+            return False, start
+    return False, None
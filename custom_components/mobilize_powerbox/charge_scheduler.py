@@ -0,0 +1,151 @@
+"""Planification de la charge en heures creuses.
+
+Un seul minuteur est armé, sur la prochaine bascule de plage : aucune
+évaluation périodique. À chaque bascule, le courant maximum de la borne est
+écrit via l'API puis confirmé par une seule relecture de la configuration.
+L'objectif d'énergie optionnel est suivi sur les rafraîchissements temps réel
+déjà existants, uniquement pendant une plage active.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.util import dt as dt_util
+
+from .charge_schedule import ChargeWindow, schedule_state
+from .const import CONFIG_KEY_MAX_CURRENT, METER_MODEL_VIRTUAL
+from .coordinator import PowerBoxConfigCoordinator, PowerBoxRealtimeCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ChargeScheduler:
+    """Applique le courant de charge selon les plages horaires configurées."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator_realtime: PowerBoxRealtimeCoordinator,
+        coordinator_config: PowerBoxConfigCoordinator,
+        windows: list[ChargeWindow],
+        current: float,
+        idle_current: float,
+        target_kwh: float,
+    ) -> None:
+        """Initialisation."""
+        self.hass = hass
+        self.coordinator_realtime = coordinator_realtime
+        self.coordinator_config = coordinator_config
+        self.windows = windows
+        self.current = current
+        self.idle_current = idle_current
+        self.target_kwh = target_kwh
+        self.active = False
+        self.target_reached = False
+        self.next_boundary: datetime | None = None
+        # Borne pilotée par l'allocateur de flotte : le courant planifié n'est qu'un plafond
+        self.fleet_managed = False
+        self._apply_lock = asyncio.Lock()
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._unsub_target: CALLBACK_TYPE | None = None
+        self._listeners: set[CALLBACK_TYPE] = set()
+
+    @callback
+    def async_start(self) -> None:
+        """Applique l'état courant et arme le minuteur de la prochaine bascule."""
+        self._async_handle_boundary(dt_util.now())
+
+    @callback
+    def async_stop(self) -> None:
+        """Annule le minuteur et le suivi de l'objectif."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        if self._unsub_target is not None:
+            self._unsub_target()
+            self._unsub_target = None
+
+    @callback
+    def _async_handle_boundary(self, _now: datetime) -> None:
+        """Bascule de plage : nouvel état, nouveau minuteur, écriture du courant."""
+        self._unsub_timer = None
+        active, self.next_boundary = schedule_state(self.windows, dt_util.now())
+        if active != self.active:
+            self.target_reached = False
+        self.active = active
+        _LOGGER.debug(
+            "Plage de charge %s, prochaine bascule: %s",
+            "active" if active else "inactive",
+            self.next_boundary
+        )
+
+        if self.next_boundary is not None:
+            self._unsub_timer = async_track_point_in_time(
+                self.hass, self._async_handle_boundary, self.next_boundary
+            )
+        self._update_target_tracking()
+        self.hass.async_create_task(self._async_apply())
+        self._async_notify()
+
+    @property
+    def setpoint(self) -> float:
+        """Courant maximum (A) à appliquer dans l'état courant."""
+        return self.current if self.active and not self.target_reached else self.idle_current
+
+    async def _async_apply(self) -> None:
+        """Écrit le courant maximum s'il diffère de la configuration connue."""
+        if self.fleet_managed:
+            return
+        async with self._apply_lock:
+            setpoint_ma = int(self.setpoint * 1000)
+            current_ma = self.coordinator_config.get_typed_config_value(CONFIG_KEY_MAX_CURRENT)
+            if current_ma is not None and str(current_ma) == str(setpoint_ma):
+                return
+            try:
+                confirmed = await self.coordinator_config.async_write_config(
+                    CONFIG_KEY_MAX_CURRENT, setpoint_ma
+                )
+            except HomeAssistantError as err:
+                _LOGGER.error("Impossible d'appliquer le courant planifié (%s A): %s", self.setpoint, err)
+                return
+            if not confirmed:
+                _LOGGER.warning("Courant planifié (%s A) non confirmé par la borne", self.setpoint)
+
+    @callback
+    def _update_target_tracking(self) -> None:
+        """Suit l'énergie de session seulement quand un objectif peut être atteint."""
+        wanted = self.active and self.target_kwh > 0 and not self.target_reached
+        if wanted and self._unsub_target is None:
+            self._unsub_target = self.coordinator_realtime.async_add_listener(self._async_check_target)
+        elif not wanted and self._unsub_target is not None:
+            self._unsub_target()
+            self._unsub_target = None
+
+    @callback
+    def _async_check_target(self) -> None:
+        """Arrête la charge quand l'objectif d'énergie de la session est atteint."""
+        energy = self.coordinator_realtime.get_meter_value(METER_MODEL_VIRTUAL, "SessionTotalEnergy_Ws")
+        if energy is None or float(energy) / 3_600_000 < self.target_kwh:
+            return
+        _LOGGER.info("Objectif de %s kWh atteint, charge suspendue jusqu'à la prochaine plage", self.target_kwh)
+        self.target_reached = True
+        self._update_target_tracking()
+        self.hass.async_create_task(self._async_apply())
+        self._async_notify()
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Abonne une entité aux changements d'état du planificateur."""
+        self._listeners.add(update_callback)
+        return lambda: self._listeners.discard(update_callback)
+
+    @callback
+    def _async_notify(self) -> None:
+        """Prévient les entités abonnées."""
+        for update_callback in list(self._listeners):
+            update_callback()
@@ -0,0 +1,48 @@
+"""Horloge injectable pour le client et le limiteur de la PowerBox.
+
+En production, ``SYSTEM_CLOCK`` délègue au temps réel. Le simulateur fournit
+une horloge virtuelle qui avance instantanément à chaque attente.
+"""
+from __future__ import annotations
+
+import time
+from typing import Protocol
+
+
+class Waitable(Protocol):
+    """Objet sur lequel on peut attendre (``threading.Event`` ou ``Condition``)."""
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Attend au plus ``timeout`` secondes."""
+
+
+class Clock(Protocol):
+    """Source de temps utilisée par le client HTTP et le limiteur."""
+
+    def time(self) -> float:
+        """Horodatage Unix courant."""
+
+    def monotonic(self) -> float:
+        """Temps monotone en secondes."""
+
+    def wait(self, waitable: Waitable, timeout: float | None) -> bool:
+        """Attend sur ``waitable`` au plus ``timeout`` secondes."""
+
+
+class SystemClock:
+    """Horloge réelle."""
+
+    def time(self) -> float:
+        """Horodatage Unix courant."""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Temps monotone en secondes."""
+        return time.monotonic()
+
+    def wait(self, waitable: Waitable, timeout: float | None) -> bool:
+        """Attend réellement (réveil anticipé si l'évènement est positionné)."""
+        return waitable.wait(timeout)
+
+
+SYSTEM_CLOCK = SystemClock()
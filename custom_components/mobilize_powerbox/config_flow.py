@@ -14,15 +14,63 @@ from homeassistant.helpers import config_validation as cv
 from .const import (
     DOMAIN,
     CONF_VERIFY_SSL,
+    CONF_PRICE_HP,
+    CONF_PRICE_HC,
+    CONF_SCAN_INTERVAL_REALTIME,
+    CONF_SCAN_INTERVAL_CONFIG,
+    CONF_TIMEOUT,
+    CONF_MAX_RETRIES,
+    CONF_MAX_STALE_AGE,
+    CONF_METRICS_ENABLED,
+    CONF_STATISTICS_IMPORT,
+    CONF_PUBLISH_MODE,
+    CONF_PUBLISH_TOPIC,
+    CONF_SITE_POWER_LIMIT,
+    CONF_SCHEDULE_ENABLED,
+    CONF_SCHEDULE_WINDOWS,
+    CONF_SCHEDULE_CURRENT,
+    CONF_SCHEDULE_IDLE_CURRENT,
+    CONF_SCHEDULE_TARGET_KWH,
+    CONF_FLEET_ENABLED,
+    CONF_FLEET_WEIGHT,
+    CONF_SITE_METER,
+    CONF_ETA_TARGET_KWH,
     DEFAULT_NAME,
+    DEFAULT_PRICE_HP,
+    DEFAULT_PRICE_HC,
+    DEFAULT_SCAN_INTERVAL_REALTIME,
+    DEFAULT_SCAN_INTERVAL_CONFIG,
+    DEFAULT_TIMEOUT,
+    DEFAULT_MAX_STALE_AGE,
+    DEFAULT_METRICS_ENABLED,
+    DEFAULT_STATISTICS_IMPORT,
+    DEFAULT_PUBLISH_TOPIC,
+    DEFAULT_SITE_POWER_LIMIT,
+    DEFAULT_SCHEDULE_ENABLED,
+    DEFAULT_SCHEDULE_WINDOWS,
+    DEFAULT_SCHEDULE_CURRENT,
+    DEFAULT_SCHEDULE_IDLE_CURRENT,
+    DEFAULT_SCHEDULE_TARGET_KWH,
+    DEFAULT_FLEET_ENABLED,
+    DEFAULT_FLEET_WEIGHT,
+    DEFAULT_SITE_METER,
+    DEFAULT_ETA_TARGET_KWH,
+    MAX_RETRIES,
+    PUBLISH_MODES,
+    PUBLISH_MODE_NONE,
     DEFAULT_USERNAME,
     DEFAULT_VERIFY_SSL,
     ERROR_CANNOT_CONNECT,
     ERROR_INVALID_AUTH,
+    ERROR_INVALID_SCHEDULE,
+    ERROR_INVALID_SITE_METER,
     ERROR_TIMEOUT,
     ERROR_UNKNOWN,
-    TIMEOUT_AUTH,
+    TIMEOUT_CONNECT_MAX,
+    RATE_LIMIT_MAX_WAIT,
 )
+from .charge_schedule import parse_windows
+from .limiter import PRIORITY_DIAGNOSTIC, RateLimitTimeout, get_limiter
 
 # Désactiver les avertissements SSL pour certificats auto-signés
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
@@ -40,12 +88,14 @@ async def validate_connection(hass: HomeAssistant, host: str, username: str, pas
         headers = {"Content-Type": "application/json"}
         
         try:
+            # Même limiteur que les coordinateurs : la borne peut déjà être interrogée
+            get_limiter(host).acquire(PRIORITY_DIAGNOSTIC, timeout=RATE_LIMIT_MAX_WAIT)
             response = requests.post(
                 url, 
                 json=payload, 
                 headers=headers, 
                 verify=verify_ssl,
-                timeout=TIMEOUT_AUTH
+                timeout=(TIMEOUT_CONNECT_MAX, DEFAULT_TIMEOUT)
             )
             
             if response.status_code == 200:
@@ -58,7 +108,7 @@ async def validate_connection(hass: HomeAssistant, host: str, username: str, pas
             else:
                 return False, ERROR_UNKNOWN, f"HTTP {response.status_code}"
                 
-        except requests.exceptions.Timeout:
+        except (requests.exceptions.Timeout, RateLimitTimeout):
             return False, ERROR_TIMEOUT, "Connection timeout"
         except requests.exceptions.ConnectionError:
             return False, ERROR_CANNOT_CONNECT, "Cannot connect to PowerBox"
@@ -88,7 +138,7 @@ class CannotConnect(Exception):
 class PowerBoxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Mobilize PowerBox Verso."""
 
-    VERSION = 1
+    VERSION = 2
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_POLL
 
     async def async_step_user(self, user_input=None):
@@ -153,22 +203,120 @@ class PowerBoxOptionsFlow(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
+            try:
+                parse_windows(user_input.get(CONF_SCHEDULE_WINDOWS, DEFAULT_SCHEDULE_WINDOWS))
+            except ValueError:
+                errors[CONF_SCHEDULE_WINDOWS] = ERROR_INVALID_SCHEDULE
+            site_meter = user_input.get(CONF_SITE_METER, DEFAULT_SITE_METER)
+            if site_meter and self.hass.states.get(site_meter) is None:
+                errors[CONF_SITE_METER] = ERROR_INVALID_SITE_METER
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
 
+        # En cas d'erreur, le formulaire est réaffiché avec la saisie en cours
+        options = {**self.config_entry.options, **(user_input or {})}
+        data = self.config_entry.data
+        
         # Options modifiables après configuration
         options_schema = vol.Schema({
             vol.Optional(
                 CONF_NAME,
-                default=self.config_entry.data.get(CONF_NAME, DEFAULT_NAME)
+                default=options.get(CONF_NAME, data.get(CONF_NAME, DEFAULT_NAME))
             ): str,
             vol.Optional(
                 CONF_VERIFY_SSL,
-                default=self.config_entry.data.get(CONF_VERIFY_SSL, DEFAULT_VERIFY_SSL)
+                default=options.get(CONF_VERIFY_SSL, data.get(CONF_VERIFY_SSL, DEFAULT_VERIFY_SSL))
+            ): bool,
+            vol.Optional(
+                CONF_SCAN_INTERVAL_REALTIME,
+                default=options.get(CONF_SCAN_INTERVAL_REALTIME, DEFAULT_SCAN_INTERVAL_REALTIME)
+            ): vol.All(vol.Coerce(int), vol.Range(min=5, max=3600)),
+            vol.Optional(
+                CONF_SCAN_INTERVAL_CONFIG,
+                default=options.get(CONF_SCAN_INTERVAL_CONFIG, DEFAULT_SCAN_INTERVAL_CONFIG)
+            ): vol.All(vol.Coerce(int), vol.Range(min=60, max=86400)),
+            vol.Optional(
+                CONF_TIMEOUT,
+                default=options.get(CONF_TIMEOUT, DEFAULT_TIMEOUT)
+            ): vol.All(vol.Coerce(int), vol.Range(min=2, max=60)),
+            vol.Optional(
+                CONF_MAX_RETRIES,
+                default=options.get(CONF_MAX_RETRIES, MAX_RETRIES)
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=5)),
+            vol.Optional(
+                CONF_MAX_STALE_AGE,
+                default=options.get(CONF_MAX_STALE_AGE, DEFAULT_MAX_STALE_AGE)
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+            vol.Optional(
+                CONF_PRICE_HP,
+                default=options.get(CONF_PRICE_HP, DEFAULT_PRICE_HP)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(
+                CONF_PRICE_HC,
+                default=options.get(CONF_PRICE_HC, DEFAULT_PRICE_HC)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(
+                CONF_METRICS_ENABLED,
+                default=options.get(CONF_METRICS_ENABLED, DEFAULT_METRICS_ENABLED)
+            ): bool,
+            vol.Optional(
+                CONF_STATISTICS_IMPORT,
+                default=options.get(CONF_STATISTICS_IMPORT, DEFAULT_STATISTICS_IMPORT)
+            ): bool,
+            vol.Optional(
+                CONF_PUBLISH_MODE,
+                default=options.get(CONF_PUBLISH_MODE, PUBLISH_MODE_NONE)
+            ): vol.In(PUBLISH_MODES),
+            vol.Optional(
+                CONF_PUBLISH_TOPIC,
+                default=options.get(CONF_PUBLISH_TOPIC, DEFAULT_PUBLISH_TOPIC)
+            ): str,
+            vol.Optional(
+                CONF_SITE_POWER_LIMIT,
+                default=options.get(CONF_SITE_POWER_LIMIT, DEFAULT_SITE_POWER_LIMIT)
+            ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(
+                CONF_SCHEDULE_ENABLED,
+                default=options.get(CONF_SCHEDULE_ENABLED, DEFAULT_SCHEDULE_ENABLED)
+            ): bool,
+            vol.Optional(
+                CONF_SCHEDULE_WINDOWS,
+                default=options.get(CONF_SCHEDULE_WINDOWS, DEFAULT_SCHEDULE_WINDOWS)
+            ): str,
+            vol.Optional(
+                CONF_SCHEDULE_CURRENT,
+                default=options.get(CONF_SCHEDULE_CURRENT, DEFAULT_SCHEDULE_CURRENT)
+            ): vol.All(vol.Coerce(int), vol.Range(min=6, max=32)),
+            vol.Optional(
+                CONF_SCHEDULE_IDLE_CURRENT,
+                default=options.get(CONF_SCHEDULE_IDLE_CURRENT, DEFAULT_SCHEDULE_IDLE_CURRENT)
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=32)),
+            vol.Optional(
+                CONF_SCHEDULE_TARGET_KWH,
+                default=options.get(CONF_SCHEDULE_TARGET_KWH, DEFAULT_SCHEDULE_TARGET_KWH)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(
+                CONF_FLEET_ENABLED,
+                default=options.get(CONF_FLEET_ENABLED, DEFAULT_FLEET_ENABLED)
             ): bool,
+            vol.Optional(
+                CONF_FLEET_WEIGHT,
+                default=options.get(CONF_FLEET_WEIGHT, DEFAULT_FLEET_WEIGHT)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=10)),
+            vol.Optional(
+                CONF_SITE_METER,
+                default=options.get(CONF_SITE_METER, DEFAULT_SITE_METER)
+            ): str,
+            vol.Optional(
+                CONF_ETA_TARGET_KWH,
+                default=options.get(CONF_ETA_TARGET_KWH, DEFAULT_ETA_TARGET_KWH)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
         })
 
         return self.async_show_form(
             step_id="init",
-            data_schema=options_schema
+            data_schema=options_schema,
+            errors=errors,
         )
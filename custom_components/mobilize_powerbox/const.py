@@ -10,13 +10,65 @@ INTEGRATION_MODEL = "PowerBox"
 
 # Configuration
 CONF_VERIFY_SSL = "verify_ssl"
+CONF_PRICE_HP = "price_hp"
+CONF_PRICE_HC = "price_hc"
+CONF_SCAN_INTERVAL_REALTIME = "scan_interval_realtime"
+CONF_SCAN_INTERVAL_CONFIG = "scan_interval_config"
+CONF_TIMEOUT = "timeout"
+CONF_MAX_RETRIES = "max_retries"
+CONF_METRICS_ENABLED = "metrics_enabled"
+CONF_STATISTICS_IMPORT = "statistics_import"
+CONF_MAX_STALE_AGE = "max_stale_age"
+CONF_PUBLISH_MODE = "publish_mode"
+CONF_PUBLISH_TOPIC = "publish_topic"
+CONF_SITE_POWER_LIMIT = "site_power_limit"
+CONF_SCHEDULE_ENABLED = "schedule_enabled"
+CONF_SCHEDULE_WINDOWS = "schedule_windows"
+CONF_SCHEDULE_CURRENT = "schedule_current"
+CONF_SCHEDULE_IDLE_CURRENT = "schedule_idle_current"
+CONF_SCHEDULE_TARGET_KWH = "schedule_target_kwh"
+CONF_FLEET_ENABLED = "fleet_enabled"
+CONF_FLEET_WEIGHT = "fleet_weight"
+CONF_SITE_METER = "site_meter"
+CONF_ETA_TARGET_KWH = "eta_target_kwh"
+
+# Options appliquées à chaud, sans rechargement de l'entrée
+LIVE_OPTIONS = {
+    CONF_SITE_POWER_LIMIT,
+    CONF_PRICE_HP,
+    CONF_PRICE_HC,
+    CONF_SCAN_INTERVAL_REALTIME,
+    CONF_SCAN_INTERVAL_CONFIG,
+    CONF_TIMEOUT,
+    CONF_MAX_RETRIES,
+    CONF_MAX_STALE_AGE,
+    CONF_ETA_TARGET_KWH,
+}
 
 # Valeurs par défaut
 DEFAULT_NAME = "PowerBox"
 DEFAULT_USERNAME = "installer"
 DEFAULT_VERIFY_SSL = False
-DEFAULT_SCAN_INTERVAL_REALTIME = 10  # secondes - mesures temps réel
-DEFAULT_SCAN_INTERVAL_CONFIG = 300  # secondes (5 min) - configuration
+DEFAULT_SCAN_INTERVAL_REALTIME = 30  # secondes - mesures temps réel
+DEFAULT_SCAN_INTERVAL_CONFIG = 600  # secondes (10 min) - configuration
+DEFAULT_TIMEOUT = 20  # secondes - tolérant pour bornes instables
+DEFAULT_MAX_STALE_AGE = 300  # secondes - âge maximal des mesures servies après une erreur
+CONFIG_MAX_STALE_AGE = 24 * 3600  # secondes - idem pour la configuration
+DEFAULT_METRICS_ENABLED = False
+DEFAULT_STATISTICS_IMPORT = True
+DEFAULT_PUBLISH_TOPIC = "powerbox"
+DEFAULT_SITE_POWER_LIMIT = 0  # W - 0 : pas de limite de site
+DEFAULT_PRICE_HP = 0.27  # €/kWh heures pleines
+DEFAULT_PRICE_HC = 0.2068  # €/kWh heures creuses
+DEFAULT_SCHEDULE_ENABLED = False
+DEFAULT_SCHEDULE_WINDOWS = "22:00-06:00"
+DEFAULT_SCHEDULE_CURRENT = 32  # A - courant autorisé dans les plages
+DEFAULT_SCHEDULE_IDLE_CURRENT = 0  # A - courant hors plages (0 : charge suspendue)
+DEFAULT_SCHEDULE_TARGET_KWH = 0  # kWh par session - 0 : pas d'objectif
+DEFAULT_FLEET_ENABLED = False
+DEFAULT_FLEET_WEIGHT = 1.0  # poids relatif de la borne dans la répartition
+DEFAULT_SITE_METER = ""  # entité de puissance du site (W ou kW) - vide : aucune
+DEFAULT_ETA_TARGET_KWH = 0  # kWh par session - 0 : pas d'objectif estimé
 
 # Endpoints API
 ENDPOINT_AUTH = "auth"
@@ -29,6 +81,43 @@ ENDPOINT_TOKENS = "tokens"
 DATA_COORDINATOR = "coordinator"
 DATA_DEVICE_INFO = "device_info"
 DATA_UNDO_UPDATE_LISTENER = "undo_update_listener"
+DATA_APPLIED_OPTIONS = "applied_options"
+DATA_METRICS_CACHE = f"{DOMAIN}_metrics_cache"
+
+# Export OpenMetrics
+METRICS_URL = f"/api/{DOMAIN}/metrics"
+
+# Diffusion des instantanés (l'intégration est le seul client de la borne)
+PUBLISH_MODE_NONE = "none"
+PUBLISH_MODE_MQTT = "mqtt"
+PUBLISH_MODE_SSE = "sse"
+PUBLISH_MODES = [PUBLISH_MODE_NONE, PUBLISH_MODE_MQTT, PUBLISH_MODE_SSE]
+STREAM_URL = f"/api/{DOMAIN}/stream/{{entry_id}}"
+PUBLISH_TOPIC_DELTA = "delta"  # non retenu : valeurs modifiées
+PUBLISH_TOPIC_SNAPSHOT = "snapshot"  # retenu : instantané complet pour les abonnés tardifs
+STREAM_QUEUE_SIZE = 100  # deltas en attente par abonné avant déconnexion
+STREAM_HEARTBEAT = 30  # secondes
+DATA_STREAM_VIEW = f"{DOMAIN}_stream_view"
+DATA_PUBLISHER = "publisher"
+
+# Agrégats de site (plusieurs PowerBox)
+DATA_SITE = f"{DOMAIN}_site"
+SITE_DEVICE_ID = "site"
+SITE_DEVICE_NAME = "Site PowerBox"
+
+# Répartition du courant entre les bornes d'un site (flotte)
+DATA_FLEET = f"{DOMAIN}_fleet"
+FLEET_MIN_CURRENT = 6  # A - courant minimum d'une charge (IEC 61851)
+FLEET_MAX_CURRENT = 32  # A - plafond sans planification
+FLEET_WATTS_PER_AMP = 230  # W/A - monophasé, tant qu'aucune charge n'a été mesurée
+FLEET_DEADBAND = 2  # A - hausse minimale pour réécrire une consigne
+FLEET_MIN_WRITE_INTERVAL = 60  # secondes entre deux hausses de consigne d'une borne
+ERROR_INVALID_SITE_METER = "invalid_site_meter"
+
+# Planification de la charge (un seul minuteur, armé sur la prochaine bascule)
+DATA_SCHEDULER = "charge_scheduler"
+CONFIG_KEY_MAX_CURRENT = "ChargerApp.ACCharging.maxCurrent_mA"
+ERROR_INVALID_SCHEDULE = "invalid_schedule"
 
 # Attributs des capteurs
 ATTR_LAST_UPDATE = "last_update"
@@ -40,6 +129,32 @@ METER_VIRTUAL = 0  # Mesures en temps réel de la charge en cours
 METER_POWER_BOARD = 1  # Énergie totale de la borne
 METER_TIC_LINKY = 2  # Téléinformation Client (Linky)
 
+# Modèles des compteurs renvoyés par /meters
+METER_MODEL_VIRTUAL = "EVPLCCom-Virtual-Meter"
+METER_MODEL_POWER_BOARD = "Power Board Meter"
+METER_MODEL_TIC = "TiC"
+
+# Séries reprojetées sur une grille uniforme (pas = intervalle temps réel)
+RESAMPLED_VALUES = ("ActivePower_W", "Current_mA", "Voltage_mV")  # compteur virtuel
+RESAMPLE_MAX_GAP_FACTOR = 2  # au-delà de 2 pas entre deux mesures, les points sont des trous
+SERIES_MAX_POINTS = 2880  # points de grille gardés en mémoire par valeur (24 h à 30 s)
+
+# Estimation de la fin de charge (régression en ligne de la courbe de charge)
+ETA_FORGETTING = 0.98  # facteur d'oubli par échantillon (~50 échantillons utiles)
+ETA_TAPER_RATIO = 0.9  # fin de charge : puissance sous 90 % du pic de la session
+ETA_MIN_TAPER_SAMPLES = 5  # échantillons de fin de charge avant de projeter
+ETA_END_POWER = 1000  # W - puissance à laquelle la charge est considérée terminée
+
+# API websocket des courbes récentes
+DATA_WEBSOCKET = f"{DOMAIN}_websocket"
+WS_TYPE_RECENT_SERIES = f"{DOMAIN}/recent_series"
+
+# Compteurs d'énergie cumulatifs suivis malgré les remises à zéro
+ENERGY_COUNTERS = {
+    "SessionTotalEnergy_Ws": METER_MODEL_VIRTUAL,
+    "ActiveEnergy_Ws": METER_MODEL_POWER_BOARD,
+}
+
 # Noms des modules de configuration
 MODULE_CHARGE_POINT = "ChargePoint"
 MODULE_COUNTRY = "Country"
@@ -97,16 +212,160 @@ SENSOR_CHARGER_MODE = "charger_mode"
 SENSOR_COUNTRY = "country"
 SENSOR_INSTALLATION_TYPE = "installation_type"
 
+# Métriques dérivées (calculées une fois par rafraîchissement)
+DERIVED_HOUSEHOLD_POWER = "household_power"
+DERIVED_POWER_FACTOR = "power_factor"
+DERIVED_POWER_RATE = "power_rate"
+
+# Périodes tarifaires (TiC/Linky)
+TARIFF_PERIOD_HP = "hp"
+TARIFF_PERIOD_HC = "hc"
+TARIFF_PERIODS = [TARIFF_PERIOD_HP, TARIFF_PERIOD_HC]
+# Énergie comptée pendant une interruption : la période de chaque kWh est inconnue
+TARIFF_UNATTRIBUTED = "unattributed"
+TARIFF_MAX_GAP = 900  # secondes entre deux mesures au-delà desquelles le delta n'est pas attribué
+# Valeurs TiC pouvant porter la période tarifaire en cours (selon le mode du Linky)
+TIC_TARIFF_VALUE_NAMES = ["TariffPeriod", "PTEC", "LTARF"]
+
+# Stockage persistant
+STORAGE_VERSION = 1
+
+# Identifiants d'entités : préfixe fixe des versions 1 de l'entrée (une seule
+# borne possible), remplacé par l'identifiant de l'entrée ; les capteurs de
+# site restent globaux
+LEGACY_UNIQUE_ID_PREFIX = "powerbox_"
+SITE_UNIQUE_ID_PREFIX = "powerbox_site_"
+STORAGE_KEY_TARIFF = f"{DOMAIN}.tariff"
+TARIFF_SAVE_DELAY = 300  # secondes entre deux écritures des cumuls
+STORAGE_KEY_SCHEMA = f"{DOMAIN}.schema"
+STORAGE_KEY_TOKENS = f"{DOMAIN}.tokens"
+STORAGE_KEY_STATISTICS = f"{DOMAIN}.statistics"
+DATA_STATISTICS = "energy_statistics"
+STATISTICS_SAVE_DELAY = 300  # secondes entre deux écritures des cumuls horaires
+TOKENS_SAVE_DELAY = 300  # secondes entre deux écritures des cumuls par badge
+
+# Badges (RFID) : synchronisation rare, anticipée au début d'une session
+TOKENS_SCAN_INTERVAL = 6 * 3600  # secondes
+TOKEN_ATTRIBUTION_WINDOW = 300  # secondes - badge présenté jusqu'à 5 min avant le branchement
+
+# Paramètres de /configs portant les métadonnées de l'appareil (premier trouvé)
+DEVICE_METADATA_KEYS = {
+    "sw_version": ("product.firmwareVersion", "product.softwareVersion", "system.firmwareVersion"),
+    "hw_version": ("product.hardwareVersion", "system.hardwareVersion"),
+    "model": ("product.productName", "product.model"),
+}
+
+CURRENCY_EURO = "EUR"
+
+# États de charge (machine à états du coordinateur temps réel)
+CHARGE_STATE_UNPLUGGED = "unplugged"
+CHARGE_STATE_PLUGGED = "plugged"
+CHARGE_STATE_CHARGING = "charging"
+CHARGE_STATE_PAUSED = "paused"
+CHARGE_STATES = [
+    CHARGE_STATE_UNPLUGGED,
+    CHARGE_STATE_PLUGGED,
+    CHARGE_STATE_CHARGING,
+    CHARGE_STATE_PAUSED,
+]
+
+# Évènements de charge (déclenchés uniquement sur les fronts)
+EVENT_CHARGE = f"{DOMAIN}_charge_event"
+CHARGE_EVENT_PLUGGED = "car_plugged"
+CHARGE_EVENT_STARTED = "charging_started"
+CHARGE_EVENT_PAUSED = "charging_paused"
+CHARGE_EVENT_RESUMED = "charging_resumed"
+CHARGE_EVENT_SESSION_ENDED = "session_ended"
+
+CHARGING_POWER_THRESHOLD = 100  # W - en dessous, la voiture ne charge pas
+CHARGE_STATE_DEBOUNCE = 2  # rafraîchissements consécutifs avant de valider un état
+
 # Messages d'erreur
 ERROR_CANNOT_CONNECT = "cannot_connect"
 ERROR_INVALID_AUTH = "invalid_auth"
 ERROR_TIMEOUT = "timeout"
 ERROR_UNKNOWN = "unknown"
 
-# Timeouts (en secondes)
-TIMEOUT_AUTH = 10
-TIMEOUT_API = 10
+# Timeouts adaptatifs : déduits des temps de réponse observés par endpoint,
+# bornés par un plancher et par le timeout configuré (plafond de lecture)
+TIMEOUT_CONNECT_MIN = 1.0
+TIMEOUT_CONNECT_MAX = 3.0  # un hôte injoignable échoue vite
+TIMEOUT_READ_MIN = 2.0
+RTT_TIMEOUT_FACTOR = 4  # marge appliquée aux percentiles observés
+RTT_WINDOW = 50  # derniers temps de réponse conservés par endpoint
+RTT_MIN_SAMPLES = 5  # en dessous, timeouts par défaut
+
+# Limiteur de requêtes par borne (plafond de charge garanti)
+RATE_LIMIT_PER_SECOND = 1.0  # jetons par seconde
+RATE_LIMIT_BURST = 5  # rafale maximale
+RATE_LIMIT_MAX_WAIT = 30  # secondes d'attente maximale pour un jeton
 
 # Retry
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # secondes
+
+# Valeurs par défaut des options (comparaison des valeurs effectives à chaque
+# enregistrement du formulaire, y compris pour une entrée sans options)
+OPTION_DEFAULTS = {
+    CONF_VERIFY_SSL: DEFAULT_VERIFY_SSL,
+    CONF_SCAN_INTERVAL_REALTIME: DEFAULT_SCAN_INTERVAL_REALTIME,
+    CONF_SCAN_INTERVAL_CONFIG: DEFAULT_SCAN_INTERVAL_CONFIG,
+    CONF_TIMEOUT: DEFAULT_TIMEOUT,
+    CONF_MAX_RETRIES: MAX_RETRIES,
+    CONF_MAX_STALE_AGE: DEFAULT_MAX_STALE_AGE,
+    CONF_PRICE_HP: DEFAULT_PRICE_HP,
+    CONF_PRICE_HC: DEFAULT_PRICE_HC,
+    CONF_METRICS_ENABLED: DEFAULT_METRICS_ENABLED,
+    CONF_STATISTICS_IMPORT: DEFAULT_STATISTICS_IMPORT,
+    CONF_PUBLISH_MODE: PUBLISH_MODE_NONE,
+    CONF_PUBLISH_TOPIC: DEFAULT_PUBLISH_TOPIC,
+    CONF_SITE_POWER_LIMIT: DEFAULT_SITE_POWER_LIMIT,
+    CONF_SCHEDULE_ENABLED: DEFAULT_SCHEDULE_ENABLED,
+    CONF_SCHEDULE_WINDOWS: DEFAULT_SCHEDULE_WINDOWS,
+    CONF_SCHEDULE_CURRENT: DEFAULT_SCHEDULE_CURRENT,
+    CONF_SCHEDULE_IDLE_CURRENT: DEFAULT_SCHEDULE_IDLE_CURRENT,
+    CONF_SCHEDULE_TARGET_KWH: DEFAULT_SCHEDULE_TARGET_KWH,
+    CONF_FLEET_ENABLED: DEFAULT_FLEET_ENABLED,
+    CONF_FLEET_WEIGHT: DEFAULT_FLEET_WEIGHT,
+    CONF_SITE_METER: DEFAULT_SITE_METER,
+    CONF_ETA_TARGET_KWH: DEFAULT_ETA_TARGET_KWH,
+}
+
+# Services
+SERVICE_BURST_SAMPLE = "burst_sample"
+SERVICE_PROFILE = "profile"
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_DURATION = "duration"
+ATTR_INTERVAL = "interval"
+ATTR_FORMAT = "format"
+ATTR_CYCLES = "cycles"
+ATTR_COORDINATOR = "coordinator"
+ATTR_TIMEOUT = "timeout"
+ATTR_TOP = "top"
+
+# Échantillonnage rapide (budget de sécurité pour la borne)
+BURST_DEFAULT_DURATION = 60  # secondes
+BURST_MAX_DURATION = 300  # secondes
+BURST_DEFAULT_INTERVAL = 1  # secondes
+BURST_MIN_INTERVAL = 1  # secondes
+BURST_MAX_INTERVAL = 60  # secondes
+BURST_MAX_SAMPLES = 600
+BURST_EXPORT_DIR = "mobilize_powerbox"
+EXPORT_MAX_KEPT = 20  # exports conservés par service, les plus anciens sont supprimés
+
+FORMAT_CSV = "csv"
+FORMAT_JSON = "json"
+
+# Profilage à la demande des cycles de rafraîchissement
+PROFILE_DEFAULT_CYCLES = 5
+PROFILE_MAX_CYCLES = 50
+PROFILE_DEFAULT_TIMEOUT = 600  # secondes d'attente maximale des cycles
+PROFILE_MAX_TIMEOUT = 3600  # secondes
+PROFILE_DEFAULT_TOP = 10  # points chauds dans la notification
+PROFILE_COORDINATOR_REALTIME = "realtime"
+PROFILE_COORDINATOR_CONFIG = "config"
+PROFILE_COORDINATOR_ALL = "all"
+PROFILE_COORDINATORS = [PROFILE_COORDINATOR_REALTIME, PROFILE_COORDINATOR_CONFIG, PROFILE_COORDINATOR_ALL]
+PROFILE_NOTIFICATION_ID = "mobilize_powerbox_profile"
+DATA_PROFILER = "profiler"
@@ -1,21 +1,58 @@
 """DataUpdateCoordinators pour Mobilize PowerBox."""
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import timedelta
 import logging
-import time
-import requests
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import TimestampDataUpdateCoordinator, UpdateFailed
 
-_LOGGER = logging.getLogger(__name__)
+from .api import PowerBoxAPIClient, PowerBoxApiError, PowerBoxNotSupported, flatten_meters, parse_meters
+from .const import (
+    DOMAIN,
+    BURST_MAX_SAMPLES,
+    CHARGE_STATE_UNPLUGGED,
+    DEFAULT_SCAN_INTERVAL_CONFIG,
+    DEFAULT_SCAN_INTERVAL_REALTIME,
+    DEFAULT_MAX_STALE_AGE,
+    CONFIG_MAX_STALE_AGE,
+    EVENT_CHARGE,
+    ENDPOINT_CONFIGS,
+    ENDPOINT_CONFIGS_MODULES,
+    ENDPOINT_METERS,
+    ENDPOINT_TOKENS,
+    ENERGY_COUNTERS,
+    METER_MODEL_VIRTUAL,
+    RESAMPLED_VALUES,
+    RESAMPLE_MAX_GAP_FACTOR,
+    SERIES_MAX_POINTS,
+    STORAGE_KEY_SCHEMA,
+    STORAGE_KEY_TARIFF,
+    STORAGE_KEY_TOKENS,
+    STORAGE_VERSION,
+    TARIFF_SAVE_DELAY,
+    TOKEN_ATTRIBUTION_WINDOW,
+    TOKENS_SAVE_DELAY,
+    TOKENS_SCAN_INTERVAL,
+)
+from .derived import DerivedMetrics, meter_sample
+from .eta import ChargeEtaEstimator
+from .events import ChargeStateMachine
+from .limiter import PRIORITY_CONFIG, PRIORITY_DIAGNOSTIC, PRIORITY_REALTIME
+from .sampling import CounterTracker, RecentSeries, UniformResampler
+from .staleness import StaleWhileRevalidate
+from .scheduling import aligned_interval, realtime_interval
+from .schema import ConfigSchema, device_metadata, firmware_version, parse_modules
+from .tariff import TariffAccumulator
+from .tokens import TokenInventory, parse_tokens
 
-# Intervalles de mise à jour selon les recommandations HA
-SCAN_INTERVAL_REALTIME = timedelta(seconds=30)  # Mesures temps réel - augmenté pour réduire la charge
-SCAN_INTERVAL_CONFIG = timedelta(minutes=10)  # Configuration - augmenté pour stabilité
-SCAN_INTERVAL_REALTIME_ERROR = timedelta(minutes=2)  # Intervalle après erreur (backoff)
+_LOGGER = logging.getLogger(__name__)
 
 
 @dataclass
@@ -24,290 +61,275 @@ class PowerBoxData:
 
     meters_parsed: dict
     configs: dict | None = None
+    derived: dict = field(default_factory=dict)
+    tariff: dict = field(default_factory=dict)
+    charge_state: str | None = None
+    # Index des compteurs d'énergie, monotones hors remise à zéro
+    counters: dict = field(default_factory=dict)
+    # Estimation de fin de charge : énergie projetée, horodatages de fin et d'objectif
+    eta: dict = field(default_factory=dict)
+    # Fraîcheur : horodatage de la lecture, âge (s) et service depuis le cache
+    fetched_at: float | None = None
+    data_age: float = 0.0
+    served_from_cache: bool = False
 
 
-class PowerBoxAPIClient:
-    """Client API pour la PowerBox."""
-
-    def __init__(self, base_url: str, username: str, password: str, verify_ssl: bool):
-        """Initialisation du client API."""
-        self.base_url = base_url
-        self.username = username
-        self.password = password
-        self.verify_ssl = verify_ssl
-        self._token = None
-        self._session = None
-        self._consecutive_errors = 0
-        self._last_error_time = None
-    
-    def _get_session(self):
-        """Récupère ou crée une session HTTP."""
-        if self._session is None:
-            self._session = requests.Session()
-            # Configuration de la session pour éviter les problèmes de connexion
-            self._session.headers.update({
-                "Connection": "close",  # Évite les problèmes de keep-alive
-                "User-Agent": "HomeAssistant/MobilizePowerBox"
-            })
-        return self._session
-
-    def _get_auth_token(self):
-        """Récupère le token d'authentification avec mécanisme de retry."""
-        url = f"{self.base_url}/auth"
-        payload = {"username": self.username, "password": self.password}
-        headers = {"Content-Type": "application/json"}
-        
-        max_retries = 3
-        retry_delay = 3  # Augmenté à 3 secondes
-        
-        for attempt in range(max_retries):
-            try:
-                session = self._get_session()
-                _LOGGER.debug(f"Tentative d'authentification {attempt + 1}/{max_retries}")
-                
-                response = session.post(
-                    url, 
-                    json=payload, 
-                    headers=headers, 
-                    verify=self.verify_ssl,
-                    timeout=20  # Augmenté à 20 secondes pour bornes instables
-                )
-                response.raise_for_status()
-                token = response.json().get("id_token")
-                if token:
-                    _LOGGER.debug("Authentification réussie")
-                    self._consecutive_errors = 0  # Réinitialiser le compteur d'erreurs
-                    return token
-                else:
-                    _LOGGER.error("Pas de token dans la réponse")
-                    raise UpdateFailed("Pas de token dans la réponse d'authentification")
-                    
-            except requests.exceptions.HTTPError as err:
-                if err.response and err.response.status_code == 503:
-                    _LOGGER.warning("PowerBox temporairement indisponible (503)")
-                    self._consecutive_errors += 1
-                    raise UpdateFailed("PowerBox temporairement indisponible") from err
-                _LOGGER.error(f"Erreur HTTP lors de l'authentification: {err}")
-                self._consecutive_errors += 1
-                raise UpdateFailed(f"Erreur HTTP: {err}") from err
-                
-            except (requests.exceptions.ConnectionError, ConnectionResetError, requests.exceptions.Timeout) as err:
-                _LOGGER.warning(f"Erreur de connexion (tentative {attempt + 1}/{max_retries}): {err}")
-                
-                # Réinitialiser la session en cas d'erreur de connexion
-                if self._session:
-                    try:
-                        self._session.close()
-                    except Exception:
-                        pass
-                    self._session = None
-                
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (attempt + 1)  # Backoff progressif
-                    _LOGGER.debug(f"Attente de {wait_time}s avant nouvelle tentative")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    _LOGGER.error(f"Échec de l'authentification après {max_retries} tentatives")
-                    self._consecutive_errors += 1
-                    self._last_error_time = time.time()
-                    raise UpdateFailed(f"PowerBox inaccessible après {max_retries} tentatives: {err}") from err
-                    
-            except requests.exceptions.RequestException as err:
-                _LOGGER.error(f"Erreur lors de l'authentification: {err}")
-                self._consecutive_errors += 1
-                raise UpdateFailed(f"Erreur d'authentification: {err}") from err
-
-    def fetch_data(self, endpoint: str):
-        """Récupère les données depuis un endpoint avec gestion d'erreurs améliorée."""
-        if not self._token:
-            self._token = self._get_auth_token()
-        
-        url = f"{self.base_url}/{endpoint}"
-        headers = {
-            "accept": "application/json",
-            "authorization": f"Bearer {self._token}",
-        }
-        
-        max_retries = 2
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                session = self._get_session()
-                response = session.get(url, headers=headers, verify=self.verify_ssl, timeout=20)
-                
-                if response.status_code == 401:
-                    # Token expiré, réessayer avec un nouveau token
-                    _LOGGER.debug("Token expiré, récupération d'un nouveau token")
-                    self._token = self._get_auth_token()
-                    headers["authorization"] = f"Bearer {self._token}"
-                    response = session.get(url, headers=headers, verify=self.verify_ssl, timeout=20)
-                
-                response.raise_for_status()
-                self._consecutive_errors = 0  # Réinitialiser le compteur d'erreurs
-                return response.json()
-                
-            except requests.exceptions.HTTPError as err:
-                if err.response and err.response.status_code == 503:
-                    _LOGGER.warning(f"PowerBox temporairement indisponible pour {endpoint} (503)")
-                    self._consecutive_errors += 1
-                    raise UpdateFailed("PowerBox temporairement indisponible") from err
-                _LOGGER.error(f"Erreur HTTP lors de la récupération de {endpoint}: {err}")
-                self._consecutive_errors += 1
-                raise UpdateFailed(f"Erreur HTTP: {err}") from err
-                
-            except (requests.exceptions.ConnectionError, ConnectionResetError, requests.exceptions.Timeout) as err:
-                _LOGGER.warning(f"Erreur de connexion sur {endpoint} (tentative {attempt + 1}/{max_retries}): {err}")
-                
-                # Réinitialiser la session et le token
-                if self._session:
-                    try:
-                        self._session.close()
-                    except Exception:
-                        pass
-                    self._session = None
-                self._token = None
-                
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (attempt + 1)
-                    _LOGGER.debug(f"Attente de {wait_time}s avant nouvelle tentative")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    _LOGGER.error(f"Échec de la récupération de {endpoint} après {max_retries} tentatives")
-                    self._consecutive_errors += 1
-                    self._last_error_time = time.time()
-                    raise UpdateFailed(f"PowerBox inaccessible pour {endpoint} après {max_retries} tentatives") from err
-                    
-            except requests.exceptions.RequestException as err:
-                _LOGGER.error(f"Erreur lors de la récupération de {endpoint}: {err}")
-                self._consecutive_errors += 1
-                raise UpdateFailed(f"Erreur de connexion: {err}") from err
-        
-        raise UpdateFailed(f"Échec de la récupération de {endpoint}")
-    
-    def close(self):
-        """Ferme proprement la session HTTP."""
-        if self._session:
-            try:
-                self._session.close()
-            except Exception as err:
-                _LOGGER.debug(f"Erreur lors de la fermeture de la session: {err}")
-            finally:
-                self._session = None
-        self._token = None
-    
-    def is_having_issues(self):
-        """Vérifie si la PowerBox rencontre des problèmes répétés."""
-        return self._consecutive_errors >= 3
-    
-    def get_consecutive_errors(self):
-        """Retourne le nombre d'erreurs consécutives."""
-        return self._consecutive_errors
-
-
-class PowerBoxRealtimeCoordinator(DataUpdateCoordinator):
+class PowerBoxRealtimeCoordinator(TimestampDataUpdateCoordinator):
     """Coordinateur pour les mesures temps réel (10s)."""
 
     data: PowerBoxData
 
-    def __init__(self, hass: HomeAssistant, api_client: PowerBoxAPIClient) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_client: PowerBoxAPIClient,
+        scan_interval: timedelta = timedelta(seconds=DEFAULT_SCAN_INTERVAL_REALTIME),
+        max_stale_age: float = DEFAULT_MAX_STALE_AGE,
+    ) -> None:
         """Initialisation du coordinateur temps réel."""
         self.api_client = api_client
-        self._last_successful_data = None
+        self.scan_interval = scan_interval
+        self._effective_interval = scan_interval
+        self.stale = StaleWhileRevalidate(max_stale_age, api_client.clock)
         self._error_count = 0
+        self._burst_lock = asyncio.Lock()
+        self._burst_active = False
+        self._derived = DerivedMetrics()
+        self.tariff: TariffAccumulator | None = None
+        self._tariff_store: Store | None = None
+        self._charge_state = ChargeStateMachine()
+        self.eta = ChargeEtaEstimator()
+        self._resamplers: dict[str, UniformResampler] = {}
+        # Courbes récentes servies par l'API websocket, sans passer par le recorder
+        self.series = RecentSeries(SERIES_MAX_POINTS)
+        self._counters = {name: CounterTracker() for name in ENERGY_COUNTERS}
         
-        # Initialiser DataUpdateCoordinator
+        # Initialiser TimestampDataUpdateCoordinator
         super().__init__(
             hass,
             _LOGGER,
             name="Mobilize PowerBox Realtime",
             update_method=self.async_update_data,
-            update_interval=SCAN_INTERVAL_REALTIME,
+            update_interval=scan_interval,
         )
 
     async def async_update_data(self) -> PowerBoxData:
         """Récupère les mesures temps réel."""
         _LOGGER.debug("[Realtime] Starting data update")
         
-        # Ajuster l'intervalle si la PowerBox a des problèmes
-        error_count = await self.hass.async_add_executor_job(
-            self.api_client.get_consecutive_errors
-        )
-        
-        if error_count >= 3:
-            # Ralentir les mises à jour en cas de problèmes répétés
-            new_interval = SCAN_INTERVAL_REALTIME_ERROR
-            if self.update_interval != new_interval:
-                _LOGGER.warning(
-                    "[Realtime] PowerBox instable (%d erreurs), intervalle augmenté à %s",
-                    error_count,
-                    new_interval
-                )
-                self.update_interval = new_interval
-        else:
-            # Revenir à l'intervalle normal si tout va bien
-            if self.update_interval != SCAN_INTERVAL_REALTIME:
-                _LOGGER.info("[Realtime] PowerBox stable, intervalle normal rétabli")
-                self.update_interval = SCAN_INTERVAL_REALTIME
+        # Pendant un échantillonnage rapide, la borne est déjà interrogée
+        if self._burst_active and self.data:
+            _LOGGER.debug("[Realtime] Échantillonnage rapide en cours, cycle normal ignoré")
+            return self.data
         
         try:
             meters = await self.hass.async_add_executor_job(
-                self.api_client.fetch_data, "meters"
+                self.api_client.fetch_data, ENDPOINT_METERS, PRIORITY_REALTIME
             )
             
             # Parser les compteurs pour un accès plus facile
-            meters_parsed = {}
-            for meter in meters:
-                model = meter.get("Model", "")
-                values_dict = {}
-                for value in meter.get("Values", []):
-                    values_dict[value["Name"]] = {
-                        "value": value["Value"],
-                        "timestamp": value.get("Timestamp", 0)
-                    }
-                meters_parsed[model] = {
-                    "connected": meter.get("Connected") == "true",
-                    "id": meter.get("ID"),
-                    "manufacturer": meter.get("Manufacturer"),
-                    "serial": meter.get("Serial"),
-                    "values": values_dict
-                }
+            meters_parsed = parse_meters(meters)
             
             _LOGGER.debug("[Realtime] Successfully fetched data for %d meters", len(meters_parsed))
             
             # Sauvegarder les données réussies
-            result = PowerBoxData(meters_parsed=meters_parsed)
-            self._last_successful_data = result
             self._error_count = 0
+            return self.stale.store(self._build_snapshot(meters_parsed))
             
-            return result
-            
-        except UpdateFailed as err:
+        except PowerBoxApiError as err:
             self._error_count += 1
             
-            # Si on a des données précédentes, on les garde
-            if self._last_successful_data:
+            # Servir les dernières valeurs tant qu'elles ne sont pas trop anciennes
+            stale = self.stale.serve()
+            if stale is not None:
                 _LOGGER.warning(
-                    "[Realtime] Erreur de mise à jour (erreur #%d), conservation des dernières valeurs: %s",
+                    "[Realtime] Erreur de mise à jour (erreur #%d), dernières valeurs servies (âge %ss): %s",
                     self._error_count,
+                    stale.data_age,
+                    err
+                )
+                return stale
+            if self.stale.has_data:
+                _LOGGER.error(
+                    "[Realtime] Dernières valeurs trop anciennes (> %ss), entités indisponibles: %s",
+                    self.stale.max_age,
                     err
                 )
-                # Retourner les dernières données connues au lieu de lever une erreur
-                return self._last_successful_data
             else:
                 _LOGGER.error("[Realtime] Failed to update data (no previous data): %s", err)
-                raise
+            raise UpdateFailed(str(err)) from err
                 
         except Exception as err:
             self._error_count += 1
             _LOGGER.error("[Realtime] Unexpected error: %s", err)
             
-            # Si on a des données précédentes, on les garde
-            if self._last_successful_data:
-                return self._last_successful_data
+            stale = self.stale.serve()
+            if stale is not None:
+                return stale
             raise UpdateFailed(f"Erreur lors de la mise à jour des mesures: {err}") from err
+        
+        finally:
+            # Après la requête : elle a pu durer, et son résultat compte dans les erreurs
+            self._schedule_next_cycle()
+
+    def _schedule_next_cycle(self) -> None:
+        """Intervalle du prochain cycle, ralenti si la PowerBox a des problèmes."""
+        error_count = self.api_client.get_consecutive_errors()
+        
+        new_interval = realtime_interval(self.scan_interval, error_count)
+        if new_interval != self._effective_interval:
+            if new_interval != self.scan_interval:
+                _LOGGER.warning(
+                    "[Realtime] PowerBox instable (%d erreurs), intervalle augmenté à %s",
+                    error_count,
+                    new_interval
+                )
+            else:
+                # Revenir à l'intervalle normal si tout va bien
+                _LOGGER.info("[Realtime] PowerBox stable, intervalle normal rétabli")
+            self._effective_interval = new_interval
+        
+        # Prochain cycle calé sur l'horloge murale (:00, :30...) plutôt que relatif au précédent
+        self.update_interval = aligned_interval(self.api_client.clock.time(), new_interval)
+
+    async def async_load_tariff(self, entry_id: str, prices: dict[str, float]) -> None:
+        """Charge les cumuls tarifaires sauvegardés (avant le premier rafraîchissement)."""
+        self._tariff_store = Store(self.hass, STORAGE_VERSION, f"{STORAGE_KEY_TARIFF}.{entry_id}")
+        stored = await self._tariff_store.async_load()
+        self.tariff = TariffAccumulator(prices, stored)
+
+    async def async_save_tariff(self) -> None:
+        """Sauvegarde immédiate des cumuls tarifaires (déchargement)."""
+        if self.tariff is not None and self._tariff_store is not None:
+            await self._tariff_store.async_save(self.tariff.as_dict())
+
+    def set_scan_interval(self, scan_interval: timedelta) -> None:
+        """Applique à chaud un nouvel intervalle.
+
+        L'intervalle aligné est calculé par ``_schedule_next_cycle`` au cycle
+        suivant : l'appelant le déclenche avec ``async_request_refresh``.
+        """
+        self.scan_interval = scan_interval
+        # Intervalle effectif cohérent, sans faux « intervalle normal rétabli »
+        self._effective_interval = realtime_interval(
+            scan_interval, self.api_client.get_consecutive_errors()
+        )
+
+    def _build_snapshot(self, meters_parsed: dict) -> PowerBoxData:
+        """Construit l'instantané publié à partir des compteurs parsés."""
+        tariff = {}
+        if self.tariff is not None:
+            # Écriture différée : au plus une écriture disque toutes les TARIFF_SAVE_DELAY
+            if self.tariff.update(meters_parsed):
+                self._tariff_store.async_delay_save(self.tariff.as_dict, TARIFF_SAVE_DELAY)
+            tariff = self.tariff.snapshot()
+        
+        # Évènements uniquement sur les fronts (branchement, début/fin de charge...)
+        for event_type in self._charge_state.update(meters_parsed):
+            self._fire_charge_event(event_type)
+        
+        self._resample(meters_parsed)
+        return PowerBoxData(
+            meters_parsed=meters_parsed,
+            derived=self._derived.update(meters_parsed),
+            tariff=tariff,
+            charge_state=self._charge_state.state,
+            eta=self.eta.update(meters_parsed, self._charge_state.state),
+            counters=self._track_counters(meters_parsed),
+        )
+
+    def _resample(self, meters_parsed: dict) -> None:
+        """Projette puissance, courant et tension sur la grille uniforme des courbes récentes."""
+        step = self.scan_interval.total_seconds()
+        for name in RESAMPLED_VALUES:
+            resampler = self._resamplers.get(name)
+            if resampler is None or resampler.step != step:
+                resampler = UniformResampler(step, step * RESAMPLE_MAX_GAP_FACTOR)
+                self._resamplers[name] = resampler
+            sample = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, name)
+            if sample is not None:
+                self.series.extend(name, resampler.add(sample[1], float(sample[0])))
+
+    def _track_counters(self, meters_parsed: dict) -> dict[str, float]:
+        """Index des compteurs d'énergie, sans recul parasite."""
+        counters = {}
+        for name, model in ENERGY_COUNTERS.items():
+            sample = meter_sample(meters_parsed, model, name)
+            if sample is None:
+                continue
+            tracker = self._counters[name]
+            resets = tracker.resets
+            tracker.update(float(sample[0]))
+            if tracker.resets != resets:
+                _LOGGER.debug("[Realtime] Remise à zéro du compteur %s", name)
+            counters[name] = tracker.last
+        return counters
+
+    def _fire_charge_event(self, event_type: str) -> None:
+        """Déclenche un évènement de transition de charge sur le bus HA."""
+        session_energy = self._charge_state.session_energy_ws
+        _LOGGER.info("[Realtime] Évènement de charge: %s", event_type)
+        self.hass.bus.async_fire(
+            EVENT_CHARGE,
+            {
+                "type": event_type,
+                "host": self.api_client.host,
+                "state": self._charge_state.state,
+                "session_energy_kwh": round(session_energy / 3600 / 1000, 3)
+                    if session_energy is not None else None,
+            },
+        )
+
+    async def async_burst_sample(self, duration: float, interval: float) -> list[dict]:
+        """Interroge /meters à haute fréquence pendant une durée bornée.
+
+        Le cycle normal est suspendu pendant l'échantillonnage puis reprend
+        avec le dernier échantillon. L'échantillonnage s'arrête à la première
+        erreur pour ne pas insister sur une borne instable.
+        """
+        if self._burst_lock.locked():
+            raise HomeAssistantError("Un échantillonnage rapide est déjà en cours")
+        
+        async with self._burst_lock:
+            samples: deque[dict] = deque(maxlen=BURST_MAX_SAMPLES)
+            loop = self.hass.loop
+            deadline = loop.time() + duration
+            meters_parsed = None
+            self._burst_active = True
+            _LOGGER.info(
+                "[Realtime] Échantillonnage rapide démarré (%ss toutes les %ss)",
+                duration,
+                interval
+            )
+            
+            try:
+                while loop.time() < deadline:
+                    if self.api_client.is_having_issues():
+                        _LOGGER.warning("[Realtime] PowerBox instable, échantillonnage rapide interrompu")
+                        break
+                    
+                    started = loop.time()
+                    meters = await self.hass.async_add_executor_job(
+                        self.api_client.fetch_data, ENDPOINT_METERS, PRIORITY_REALTIME
+                    )
+                    meters_parsed = parse_meters(meters)
+                    samples.append({"time": self.api_client.clock.time(), **flatten_meters(meters_parsed)})
+                    
+                    await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+                    
+            except PowerBoxApiError as err:
+                _LOGGER.warning("[Realtime] Échantillonnage rapide interrompu: %s", err)
+                
+            finally:
+                self._burst_active = False
+            
+            _LOGGER.info("[Realtime] Échantillonnage rapide terminé (%d échantillons)", len(samples))
+            
+            # Publier le dernier échantillon et reprendre le cycle normal
+            if meters_parsed is not None:
+                self.async_set_updated_data(self.stale.store(self._build_snapshot(meters_parsed)))
+            
+            return list(samples)
 
     def get_meter_value(self, meter_model: str, value_name: str):
         """Récupère une valeur spécifique d'un compteur."""
@@ -323,24 +345,59 @@ class PowerBoxRealtimeCoordinator(DataUpdateCoordinator):
             return value_data.get("value")
         return None
 
+    def get_counter_value(self, name: str):
+        """Récupère l'index d'un compteur d'énergie (protégé des reculs parasites)."""
+        if not self.data:
+            return None
+        return self.data.counters.get(name)
 
-class PowerBoxConfigCoordinator(DataUpdateCoordinator):
+    def get_derived_value(self, name: str):
+        """Récupère une métrique dérivée du dernier instantané."""
+        if not self.data:
+            return None
+        return self.data.derived.get(name)
+
+    def get_eta_value(self, name: str):
+        """Récupère une valeur de l'estimation de fin de charge."""
+        if not self.data:
+            return None
+        return self.data.eta.get(name)
+
+    def get_tariff_value(self, kind: str, period: str):
+        """Récupère un cumul tarifaire ("energy_kwh" ou "cost") du dernier instantané."""
+        if not self.data or not self.data.tariff:
+            return None
+        return self.data.tariff[kind].get(period)
+
+
+class PowerBoxConfigCoordinator(TimestampDataUpdateCoordinator):
     """Coordinateur pour la configuration (5 minutes)."""
 
     data: PowerBoxData
 
-    def __init__(self, hass: HomeAssistant, api_client: PowerBoxAPIClient) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_client: PowerBoxAPIClient,
+        scan_interval: timedelta = timedelta(seconds=DEFAULT_SCAN_INTERVAL_CONFIG),
+    ) -> None:
         """Initialisation du coordinateur de configuration."""
         self.api_client = api_client
-        self._last_successful_data = None
+        # La configuration change rarement : elle reste valable bien plus longtemps que les mesures
+        self.stale = StaleWhileRevalidate(CONFIG_MAX_STALE_AGE, api_client.clock)
+        self.schema: ConfigSchema | None = None
+        self._schema_store: Store | None = None
+        self._schema_lock = asyncio.Lock()
+        # Firmwares pour lesquels /configs/modules a échoué (pas de nouvel essai avant rechargement)
+        self._schema_failures: set[str | None] = set()
         
-        # Initialiser DataUpdateCoordinator
+        # Initialiser TimestampDataUpdateCoordinator
         super().__init__(
             hass,
             _LOGGER,
             name="Mobilize PowerBox Config",
             update_method=self.async_update_data,
-            update_interval=SCAN_INTERVAL_CONFIG,
+            update_interval=scan_interval,
         )
 
     async def async_update_data(self) -> PowerBoxData:
@@ -348,7 +405,7 @@ class PowerBoxConfigCoordinator(DataUpdateCoordinator):
         _LOGGER.debug("[Config] Starting configuration update")
         try:
             configs_list = await self.hass.async_add_executor_job(
-                self.api_client.fetch_data, "configs"
+                self.api_client.fetch_data, ENDPOINT_CONFIGS, PRIORITY_CONFIG
             )
             
             # Transformer la liste en dictionnaire
@@ -362,27 +419,35 @@ class PowerBoxConfigCoordinator(DataUpdateCoordinator):
             _LOGGER.debug("[Config] Successfully fetched %d configuration parameters", len(configs))
             
             # Sauvegarder les données réussies
-            result = PowerBoxData(meters_parsed={}, configs=configs)
-            self._last_successful_data = result
+            result = self.stale.store(PowerBoxData(meters_parsed={}, configs=configs))
+            
+            # Nouveau firmware : redécouvrir le schéma en arrière-plan
+            if self._schema_store is not None and self._schema_outdated(configs):
+                self.hass.async_create_task(self._async_update_schema(configs))
             
             return result
             
-        except UpdateFailed as err:
+        except PowerBoxApiError as err:
             # La configuration change rarement, on peut garder les anciennes valeurs
-            if self._last_successful_data:
+            stale = self.stale.serve()
+            if stale is not None:
                 _LOGGER.warning(
-                    "[Config] Erreur de mise à jour, conservation de la dernière configuration: %s",
+                    "[Config] Erreur de mise à jour, conservation de la dernière configuration (âge %ss): %s",
+                    stale.data_age,
                     err
                 )
-                return self._last_successful_data
+                return stale
+            if self.stale.has_data:
+                _LOGGER.error("[Config] Dernière configuration trop ancienne, entités indisponibles: %s", err)
             else:
                 _LOGGER.error("[Config] Failed to update configuration (no previous data): %s", err)
-                raise
+            raise UpdateFailed(str(err)) from err
                 
         except Exception as err:
-            if self._last_successful_data:
+            stale = self.stale.serve()
+            if stale is not None:
                 _LOGGER.warning("[Config] Unexpected error, keeping previous config: %s", err)
-                return self._last_successful_data
+                return stale
             _LOGGER.error("[Config] Failed to update configuration: %s", err)
             raise UpdateFailed(f"Erreur lors de la mise à jour de la configuration: {err}") from err
 
@@ -395,3 +460,231 @@ class PowerBoxConfigCoordinator(DataUpdateCoordinator):
         if config:
             return config.get("config_value")
         return None
+
+    def get_typed_config_value(self, config_key: str):
+        """Récupère une valeur de configuration typée selon le schéma du firmware."""
+        value = self.get_config_value(config_key)
+        if self.schema is None:
+            return value
+        return self.schema.coerce(config_key, value)
+
+    def validate_config_value(self, config_key: str, value):
+        """Valide une valeur avant écriture et la retourne typée.
+
+        Sans schéma (firmware ne l'exposant pas) ou pour un paramètre absent du
+        schéma, la valeur est retournée telle quelle.
+        """
+        if self.schema is None:
+            return value
+        try:
+            return self.schema.validate(config_key, value)
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+
+    async def async_write_config(self, config_key: str, value) -> bool:
+        """Écrit un paramètre validé par le schéma, puis confirme par une relecture.
+
+        Retourne True si la valeur relue est celle demandée.
+        """
+        typed = self.validate_config_value(config_key, value)
+        item = self.data.configs.get(config_key) if self.data and self.data.configs else None
+        if item:
+            module, name = item["module_name"], item["config_name"]
+        else:
+            module, name = config_key.rsplit(".", 1)
+        
+        try:
+            await self.hass.async_add_executor_job(
+                self.api_client.write_config, module, name, typed, PRIORITY_CONFIG
+            )
+        except PowerBoxApiError as err:
+            raise HomeAssistantError(str(err)) from err
+        
+        # Une seule relecture ciblée, qui met aussi à jour les capteurs de configuration
+        await self.async_refresh()
+        return str(self.get_typed_config_value(config_key)) == str(typed)
+
+    async def async_load_schema(self, entry_id: str) -> None:
+        """Charge le schéma en cache, et ne le redécouvre que si le firmware a changé."""
+        self._schema_store = Store(self.hass, STORAGE_VERSION, f"{STORAGE_KEY_SCHEMA}.{entry_id}")
+        stored = await self._schema_store.async_load()
+        if stored and stored.get("entries"):
+            self.schema = ConfigSchema.from_dict(stored)
+        
+        configs = self.data.configs if self.data and self.data.configs else {}
+        if self._schema_outdated(configs):
+            await self._async_update_schema(configs)
+
+    def _schema_outdated(self, configs: dict) -> bool:
+        """Le schéma en cache ne correspond pas au firmware annoncé."""
+        firmware = firmware_version(configs)
+        if self.schema is not None and self.schema.firmware == firmware:
+            return False
+        return firmware not in self._schema_failures
+
+    async def _async_update_schema(self, configs: dict) -> None:
+        """Récupère /configs/modules pour le firmware courant et le met en cache."""
+        if self._schema_lock.locked():
+            return
+        
+        async with self._schema_lock:
+            firmware = firmware_version(configs)
+            try:
+                modules = await self.hass.async_add_executor_job(
+                    self.api_client.fetch_data, ENDPOINT_CONFIGS_MODULES, PRIORITY_DIAGNOSTIC
+                )
+            except PowerBoxApiError as err:
+                _LOGGER.warning("[Config] Schéma des paramètres indisponible: %s", err)
+                self._schema_failures.add(firmware)
+                return
+            
+            previous = self.schema.firmware if self.schema else None
+            entries = parse_modules(modules)
+            if entries:
+                self.schema = ConfigSchema(firmware, entries)
+                await self._schema_store.async_save(self.schema.as_dict())
+                _LOGGER.info(
+                    "[Config] Schéma découvert pour le firmware %s (%d paramètres)",
+                    firmware or "inconnu",
+                    len(self.schema)
+                )
+            else:
+                # Forme non reconnue : rien n'est mis en cache, les écritures ne sont pas validées
+                _LOGGER.warning(
+                    "[Config] Schéma des paramètres non reconnu pour le firmware %s, écritures non validées",
+                    firmware or "inconnu"
+                )
+                self._schema_failures.add(firmware)
+            
+            # Mise à jour de l'appareil après une mise à jour du firmware
+            if previous != firmware:
+                device_registry = dr.async_get(self.hass)
+                device = device_registry.async_get_device(identifiers={(DOMAIN, self.api_client.host)})
+                if device is not None:
+                    device_registry.async_update_device(device.id, **device_metadata(configs))
+
+
+class PowerBoxTokensCoordinator(TimestampDataUpdateCoordinator):
+    """Coordinateur de l'inventaire des badges et des cumuls par badge.
+
+    La liste des badges est synchronisée rarement, et en plus au début d'une
+    session tant que celle-ci n'est attribuée à aucun badge. L'énergie des
+    sessions est suivie sur les rafraîchissements du coordinateur temps réel.
+    """
+
+    data: TokenInventory
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_client: PowerBoxAPIClient,
+        coordinator_realtime: PowerBoxRealtimeCoordinator,
+        scan_interval: timedelta = timedelta(seconds=TOKENS_SCAN_INTERVAL),
+    ) -> None:
+        """Initialisation du coordinateur des badges."""
+        self.api_client = api_client
+        self.coordinator_realtime = coordinator_realtime
+        self.inventory = TokenInventory()
+        # False si le firmware ne propose pas /tokens : plus aucune synchronisation
+        self.supported = True
+        self._store: Store | None = None
+        self._charge_state: str | None = None
+        self._unsub_realtime: CALLBACK_TYPE | None = None
+        
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="Mobilize PowerBox Tokens",
+            update_method=self.async_update_data,
+            update_interval=scan_interval,
+        )
+
+    async def async_load(self, entry_id: str) -> None:
+        """Restaure l'inventaire, les cumuls et la session en cours."""
+        self._store = Store(self.hass, STORAGE_VERSION, f"{STORAGE_KEY_TOKENS}.{entry_id}")
+        self.inventory = TokenInventory(await self._store.async_load())
+
+    async def async_save(self) -> None:
+        """Sauvegarde immédiate (déchargement)."""
+        if self._store is not None:
+            await self._store.async_save(self.inventory.as_dict())
+
+    @callback
+    def async_start(self) -> None:
+        """Suit les sessions sur les rafraîchissements temps réel."""
+        self._unsub_realtime = self.coordinator_realtime.async_add_listener(self._handle_realtime_update)
+
+    @callback
+    def async_stop(self) -> None:
+        """Arrête le suivi des sessions."""
+        if self._unsub_realtime is not None:
+            self._unsub_realtime()
+            self._unsub_realtime = None
+
+    async def async_update_data(self) -> TokenInventory:
+        """Synchronise la liste des badges (seules les différences sont appliquées)."""
+        if not self.supported:
+            return self.inventory
+        try:
+            response = await self.hass.async_add_executor_job(
+                self.api_client.fetch_data, ENDPOINT_TOKENS, PRIORITY_DIAGNOSTIC
+            )
+        except PowerBoxNotSupported:
+            # Comme le schéma des paramètres : on ne redemande pas avant un rechargement
+            _LOGGER.info("[Tokens] Liste des badges non proposée par le firmware, synchronisation désactivée")
+            self.supported = False
+            self.update_interval = None
+            return self.inventory
+        except PowerBoxApiError as err:
+            raise UpdateFailed(str(err)) from err
+        
+        changes = self.inventory.apply(parse_tokens(response))
+        attributed = self.inventory.attribute(TOKEN_ATTRIBUTION_WINDOW)
+        if any(changes.values()):
+            _LOGGER.debug(
+                "[Tokens] Inventaire mis à jour: %d ajouté(s), %d supprimé(s), %d modifié(s)",
+                len(changes["added"]), len(changes["removed"]), len(changes["changed"])
+            )
+        if attributed is not None:
+            _LOGGER.info("[Tokens] Session attribuée au badge %s", self.inventory.token_name(attributed))
+        if any(changes.values()) or attributed is not None:
+            self._async_delay_save()
+        return self.inventory
+
+    @callback
+    def _handle_realtime_update(self) -> None:
+        """Ouvre, ferme et cumule les sessions à partir de l'état de charge."""
+        data = self.coordinator_realtime.data
+        if not data or not self.coordinator_realtime.last_update_success or data.charge_state is None:
+            return
+        
+        previous, self._charge_state = self._charge_state, data.charge_state
+        changed = False
+        if data.charge_state == CHARGE_STATE_UNPLUGGED:
+            if self.inventory.session is not None:
+                self.inventory.end_session()
+                changed = True
+        else:
+            if self.inventory.session is None:
+                self.inventory.start_session(self.api_client.clock.time())
+                changed = True
+            energy = data.counters.get("SessionTotalEnergy_Ws")
+            if energy is not None:
+                changed |= self.inventory.add_session_energy(energy)
+            # Badge présenté à l'instant : synchronisation anticipée pour l'attribuer
+            if self.supported and self.inventory.session["token"] is None and data.charge_state != previous:
+                self.hass.async_create_task(self.async_request_refresh())
+        
+        if changed:
+            self._async_delay_save()
+            self.async_update_listeners()
+
+    @callback
+    def _async_delay_save(self) -> None:
+        """Écriture différée : au plus une écriture disque toutes les TOKENS_SAVE_DELAY."""
+        if self._store is not None:
+            self._store.async_delay_save(self.inventory.as_dict, TOKENS_SAVE_DELAY)
+
+    def get_token_energy(self, token_id: str) -> float:
+        """Énergie cumulée d'un badge (kWh)."""
+        return self.inventory.totals.get(token_id, {}).get("energy_wh", 0.0) / 1000
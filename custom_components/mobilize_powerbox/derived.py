@@ -0,0 +1,79 @@
+"""Métriques dérivées des mesures de la PowerBox.
+
+Calculées une seule fois par rafraîchissement du coordinateur temps réel, à
+partir des compteurs déjà parsés, plutôt que par des template sensors
+réévalués à chaque changement d'état.
+"""
+from __future__ import annotations
+
+from .const import (
+    DERIVED_HOUSEHOLD_POWER,
+    DERIVED_POWER_FACTOR,
+    DERIVED_POWER_RATE,
+    METER_MODEL_TIC,
+    METER_MODEL_VIRTUAL,
+)
+
+
+def meter_sample(meters_parsed: dict, model: str, name: str) -> tuple[float, float] | None:
+    """Retourne (valeur, horodatage) d'un compteur connecté, ou None."""
+    meter = meters_parsed.get(model)
+    if not meter or not meter.get("connected"):
+        return None
+    value_data = meter.get("values", {}).get(name)
+    if not value_data or value_data.get("value") is None:
+        return None
+    return value_data["value"], timestamp_seconds(value_data.get("timestamp", 0))
+
+
+def timestamp_seconds(timestamp) -> float:
+    """Convertit un horodatage de la borne en secondes (accepte les millisecondes)."""
+    try:
+        timestamp = float(timestamp)
+    except (TypeError, ValueError):
+        return 0.0
+    return timestamp / 1000 if timestamp > 1e11 else timestamp
+
+
+class DerivedMetrics:
+    """Étape de calcul des métriques dérivées, avec état entre deux cycles."""
+
+    def __init__(self) -> None:
+        """Initialisation."""
+        self._last_power: tuple[float, float] | None = None
+        self._power_rate: float | None = None
+
+    def update(self, meters_parsed: dict) -> dict:
+        """Calcule les métriques dérivées d'un nouvel instantané."""
+        power = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "ActivePower_W")
+        voltage = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "Voltage_mV")
+        current = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "Current_mA")
+        tic_power = meter_sample(meters_parsed, METER_MODEL_TIC, "ApparentPower_VA")
+
+        # Consommation du foyer hors borne
+        household_power = None
+        if tic_power is not None and power is not None:
+            household_power = max(0.0, tic_power[0] - power[0])
+
+        # Facteur de puissance instantané : P / (U × I)
+        power_factor = None
+        if power is not None and voltage is not None and current is not None:
+            apparent_power = voltage[0] * current[0] / 1_000_000  # mV × mA vers VA
+            if apparent_power >= 1:
+                power_factor = min(1.0, max(0.0, power[0] / apparent_power))
+
+        # dP/dt, uniquement quand la borne a produit une nouvelle mesure
+        if power is None:
+            self._last_power = None
+            self._power_rate = None
+        elif self._last_power is None:
+            self._last_power = power
+        elif power[1] > self._last_power[1]:
+            self._power_rate = (power[0] - self._last_power[0]) / (power[1] - self._last_power[1])
+            self._last_power = power
+
+        return {
+            DERIVED_HOUSEHOLD_POWER: household_power,
+            DERIVED_POWER_FACTOR: power_factor,
+            DERIVED_POWER_RATE: self._power_rate,
+        }
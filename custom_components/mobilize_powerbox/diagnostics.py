@@ -25,7 +25,10 @@ async def async_get_config_entry_diagnostics(
 ) -> dict[str, Any]:
     """Retourne les informations de diagnostic pour une config entry."""
     
-    coordinator = hass.data[DOMAIN][entry.entry_id][DATA_COORDINATOR]
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = entry_data[DATA_COORDINATOR]
+    coordinator_config = entry_data["coordinator_config"]
+    api_client = entry_data["api_client"]
     
     # Collecter les données de diagnostic
     diagnostics_data = {
@@ -40,10 +43,30 @@ async def async_get_config_entry_diagnostics(
             "last_update_time": coordinator.last_update_success_time.isoformat() 
                 if coordinator.last_update_success_time else None,
             "update_interval": str(coordinator.update_interval),
+            "served_from_cache": coordinator.data.served_from_cache if coordinator.data else None,
+            "stale": coordinator.stale.get_stats(),
+            "config_stale": coordinator_config.stale.get_stats(),
+        },
+        "api_client": {
+            "stats": api_client.get_stats(),
+            "rate_limiter": api_client.get_limiter_stats(),
+            "timeouts": api_client.get_timeout_stats(),
+            "request_queue": api_client.get_queue_stats(),
+        },
+        "schema": {
+            "firmware": coordinator_config.schema.firmware,
+            "parameters": coordinator_config.schema.entries,
+        } if coordinator_config.schema else None,
+        # Identifiants et noms des badges non exportés
+        "tokens": {
+            "count": len(entry_data["coordinator_tokens"].inventory.tokens),
+            "with_totals": len(entry_data["coordinator_tokens"].inventory.totals),
+            "session_active": entry_data["coordinator_tokens"].inventory.session is not None,
+            "last_update_success": entry_data["coordinator_tokens"].last_update_success,
         },
         "data": {
-            "meters": coordinator.data.get("meters", {}) if coordinator.data else None,
-            "configs": coordinator.data.get("configs", {}) if coordinator.data else None,
+            "meters": coordinator.data.meters_parsed if coordinator.data else None,
+            "configs": coordinator_config.data.configs if coordinator_config.data else None,
         },
         "config": async_redact_data(entry.data, TO_REDACT),
     }
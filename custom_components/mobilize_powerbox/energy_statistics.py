@@ -0,0 +1,124 @@
+"""Import direct des statistiques long terme d'énergie.
+
+Les statistiques horaires (énergie totale et énergie des sessions) sont
+calculées par l'intégration à partir des mesures du coordinateur temps
+réel, et importées comme statistiques externes via l'API du recorder. Elles
+ne dépendent donc ni des états enregistrés ni du compilateur de
+statistiques : les capteurs d'énergie peuvent être exclus du recorder, et
+une interruption de Home Assistant est comblée à partir du compteur cumulatif
+de la borne.
+"""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import (
+    DOMAIN,
+    ENERGY_COUNTERS,
+    STATISTICS_SAVE_DELAY,
+    STORAGE_KEY_STATISTICS,
+    STORAGE_VERSION,
+)
+from .coordinator import PowerBoxRealtimeCoordinator
+from .derived import meter_sample
+from .hourly import HourlyEnergy
+
+_LOGGER = logging.getLogger(__name__)
+
+# Compteur de la borne -> (suffixe de la statistique, libellé)
+STATISTICS = {
+    "ActiveEnergy_Ws": ("total_energy", "Énergie Totale"),
+    "SessionTotalEnergy_Ws": ("session_energy", "Énergie Sessions"),
+}
+
+
+def statistic_id(host: str, counter: str) -> str:
+    """Identifiant de la statistique externe d'un compteur (``mobilize_powerbox:...``)."""
+    return f"{DOMAIN}:{slugify(host)}_{STATISTICS[counter][0]}"
+
+
+class EnergyStatisticsImporter:
+    """Calcule et importe les statistiques horaires d'énergie d'une borne."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator_realtime: PowerBoxRealtimeCoordinator,
+        host: str,
+        name: str,
+    ) -> None:
+        """Initialisation."""
+        self.hass = hass
+        self.coordinator_realtime = coordinator_realtime
+        self.host = host
+        self.name = name
+        self._hourly: dict[str, HourlyEnergy] = {}
+        self._store: Store | None = None
+        self._unsub: CALLBACK_TYPE | None = None
+
+    async def async_start(self, entry_id: str) -> None:
+        """Restaure les cumuls et suit les mesures temps réel."""
+        self._store = Store(self.hass, STORAGE_VERSION, f"{STORAGE_KEY_STATISTICS}.{entry_id}")
+        stored = await self._store.async_load() or {}
+        self._hourly = {counter: HourlyEnergy(stored.get(counter)) for counter in STATISTICS}
+        self._unsub = self.coordinator_realtime.async_add_listener(self._handle_realtime_update)
+        # Les heures manquées pendant l'arrêt sont comblées dès la première mesure
+        self._handle_realtime_update()
+
+    async def async_stop(self) -> None:
+        """Arrête le suivi et sauvegarde l'heure en cours."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+        if self._store is not None:
+            await self._store.async_save(self._as_dict())
+
+    @callback
+    def _handle_realtime_update(self) -> None:
+        """Répartit la nouvelle énergie sur les heures et importe les heures terminées."""
+        data = self.coordinator_realtime.data
+        if not data or not self.coordinator_realtime.last_update_success:
+            return
+
+        imported = False
+        for counter, hourly in self._hourly.items():
+            sample = meter_sample(data.meters_parsed, ENERGY_COUNTERS[counter], counter)
+            if sample is None:
+                continue
+            ts = sample[1] or self.coordinator_realtime.api_client.clock.time()
+            completed = hourly.update(ts, float(sample[0]))
+            if completed:
+                self._import(counter, completed)
+                imported = True
+
+        if imported:
+            self._store.async_delay_save(self._as_dict, STATISTICS_SAVE_DELAY)
+
+    def _import(self, counter: str, completed: list[tuple[float, float]]) -> None:
+        """Importe des heures terminées dans les statistiques long terme."""
+        suffix_label = STATISTICS[counter][1]
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{self.name} {suffix_label}",
+            source=DOMAIN,
+            statistic_id=statistic_id(self.host, counter),
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        )
+        statistics = [
+            StatisticData(start=dt_util.utc_from_timestamp(start), sum=total)
+            for start, total in completed
+        ]
+        _LOGGER.debug("Import de %d heure(s) pour %s", len(statistics), metadata["statistic_id"])
+        async_add_external_statistics(self.hass, metadata, statistics)
+
+    def _as_dict(self) -> dict:
+        """État sérialisable pour le stockage persistant."""
+        return {counter: hourly.as_dict() for counter, hourly in self._hourly.items()}
@@ -0,0 +1,144 @@
+"""Estimation incrémentale de la fin de charge.
+
+Pendant la charge à courant constant, la puissance est à peu près fixe :
+le temps pour atteindre un objectif d'énergie se déduit de la puissance
+moyenne récente. En fin de charge, le véhicule réduit sa puissance à mesure
+que la batterie se remplit ; cette décroissance est modélisée comme une
+droite de la puissance en fonction de l'énergie de la session,
+P(E) = a + b·E, ajustée par moindres carrés récursifs avec oubli
+exponentiel. Chaque nouvel échantillon met à jour cinq sommes : le coût est
+constant, sans relire l'historique.
+
+Avec dE/dt = P(E), le temps pour passer de E0 à E1 vaut
+ln(P(E1) / P(E0)) / b (en heures, E en Wh) ; l'énergie projetée de la
+session est celle où la droite atteint ``ETA_END_POWER``.
+"""
+from __future__ import annotations
+
+import math
+
+from .const import (
+    CHARGE_STATE_CHARGING,
+    CHARGE_STATE_UNPLUGGED,
+    ETA_END_POWER,
+    ETA_FORGETTING,
+    ETA_MIN_TAPER_SAMPLES,
+    ETA_TAPER_RATIO,
+    METER_MODEL_VIRTUAL,
+)
+from .derived import meter_sample
+
+
+class ChargeEtaEstimator:
+    """Ajustement en ligne de la courbe de charge d'une session."""
+
+    def __init__(self) -> None:
+        """Initialisation."""
+        self.target_wh = 0.0  # objectif d'énergie de session (0 : aucun)
+        self._result: dict = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Oublie la session en cours."""
+        self._last_ts: float | None = None
+        self._last_energy: float | None = None
+        self._mean_power: float | None = None
+        self._peak_power = 0.0
+        self._tapering = False
+        self._sums = [0.0] * 5  # Σw, Σw·E, Σw·P, Σw·E², Σw·E·P
+        self._count = 0
+
+    def update(self, meters_parsed: dict, charge_state: str | None) -> dict:
+        """Prend en compte un nouvel instantané ; ne recalcule que sur un nouvel échantillon."""
+        power = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "ActivePower_W")
+        energy = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "SessionTotalEnergy_Ws")
+        if charge_state == CHARGE_STATE_UNPLUGGED or power is None or energy is None:
+            if self._last_ts is not None:
+                self.reset()
+                self._result = {}
+            return self._result
+
+        ts = power[1]
+        energy_wh = float(energy[0]) / 3600
+        if self._last_energy is not None and energy_wh < self._last_energy:
+            # Nouvelle session (compteur remis à zéro)
+            self.reset()
+        if self._last_ts is not None and ts <= self._last_ts:
+            return self._result
+        self._last_ts = ts
+        self._last_energy = energy_wh
+
+        if charge_state == CHARGE_STATE_CHARGING:
+            self._add(float(power[0]), energy_wh)
+            self._result = self._estimate(ts, energy_wh)
+        else:
+            # Pause : l'heure de fin n'est plus connue, l'énergie projetée reste valable
+            self._result = {**self._result, "end": None, "target": None}
+        return self._result
+
+    def _add(self, power_w: float, energy_wh: float) -> None:
+        """Met à jour la puissance moyenne et, en fin de charge, la régression."""
+        if self._mean_power is None:
+            self._mean_power = power_w
+        else:
+            self._mean_power = ETA_FORGETTING * self._mean_power + (1 - ETA_FORGETTING) * power_w
+
+        if self._tapering and power_w > self._peak_power:
+            # Remontée au-delà du pic (consigne relevée) : ce n'était pas la fin de charge
+            self._tapering = False
+            self._sums = [0.0] * 5
+            self._count = 0
+        if not self._tapering:
+            self._peak_power = max(self._peak_power, power_w)
+            if power_w >= self._peak_power * ETA_TAPER_RATIO:
+                return
+            # Début de la décroissance : seuls les points suivants décrivent la fin de charge
+            self._tapering = True
+
+        sums = self._sums
+        for index, value in enumerate((1.0, energy_wh, power_w, energy_wh * energy_wh, energy_wh * power_w)):
+            sums[index] = ETA_FORGETTING * sums[index] + value
+        self._count += 1
+
+    def _line(self) -> tuple[float, float] | None:
+        """Droite P(E) = a + b·E de la fin de charge, si elle décroît."""
+        if self._count < ETA_MIN_TAPER_SAMPLES:
+            return None
+        weight, sum_e, sum_p, sum_ee, sum_ep = self._sums
+        denominator = weight * sum_ee - sum_e * sum_e
+        if denominator <= 0:
+            return None
+        slope = (weight * sum_ep - sum_e * sum_p) / denominator
+        if slope >= 0:
+            return None
+        return (sum_p - slope * sum_e) / weight, slope
+
+    def _estimate(self, ts: float, energy_wh: float) -> dict:
+        """Énergie projetée et horodatages de fin et d'atteinte de l'objectif."""
+        line = self._line()
+        projected_wh = None
+        end = None
+        if line is not None:
+            intercept, slope = line
+            start_power = intercept + slope * energy_wh
+            if start_power > ETA_END_POWER:
+                projected_wh = (ETA_END_POWER - intercept) / slope
+                end = ts + 3600 * math.log(ETA_END_POWER / start_power) / slope
+
+        target = None
+        if self.target_wh > energy_wh and (projected_wh is None or self.target_wh <= projected_wh):
+            if line is not None and projected_wh is not None:
+                intercept, slope = line
+                target_power = intercept + slope * self.target_wh
+                target = ts + 3600 * math.log(target_power / (intercept + slope * energy_wh)) / slope
+            elif self._mean_power:
+                target = ts + 3600 * (self.target_wh - energy_wh) / self._mean_power
+        elif self.target_wh and self.target_wh <= energy_wh:
+            target = ts
+
+        return {
+            "projected_energy_kwh": round(projected_wh / 1000, 2) if projected_wh is not None else None,
+            "end": round(end) if end is not None else None,
+            "target": round(target) if target is not None else None,
+            "tapering": self._tapering,
+        }
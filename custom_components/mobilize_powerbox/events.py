@@ -0,0 +1,100 @@
+"""Machine à états branchement / charge de la PowerBox.
+
+Les transitions sont dérivées des mesures temps réel et anti-rebondies : un
+nouvel état n'est validé qu'après avoir été observé sur plusieurs
+rafraîchissements consécutifs. Seuls les fronts produisent des évènements.
+"""
+from __future__ import annotations
+
+from .const import (
+    CHARGE_EVENT_PAUSED,
+    CHARGE_EVENT_PLUGGED,
+    CHARGE_EVENT_RESUMED,
+    CHARGE_EVENT_SESSION_ENDED,
+    CHARGE_EVENT_STARTED,
+    CHARGE_STATE_CHARGING,
+    CHARGE_STATE_DEBOUNCE,
+    CHARGE_STATE_PAUSED,
+    CHARGE_STATE_PLUGGED,
+    CHARGE_STATE_UNPLUGGED,
+    CHARGING_POWER_THRESHOLD,
+    METER_MODEL_VIRTUAL,
+)
+from .derived import meter_sample
+
+
+def observed_state(meters_parsed: dict) -> str:
+    """État instantané (non anti-rebondi) déduit d'un instantané."""
+    meter = meters_parsed.get(METER_MODEL_VIRTUAL)
+    if not meter or not meter.get("connected"):
+        return CHARGE_STATE_UNPLUGGED
+
+    power = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "ActivePower_W")
+    if power is not None and power[0] >= CHARGING_POWER_THRESHOLD:
+        return CHARGE_STATE_CHARGING
+
+    # Branchée sans puissance : suspendue si la session a déjà consommé
+    energy = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "SessionTotalEnergy_Ws")
+    if energy is not None and energy[0] > 0:
+        return CHARGE_STATE_PAUSED
+    return CHARGE_STATE_PLUGGED
+
+
+def transition_events(previous: str | None, state: str) -> list[str]:
+    """Évènements correspondant au passage de ``previous`` à ``state``."""
+    if previous is None or previous == state:
+        return []
+    if state == CHARGE_STATE_UNPLUGGED:
+        return [CHARGE_EVENT_SESSION_ENDED]
+
+    events = []
+    if previous == CHARGE_STATE_UNPLUGGED:
+        events.append(CHARGE_EVENT_PLUGGED)
+    if state == CHARGE_STATE_CHARGING:
+        events.append(CHARGE_EVENT_RESUMED if previous == CHARGE_STATE_PAUSED else CHARGE_EVENT_STARTED)
+    elif state == CHARGE_STATE_PAUSED and previous == CHARGE_STATE_CHARGING:
+        events.append(CHARGE_EVENT_PAUSED)
+    return events
+
+
+class ChargeStateMachine:
+    """Suit l'état de charge validé et produit les évènements de transition."""
+
+    def __init__(self, debounce: int = CHARGE_STATE_DEBOUNCE) -> None:
+        """Initialisation."""
+        self.debounce = debounce
+        self.state: str | None = None
+        # Dernière énergie de session vue branchée (la borne la remet à zéro)
+        self.session_energy_ws: float | None = None
+        self._candidate: str | None = None
+        self._candidate_count = 0
+
+    def update(self, meters_parsed: dict) -> list[str]:
+        """Prend en compte un nouvel instantané et retourne les évènements validés."""
+        observed = observed_state(meters_parsed)
+        if observed != CHARGE_STATE_UNPLUGGED:
+            energy = meter_sample(meters_parsed, METER_MODEL_VIRTUAL, "SessionTotalEnergy_Ws")
+            if energy is not None:
+                self.session_energy_ws = energy[0]
+
+        # Premier instantané : état initial sans évènement
+        if self.state is None:
+            self.state = observed
+            return []
+
+        if observed == self.state:
+            self._candidate = None
+            self._candidate_count = 0
+            return []
+
+        if observed != self._candidate:
+            self._candidate = observed
+            self._candidate_count = 0
+        self._candidate_count += 1
+        if self._candidate_count < self.debounce:
+            return []
+
+        previous, self.state = self.state, observed
+        self._candidate = None
+        self._candidate_count = 0
+        return transition_events(previous, observed)
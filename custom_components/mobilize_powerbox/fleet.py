@@ -0,0 +1,99 @@
+"""Répartition équitable du courant entre les bornes d'un site.
+
+Chaque borne branchée reçoit une part de la puissance disponible du site
+proportionnelle à son poids (priorité). La somme des poids des bornes
+actives est tenue à jour incrémentalement : le calcul de la consigne d'une
+borne, fait à chacun de ses rafraîchissements, est en temps constant quel
+que soit le nombre de bornes.
+
+La part en watts est convertie en ampères avec le rapport puissance/courant
+observé sur la borne pendant la charge (tension, nombre de phases et cos φ
+compris), conservé pendant une pause, ou une valeur monophasée par défaut. Une part inférieure au
+courant minimum d'une charge (IEC 61851) suspend la borne plutôt que de lui
+allouer un courant qu'elle ne peut pas tenir.
+"""
+from __future__ import annotations
+
+import math
+
+from .const import FLEET_DEADBAND, FLEET_MIN_CURRENT, FLEET_MIN_WRITE_INTERVAL, FLEET_WATTS_PER_AMP
+
+# Courant (A) en dessous duquel le rapport puissance/courant n'est pas fiable
+_MIN_MEASURED_CURRENT = 1.0
+
+
+def watts_per_amp(
+    power_w: float | None, current_a: float | None, default: float = FLEET_WATTS_PER_AMP
+) -> float:
+    """Rapport puissance/courant observé, ou ``default`` hors charge."""
+    if power_w is None or current_a is None or current_a < _MIN_MEASURED_CURRENT or power_w <= 0:
+        return default
+    return power_w / current_a
+
+
+def setpoint_amps(share_w: float, ratio: float, max_current: float) -> int:
+    """Consigne entière (A) pour une part de puissance : 0 sous le minimum, plafonnée."""
+    amps = math.floor(max(0.0, share_w) / ratio)
+    if amps < FLEET_MIN_CURRENT:
+        return 0
+    return int(min(amps, max_current))
+
+
+class FairShares:
+    """Poids des bornes actives et somme tenue incrémentalement."""
+
+    def __init__(self) -> None:
+        """Initialisation."""
+        self._weights: dict[str, float] = {}
+        self.total_weight = 0.0
+
+    def set_active(self, box_id: str, weight: float | None) -> None:
+        """Active une borne avec son poids, ou la retire (``None``)."""
+        old = self._weights.pop(box_id, 0.0)
+        if weight:
+            self._weights[box_id] = weight
+        self.total_weight += (weight or 0.0) - old
+        if not self._weights:
+            # Évite la dérive des flottants une fois toutes les bornes retirées
+            self.total_weight = 0.0
+
+    def share(self, box_id: str, available_w: float) -> float:
+        """Part (W) de la puissance disponible revenant à une borne active."""
+        weight = self._weights.get(box_id)
+        if not weight or self.total_weight <= 0:
+            return 0.0
+        return available_w * weight / self.total_weight
+
+
+class SetpointThrottle:
+    """Limite les écritures de consigne d'une borne.
+
+    Une baisse est écrite immédiatement (protection du site) ; une hausse
+    n'est écrite que si elle atteint ``FLEET_DEADBAND`` et au plus une fois
+    par ``FLEET_MIN_WRITE_INTERVAL``.
+    """
+
+    def __init__(self) -> None:
+        """Initialisation."""
+        self.last_setpoint: int | None = None
+        self._last_write: float | None = None
+
+    def should_write(self, setpoint: int, now: float) -> bool:
+        """Indique si la consigne doit être écrite maintenant."""
+        last = self.last_setpoint
+        if last is None:
+            return True
+        if setpoint < last:
+            return True
+        if setpoint - last < FLEET_DEADBAND:
+            return False
+        return self._elapsed(now)
+
+    def written(self, setpoint: int, now: float) -> None:
+        """Enregistre une écriture."""
+        self.last_setpoint = setpoint
+        self._last_write = now
+
+    def _elapsed(self, now: float) -> bool:
+        """Délai minimal écoulé depuis la dernière écriture."""
+        return self._last_write is None or now - self._last_write >= FLEET_MIN_WRITE_INTERVAL
@@ -0,0 +1,244 @@
+"""Allocation du courant de charge d'une flotte de PowerBox sous une limite de site.
+
+La gestion dynamique de charge de chaque borne ne connaît que sa propre
+consommation. L'allocateur répartit la puissance disponible du site (limite
+de site moins la consommation hors bornes, lue sur un compteur de site
+optionnel) entre les bornes branchées, au prorata de leur poids. La
+consigne d'une borne est recalculée à chacun de ses rafraîchissements temps
+réel, en temps constant ; seules les consignes modifiées sont écrites, avec
+une limitation des hausses (voir ``fleet.SetpointThrottle``).
+
+Une borne injoignable (rafraîchissement en échec ou données servies depuis
+le cache) garde le dernier courant qui lui a été écrit : sa part n'est pas
+redistribuée, la puissance correspondante reste réservée jusqu'à ce qu'elle
+réponde à nouveau. Seule une borne qui signale être débranchée libère sa
+part.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN, UnitOfPower
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .aggregate import SiteAggregator, get_site_aggregator
+from .charge_scheduler import ChargeScheduler
+from .const import (
+    CHARGE_STATE_UNPLUGGED,
+    CONFIG_KEY_MAX_CURRENT,
+    DATA_FLEET,
+    FLEET_MAX_CURRENT,
+    FLEET_WATTS_PER_AMP,
+    METER_MODEL_VIRTUAL,
+)
+from .coordinator import PowerBoxConfigCoordinator, PowerBoxRealtimeCoordinator
+from .fleet import FairShares, SetpointThrottle, setpoint_amps, watts_per_amp
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class FleetBox:
+    """Borne suivie par l'allocateur."""
+
+    coordinator_realtime: PowerBoxRealtimeCoordinator
+    coordinator_config: PowerBoxConfigCoordinator
+    weight: float
+    scheduler: ChargeScheduler | None = None
+    active: bool = False
+    share_w: float = 0.0
+    reserved_w: float = 0.0
+    setpoint: int | None = None
+    written_setpoint: int | None = None  # dernière consigne confirmée par la borne
+    watts_per_amp: float = FLEET_WATTS_PER_AMP
+    throttle: SetpointThrottle = field(default_factory=SetpointThrottle)
+    write_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    unsubs: list[CALLBACK_TYPE] = field(default_factory=list)
+    listeners: set[CALLBACK_TYPE] = field(default_factory=set)
+
+
+class FleetAllocator:
+    """Répartit la puissance disponible du site entre les bornes de la flotte."""
+
+    def __init__(self, hass: HomeAssistant, aggregator: SiteAggregator) -> None:
+        """Initialisation."""
+        self.hass = hass
+        self.aggregator = aggregator
+        self._shares = FairShares()
+        self._boxes: dict[str, FleetBox] = {}
+        self._site_meters: dict[str, str] = {}
+        self.reserved_power = 0.0  # somme des réservations des bornes injoignables
+
+    @property
+    def site_meter(self) -> str | None:
+        """Entité de puissance du site (la première configurée), ou None."""
+        return next((meter for meter in self._site_meters.values() if meter), None)
+
+    @property
+    def base_load(self) -> float:
+        """Consommation du site hors bornes (W), 0 sans compteur de site."""
+        meter = self.site_meter
+        state = self.hass.states.get(meter) if meter else None
+        if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return 0.0
+        try:
+            site_power = float(state.state)
+        except ValueError:
+            return 0.0
+        if state.attributes.get("unit_of_measurement") == UnitOfPower.KILO_WATT:
+            site_power *= 1000
+        # Les bornes injoignables ne comptent pas dans les totaux du site : leur
+        # réservation tient lieu de consommation
+        return max(0.0, site_power - self.aggregator.total_power - self.reserved_power)
+
+    @property
+    def available_power(self) -> float | None:
+        """Puissance (W) à répartir entre les bornes, ou None sans limite de site."""
+        limit = self.aggregator.site_power_limit
+        if limit is None:
+            return None
+        return max(0.0, limit - self.base_load - self.reserved_power)
+
+    def get_box(self, entry_id: str) -> FleetBox | None:
+        """Borne suivie, ou None."""
+        return self._boxes.get(entry_id)
+
+    @callback
+    def async_add_box(
+        self,
+        entry_id: str,
+        coordinator_realtime: PowerBoxRealtimeCoordinator,
+        coordinator_config: PowerBoxConfigCoordinator,
+        weight: float,
+        site_meter: str,
+        scheduler: ChargeScheduler | None,
+    ) -> None:
+        """Commence à piloter une borne."""
+        box = FleetBox(coordinator_realtime, coordinator_config, weight, scheduler)
+        self._boxes[entry_id] = box
+        self._site_meters[entry_id] = site_meter
+        box.unsubs.append(coordinator_realtime.async_add_listener(lambda: self._async_update_box(entry_id)))
+        if scheduler is not None:
+            # La planification ne fait plus que plafonner la consigne de la flotte
+            scheduler.fleet_managed = True
+            box.unsubs.append(scheduler.async_add_listener(lambda: self._async_update_box(entry_id)))
+        self._async_update_box(entry_id)
+
+    @callback
+    def async_remove_box(self, entry_id: str) -> None:
+        """Arrête de piloter une borne et libère sa part."""
+        box = self._boxes.pop(entry_id, None)
+        if box is None:
+            return
+        for unsub in box.unsubs:
+            unsub()
+        self._shares.set_active(entry_id, None)
+        self._set_reserved(box, 0.0)
+        self._site_meters.pop(entry_id, None)
+
+    @callback
+    def _async_update_box(self, entry_id: str) -> None:
+        """Recalcule la consigne d'une borne et l'écrit si nécessaire."""
+        box = self._boxes[entry_id]
+        coordinator = box.coordinator_realtime
+        data = coordinator.data
+        reachable = bool(data and coordinator.last_update_success and not data.served_from_cache)
+        charge_state = data.charge_state if reachable else None
+        box.active = charge_state not in (None, CHARGE_STATE_UNPLUGGED)
+        self._shares.set_active(entry_id, box.weight if box.active else None)
+        if box.active or charge_state == CHARGE_STATE_UNPLUGGED:
+            self._set_reserved(box, 0.0)
+        else:
+            # État inconnu : la borne peut charger au dernier courant écrit
+            self._set_reserved(box, self._last_known_current(box) * box.watts_per_amp)
+
+        available = self.available_power
+        if not box.active or available is None:
+            box.share_w = 0.0
+            box.setpoint = None
+            self._async_notify(box)
+            return
+
+        power = coordinator.get_meter_value(METER_MODEL_VIRTUAL, "ActivePower_W")
+        current = coordinator.get_meter_value(METER_MODEL_VIRTUAL, "Current_mA")
+        box.watts_per_amp = watts_per_amp(
+            float(power) if power is not None else None,
+            float(current) / 1000 if current is not None else None,
+            box.watts_per_amp,
+        )
+        box.share_w = self._shares.share(entry_id, available)
+        ceiling = box.scheduler.setpoint if box.scheduler is not None else FLEET_MAX_CURRENT
+        box.setpoint = setpoint_amps(box.share_w, box.watts_per_amp, ceiling)
+
+        now = coordinator.api_client.clock.monotonic()
+        if box.throttle.should_write(box.setpoint, now):
+            box.throttle.written(box.setpoint, now)
+            self.hass.async_create_task(self._async_write(entry_id, box, box.setpoint))
+        self._async_notify(box)
+
+    def _last_known_current(self, box: FleetBox) -> float:
+        """Courant (A) que la borne peut tirer sans nouvelle consigne.
+
+        Dernière consigne confirmée, ou en cours d'écriture si elle est plus
+        haute ; à défaut, le courant maximum lu dans sa configuration.
+        """
+        setpoints = [
+            setpoint for setpoint in (box.written_setpoint, box.throttle.last_setpoint) if setpoint is not None
+        ]
+        if setpoints:
+            return max(setpoints)
+        current_ma = box.coordinator_config.get_typed_config_value(CONFIG_KEY_MAX_CURRENT)
+        try:
+            return float(current_ma) / 1000
+        except (TypeError, ValueError):
+            return FLEET_MAX_CURRENT
+
+    def _set_reserved(self, box: FleetBox, reserved_w: float) -> None:
+        """Met à jour la réservation d'une borne et le total."""
+        self.reserved_power = max(0.0, self.reserved_power + reserved_w - box.reserved_w)
+        box.reserved_w = reserved_w
+
+    async def _async_write(self, entry_id: str, box: FleetBox, setpoint: int) -> None:
+        """Écrit le courant maximum d'une borne s'il diffère de sa configuration."""
+        async with box.write_lock:
+            if self._boxes.get(entry_id) is not box:
+                return
+            setpoint_ma = setpoint * 1000
+            current_ma = box.coordinator_config.get_typed_config_value(CONFIG_KEY_MAX_CURRENT)
+            if current_ma is not None and str(current_ma) == str(setpoint_ma):
+                box.written_setpoint = setpoint
+                return
+            _LOGGER.debug("[Flotte] Consigne de %s : %s A (part %.0f W)", entry_id, setpoint, box.share_w)
+            try:
+                confirmed = await box.coordinator_config.async_write_config(CONFIG_KEY_MAX_CURRENT, setpoint_ma)
+            except HomeAssistantError as err:
+                _LOGGER.error("[Flotte] Impossible d'appliquer la consigne (%s A): %s", setpoint, err)
+                confirmed = False
+            if confirmed:
+                box.written_setpoint = setpoint
+            else:
+                # Nouvelle tentative au prochain rafraîchissement de la borne
+                box.throttle.last_setpoint = None
+
+    @callback
+    def async_add_listener(self, entry_id: str, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Abonne une entité aux consignes d'une borne."""
+        listeners = self._boxes[entry_id].listeners
+        listeners.add(update_callback)
+        return lambda: listeners.discard(update_callback)
+
+    @callback
+    def _async_notify(self, box: FleetBox) -> None:
+        """Prévient les entités de la borne."""
+        for update_callback in list(box.listeners):
+            update_callback()
+
+
+def get_fleet_allocator(hass: HomeAssistant) -> FleetAllocator:
+    """Retourne l'allocateur de flotte (créé au premier appel)."""
+    if DATA_FLEET not in hass.data:
+        hass.data[DATA_FLEET] = FleetAllocator(hass, get_site_aggregator(hass))
+    return hass.data[DATA_FLEET]
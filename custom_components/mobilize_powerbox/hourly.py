@@ -0,0 +1,66 @@
+"""Cumul horaire d'un compteur d'énergie, sans dépendance à Home Assistant.
+
+Chaque mesure du compteur cumulatif est convertie en énergie ajoutée
+(``CounterTracker``) puis répartie sur les heures qu'elle couvre. Après une
+interruption (Home Assistant arrêté, borne injoignable), l'énergie indiquée
+par le compteur est répartie uniformément sur les heures manquantes : les
+statistiques ne présentent pas de trou.
+"""
+from __future__ import annotations
+
+import math
+
+from .sampling import CounterTracker
+
+HOUR = 3600
+
+
+class HourlyEnergy:
+    """Statistique horaire d'énergie (somme cumulée en kWh)."""
+
+    def __init__(self, stored: dict | None = None) -> None:
+        """Initialisation, éventuellement depuis un état sauvegardé."""
+        stored = stored or {}
+        self._counter = CounterTracker(stored.get("counter_ws"))
+        self.last_ts: float | None = stored.get("last_ts")
+        # Somme à la fin de la dernière heure complète, et énergie de l'heure en cours
+        self.sum_kwh: float = stored.get("sum_kwh", 0.0)
+        self.hour_start: float | None = stored.get("hour_start")
+        self.hour_kwh: float = stored.get("hour_kwh", 0.0)
+
+    def update(self, ts: float, counter_ws: float) -> list[tuple[float, float]]:
+        """Prend en compte une mesure et retourne les heures terminées : (début, somme kWh)."""
+        delta_kwh = self._counter.update(counter_ws) / HOUR / 1000
+        hour = math.floor(ts / HOUR) * HOUR
+        if self.hour_start is None or self.last_ts is None:
+            self.hour_start, self.last_ts = hour, ts
+            return []
+        if ts <= self.last_ts:
+            # Même mesure relue (ou horloge de la borne en arrière) : rien à répartir
+            self.hour_kwh += delta_kwh
+            return []
+
+        completed = []
+        span = ts - self.last_ts
+        start = self.hour_start
+        while start <= hour:
+            covered = min(ts, start + HOUR) - max(self.last_ts, start)
+            self.hour_kwh += delta_kwh * max(0.0, covered) / span
+            if start < hour:
+                self.sum_kwh += self.hour_kwh
+                self.hour_kwh = 0.0
+                completed.append((start, self.sum_kwh))
+            start += HOUR
+
+        self.hour_start, self.last_ts = hour, ts
+        return completed
+
+    def as_dict(self) -> dict:
+        """État sérialisable pour le stockage persistant."""
+        return {
+            "counter_ws": self._counter.last,
+            "last_ts": self.last_ts,
+            "sum_kwh": self.sum_kwh,
+            "hour_start": self.hour_start,
+            "hour_kwh": self.hour_kwh,
+        }
@@ -0,0 +1,154 @@
+"""Limiteur de débit par borne pour Mobilize PowerBox.
+
+Le serveur web embarqué de la PowerBox supporte mal les rafales de requêtes.
+Toutes les requêtes vers une même borne (coordinateurs, config flow, services)
+passent par un seau à jetons commun, avec des classes de priorité : quand
+plusieurs appelants attendent, le temps réel est servi en premier.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+
+from .clock import SYSTEM_CLOCK, Clock
+from .const import RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND
+
+# Classes de priorité (plus petit = plus prioritaire)
+PRIORITY_REALTIME = 0
+PRIORITY_CONFIG = 1
+PRIORITY_DIAGNOSTIC = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_REALTIME: "realtime",
+    PRIORITY_CONFIG: "config",
+    PRIORITY_DIAGNOSTIC: "diagnostic",
+}
+
+# Réactivité à l'annulation pendant l'attente d'un jeton
+CANCEL_POLL_INTERVAL = 0.5  # secondes
+
+_LIMITERS: dict[str, "TokenBucketLimiter"] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+class RateLimitTimeout(Exception):
+    """Le jeton n'a pas pu être obtenu dans le délai imparti."""
+
+
+class TokenBucketLimiter:
+    """Seau à jetons thread-safe avec file d'attente par priorité."""
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_PER_SECOND,
+        capacity: int = RATE_LIMIT_BURST,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        """Initialisation du limiteur."""
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock.monotonic()
+        self._cond = threading.Condition()
+        self._waiters: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._stats = {
+            priority: {"requests": 0, "wait_total": 0.0, "wait_max": 0.0, "timeouts": 0}
+            for priority in PRIORITY_NAMES
+        }
+
+    def _refill(self) -> None:
+        """Ajoute les jetons accumulés depuis le dernier passage."""
+        now = self._clock.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(
+        self,
+        priority: int = PRIORITY_CONFIG,
+        timeout: float | None = None,
+        cancel: threading.Event | None = None,
+    ) -> float:
+        """Bloque jusqu'à l'obtention d'un jeton et retourne le temps d'attente.
+
+        L'attente est abandonnée (sans consommer de jeton) dès que l'évènement
+        ``cancel`` est positionné.
+        """
+        ticket = (priority, next(self._sequence))
+        started = self._clock.monotonic()
+        deadline = None if timeout is None else started + timeout
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    is_next = self._waiters[0] == ticket
+                    if is_next and self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        break
+
+                    now = self._clock.monotonic()
+                    if cancel is not None and cancel.is_set():
+                        self._waiters.remove(ticket)
+                        heapq.heapify(self._waiters)
+                        return now - started
+                    if deadline is not None and now >= deadline:
+                        self._waiters.remove(ticket)
+                        heapq.heapify(self._waiters)
+                        self._stats[priority]["timeouts"] += 1
+                        raise RateLimitTimeout(
+                            f"Aucun jeton disponible après {timeout}s (priorité {PRIORITY_NAMES[priority]})"
+                        )
+
+                    # Le premier de la file attend le prochain jeton, les autres
+                    # sont réveillés quand la tête de file est servie
+                    wait = (1 - self._tokens) / self.rate if is_next else None
+                    if deadline is not None:
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    if cancel is not None:
+                        wait = CANCEL_POLL_INTERVAL if wait is None else min(wait, CANCEL_POLL_INTERVAL)
+                    self._clock.wait(self._cond, wait)
+            finally:
+                self._cond.notify_all()
+
+            waited = self._clock.monotonic() - started
+            stats = self._stats[priority]
+            stats["requests"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+
+        return waited
+
+    def get_stats(self) -> dict:
+        """Retourne les métriques d'attente par classe de priorité."""
+        with self._cond:
+            self._refill()
+            return {
+                "rate_per_second": self.rate,
+                "capacity": self.capacity,
+                "tokens_available": round(self._tokens, 2),
+                "queued": len(self._waiters),
+                "priorities": {
+                    PRIORITY_NAMES[priority]: {
+                        "requests": stats["requests"],
+                        "timeouts": stats["timeouts"],
+                        "wait_avg": round(stats["wait_total"] / stats["requests"], 3)
+                            if stats["requests"] else 0.0,
+                        "wait_max": round(stats["wait_max"], 3),
+                    }
+                    for priority, stats in self._stats.items()
+                },
+            }
+
+
+def get_limiter(host: str) -> TokenBucketLimiter:
+    """Retourne le limiteur partagé d'une borne (créé au premier appel)."""
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(host)
+        if limiter is None:
+            limiter = _LIMITERS[host] = TokenBucketLimiter()
+        return limiter
@@ -0,0 +1,201 @@
+"""Export OpenMetrics (Prometheus) pour Mobilize PowerBox.
+
+Le rendu est fait uniquement à partir des derniers instantanés des
+coordinateurs : un scrape ne déclenche jamais de requête vers la borne. Le
+corps rendu est mis en cache jusqu'au prochain rafraîchissement.
+"""
+from __future__ import annotations
+
+from http import HTTPStatus
+
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DOMAIN,
+    CONF_METRICS_ENABLED,
+    DATA_METRICS_CACHE,
+    DEFAULT_METRICS_ENABLED,
+    METRICS_URL,
+)
+
+CONTENT_TYPE_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value) -> str:
+    """Échappe une valeur de label OpenMetrics."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> float | None:
+    """Convertit une valeur en nombre, ou None si elle n'est pas numérique."""
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _MetricFamily:
+    """Regroupe les échantillons d'une famille de métriques."""
+
+    def __init__(self, name: str, metric_type: str, help_text: str) -> None:
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.samples: list[str] = []
+
+    def add(self, labels: dict, value, suffix: str = "") -> None:
+        """Ajoute un échantillon (ignoré si la valeur n'est pas numérique)."""
+        number = _number(value)
+        if number is None:
+            return
+        label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        self.samples.append(f"{self.name}{suffix}{{{label_text}}} {number:g}")
+
+    def render(self) -> list[str]:
+        """Lignes OpenMetrics de la famille."""
+        if not self.samples:
+            return []
+        return [
+            f"# TYPE {self.name} {self.metric_type}",
+            f"# HELP {self.name} {self.help_text}",
+            *self.samples,
+        ]
+
+
+def _enabled_entries(hass: HomeAssistant) -> list[tuple[str, dict]]:
+    """Entrées chargées pour lesquelles l'export est activé."""
+    entries = []
+    for entry_id, entry_data in hass.data.get(DOMAIN, {}).items():
+        entry = hass.config_entries.async_get_entry(entry_id)
+        if entry and entry.options.get(CONF_METRICS_ENABLED, DEFAULT_METRICS_ENABLED):
+            entries.append((entry_id, entry_data))
+    return entries
+
+
+def _cache_key(entries: list[tuple[str, dict]]) -> tuple:
+    """Clé de cache : change à chaque rafraîchissement d'un coordinateur."""
+    return tuple(
+        (
+            entry_id,
+            entry_data["coordinator_realtime"].last_update_success_time,
+            entry_data["coordinator_realtime"].last_update_success,
+            entry_data["coordinator_config"].last_update_success_time,
+        )
+        for entry_id, entry_data in entries
+    )
+
+
+def render_metrics(entries: list[tuple[str, dict]]) -> str:
+    """Rend les métriques de toutes les entrées au format OpenMetrics."""
+    meters = _MetricFamily("powerbox_meter_value", "gauge", "Valeur brute d'un compteur /meters")
+    meter_connected = _MetricFamily("powerbox_meter_connected", "gauge", "Compteur connecté")
+    derived = _MetricFamily("powerbox_derived_value", "gauge", "Métrique dérivée calculée par l'intégration")
+    configs = _MetricFamily("powerbox_config_value", "gauge", "Paramètre de configuration numérique")
+    up = _MetricFamily("powerbox_up", "gauge", "Dernier rafraîchissement réussi")
+    last_update = _MetricFamily(
+        "powerbox_last_update_timestamp_seconds", "gauge", "Horodatage du dernier rafraîchissement réussi"
+    )
+    data_age = _MetricFamily(
+        "powerbox_data_age_seconds", "gauge", "Âge des données servies (0 si fraîches)"
+    )
+    requests_total = _MetricFamily("powerbox_client_requests", "counter", "Requêtes réussies")
+    errors_total = _MetricFamily("powerbox_client_errors", "counter", "Requêtes en erreur")
+    retries_total = _MetricFamily("powerbox_client_retries", "counter", "Nouvelles tentatives")
+    auth_total = _MetricFamily("powerbox_client_auth", "counter", "Authentifications")
+    latency = _MetricFamily("powerbox_client_latency_seconds", "summary", "Latence des requêtes réussies")
+    consecutive = _MetricFamily("powerbox_client_consecutive_errors", "gauge", "Erreurs consécutives")
+    request_timeout = _MetricFamily(
+        "powerbox_client_timeout_seconds", "gauge", "Timeout adaptatif courant par endpoint"
+    )
+    limiter_wait = _MetricFamily(
+        "powerbox_limiter_wait_seconds_max", "gauge", "Attente maximale d'un jeton du limiteur"
+    )
+
+    for _entry_id, entry_data in entries:
+        realtime = entry_data["coordinator_realtime"]
+        config = entry_data["coordinator_config"]
+        api_client = entry_data["api_client"]
+        host = {"host": api_client.host}
+
+        for kind, coordinator in (("realtime", realtime), ("config", config)):
+            labels = {**host, "coordinator": kind}
+            up.add(labels, coordinator.last_update_success)
+            if coordinator.last_update_success_time:
+                last_update.add(labels, coordinator.last_update_success_time.timestamp())
+            if coordinator.data:
+                data_age.add(labels, coordinator.data.data_age)
+
+        if realtime.data:
+            for model, meter in realtime.data.meters_parsed.items():
+                meter_connected.add({**host, "meter": model}, meter["connected"])
+                for name, value_data in meter["values"].items():
+                    meters.add({**host, "meter": model, "name": name}, value_data["value"])
+            for name, value in realtime.data.derived.items():
+                derived.add({**host, "name": name}, value)
+
+        if config.data and config.data.configs:
+            for key, item in config.data.configs.items():
+                configs.add({**host, "key": key}, item.get("config_value"))
+
+        stats = api_client.get_stats()
+        requests_total.add(host, stats["requests"], "_total")
+        errors_total.add(host, stats["errors"], "_total")
+        retries_total.add(host, stats["retries"], "_total")
+        auth_total.add(host, stats["auth"], "_total")
+        latency.add(host, stats["latency_sum"], "_sum")
+        latency.add(host, stats["requests"], "_count")
+        consecutive.add(host, stats["consecutive_errors"])
+
+        for endpoint, timeout_stats in api_client.get_timeout_stats().items():
+            connect, read = timeout_stats["timeouts"]
+            request_timeout.add({**host, "endpoint": endpoint, "phase": "connect"}, connect)
+            request_timeout.add({**host, "endpoint": endpoint, "phase": "read"}, read)
+
+        for priority, limiter_stats in api_client.get_limiter_stats()["priorities"].items():
+            limiter_wait.add({**host, "priority": priority}, limiter_stats["wait_max"])
+
+    lines = []
+    for family in (
+        up, last_update, data_age, meters, meter_connected, derived, configs,
+        requests_total, errors_total, retries_total, auth_total, latency, consecutive, request_timeout,
+        limiter_wait,
+    ):
+        lines.extend(family.render())
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class PowerBoxMetricsView(HomeAssistantView):
+    """Vue HTTP servant les métriques au format OpenMetrics."""
+
+    url = METRICS_URL
+    name = "api:mobilize_powerbox:metrics"
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.Response:
+        """Rend les métriques, ou les ressert depuis le cache."""
+        hass: HomeAssistant = request.app["hass"]
+        entries = _enabled_entries(hass)
+        if not entries:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+
+        key = _cache_key(entries)
+        cache = hass.data.setdefault(DATA_METRICS_CACHE, {})
+        if cache.get("key") != key:
+            cache["key"] = key
+            cache["body"] = render_metrics(entries).encode("utf-8")
+
+        return web.Response(body=cache["body"], headers={"Content-Type": CONTENT_TYPE_OPENMETRICS})
+
+
+def async_register_metrics_view(hass: HomeAssistant) -> None:
+    """Enregistre la vue une seule fois (les vues HTTP ne peuvent pas être retirées)."""
+    if hass.data.get(DATA_METRICS_CACHE) is not None:
+        return
+    hass.data[DATA_METRICS_CACHE] = {}
+    hass.http.register_view(PowerBoxMetricsView)
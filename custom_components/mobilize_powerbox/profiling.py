@@ -0,0 +1,232 @@
+"""Profilage à la demande des cycles de rafraîchissement des coordinateurs.
+
+Le profileur s'installe en remplaçant, sur les seules instances ciblées et
+pour la durée du profilage, la méthode ``_async_refresh`` des coordinateurs
+(requête HTTP, décodage, parsing, mise à jour des entités et écriture des
+états). Rien n'est instrumenté en dehors d'un profilage : aucun coût quand
+il ne tourne pas.
+
+Profil CPU (cProfile) et profil d'allocations (tracemalloc) sont tous deux
+globaux au processus : pendant un cycle, le reste de Home Assistant est
+aussi mesuré. Avant Python 3.12, cProfile ne suit que le thread qui l'active :
+les appels au client dans l'exécuteur sont alors profilés séparément.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+from functools import wraps
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+# À partir de Python 3.12, cProfile (sys.monitoring) suit tous les threads
+_PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+TRACEMALLOC_FRAMES = 10  # profondeur des piles d'allocation
+TOP_COUNT = 15  # lignes par tableau dans le rapport complet
+
+
+def _is_idle(function_key: tuple) -> bool:
+    """Attente de la boucle d'évènements (sélecteur), exclue des points chauds."""
+    filename, _line, function = function_key
+    return filename == "~" and "of 'select." in function
+
+
+class RefreshProfiler:
+    """Profile les ``cycles`` prochains rafraîchissements des coordinateurs ciblés."""
+
+    def __init__(self, cycles: int) -> None:
+        """Initialisation."""
+        self.cycles = cycles
+        self.completed = 0
+        self.durations: list[float] = []
+        self.done = asyncio.Event()
+        self._profile = cProfile.Profile()
+        self._thread_profiles: list[cProfile.Profile] = []
+        self._thread_lock = threading.Lock()
+        self._active = 0
+        self._patched: list[tuple[object, str]] = []
+        self._owns_tracemalloc = False
+        self._snapshot_before: tracemalloc.Snapshot | None = None
+        self._snapshot_after: tracemalloc.Snapshot | None = None
+
+    def start_tracing(self) -> None:
+        """Démarre tracemalloc et prend l'instantané de référence (exécuteur)."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._owns_tracemalloc = True
+        self._snapshot_before = tracemalloc.take_snapshot()
+
+    def stop_tracing(self) -> None:
+        """Prend l'instantané final et arrête tracemalloc s'il a été démarré ici (exécuteur)."""
+        if tracemalloc.is_tracing():
+            self._snapshot_after = tracemalloc.take_snapshot()
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+
+    def attach(self, coordinators: list, api_client) -> None:
+        """Instrumente les coordinateurs (et le client avant Python 3.12)."""
+        for coordinator in coordinators:
+            self._patch(coordinator, "_async_refresh", self._wrap_refresh(coordinator._async_refresh))
+        if not _PROFILES_ALL_THREADS:
+            self._patch(api_client, "fetch_data", self._wrap_executor_call(api_client.fetch_data))
+
+    def detach(self) -> None:
+        """Retire l'instrumentation et arrête un cycle resté ouvert."""
+        for target, attribute in self._patched:
+            vars(target).pop(attribute, None)
+        self._patched.clear()
+        if self._active:
+            self._active = 0
+            self._profile.disable()
+
+    def _patch(self, target, attribute: str, replacement) -> None:
+        """Masque une méthode par un attribut d'instance (retiré par ``detach``)."""
+        setattr(target, attribute, replacement)
+        self._patched.append((target, attribute))
+
+    def _wrap_refresh(self, refresh):
+        """Profile un cycle complet de rafraîchissement."""
+
+        @wraps(refresh)
+        async def profiled_refresh(*args, **kwargs):
+            if self.done.is_set():
+                return await refresh(*args, **kwargs)
+            # Les deux coordinateurs peuvent se chevaucher : un seul profil actif
+            if not self._active:
+                self._profile.enable()
+            self._active += 1
+            started = time.perf_counter()
+            try:
+                return await refresh(*args, **kwargs)
+            finally:
+                self._active -= 1
+                if not self._active:
+                    self._profile.disable()
+                self.durations.append(time.perf_counter() - started)
+                self.completed += 1
+                if self.completed >= self.cycles:
+                    self.done.set()
+
+        return profiled_refresh
+
+    def _wrap_executor_call(self, func):
+        """Profile un appel exécuté dans un thread de l'exécuteur."""
+
+        @wraps(func)
+        def profiled_call(*args, **kwargs):
+            if self.done.is_set():
+                return func(*args, **kwargs)
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(func, *args, **kwargs)
+            finally:
+                with self._thread_lock:
+                    self._thread_profiles.append(profile)
+
+        return profiled_call
+
+    def _cpu_stats(self) -> pstats.Stats | None:
+        """Profil CPU fusionné (boucle d'évènements et exécuteur)."""
+        profiles = [self._profile, *self._thread_profiles]
+        stats = None
+        for profile in profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        return stats
+
+    def _alloc_stats(self) -> list[tracemalloc.StatisticDiff]:
+        """Allocations nettes par ligne pendant le profilage."""
+        if self._snapshot_before is None or self._snapshot_after is None:
+            return []
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ]
+        return self._snapshot_after.filter_traces(filters).compare_to(
+            self._snapshot_before.filter_traces(filters), "lineno"
+        )
+
+    def write_report(self, prof_path: str, top: int) -> dict:
+        """Écrit le profil CPU (``.prof``) et un rapport texte, retourne le résumé (exécuteur)."""
+        os.makedirs(os.path.dirname(prof_path), exist_ok=True)
+        report_path = os.path.splitext(prof_path)[0] + ".txt"
+        summary = {
+            "cycles": self.completed,
+            "cycle_seconds_max": round(max(self.durations), 4) if self.durations else None,
+            "cycle_seconds_total": round(sum(self.durations), 4),
+            "cpu": [],
+            "alloc": [],
+            "files": [report_path],
+        }
+
+        buffer = io.StringIO()
+        buffer.write(f"{self.completed} cycles, {summary['cycle_seconds_total']} s au total\n\n")
+
+        stats = self._cpu_stats()
+        if stats is not None:
+            stats.dump_stats(prof_path)
+            summary["files"].insert(0, prof_path)
+            stats.stream = buffer
+            buffer.write("=== CPU (temps propre) ===\n")
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_COUNT)
+            buffer.write("=== CPU (temps cumulé) ===\n")
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_COUNT)
+            hotspots = [
+                item for item in stats.stats.items() if not _is_idle(item[0])
+            ]
+            for (filename, line, function), (_cc, calls, tottime, cumtime, _callers) in sorted(
+                hotspots, key=lambda item: item[1][2], reverse=True
+            )[:top]:
+                summary["cpu"].append({
+                    "function": f"{os.path.basename(filename)}:{line}({function})",
+                    "calls": calls,
+                    "tottime": round(tottime, 4),
+                    "cumtime": round(cumtime, 4),
+                })
+
+        alloc = self._alloc_stats()
+        buffer.write("\n=== Allocations nettes ===\n")
+        for diff in alloc[:TOP_COUNT]:
+            buffer.write(f"{diff}\n")
+        for diff in alloc[:top]:
+            frame = diff.traceback[0]
+            summary["alloc"].append({
+                "location": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                "size_kib": round(diff.size_diff / 1024, 1),
+                "count": diff.count_diff,
+            })
+
+        with open(report_path, "w", encoding="utf-8") as report:
+            report.write(buffer.getvalue())
+        return summary
+
+
+def format_summary(summary: dict) -> str:
+    """Résumé Markdown des points chauds, pour la notification persistante."""
+    lines = [
+        f"{summary['cycles']} cycles profilés "
+        f"({summary['cycle_seconds_total']} s au total, {summary['cycle_seconds_max']} s au maximum).",
+        "",
+        "**CPU (temps propre)**",
+    ]
+    lines.extend(
+        f"- `{item['function']}` : {item['tottime']} s ({item['calls']} appels)" for item in summary["cpu"]
+    )
+    lines.extend(["", "**Allocations nettes**"])
+    lines.extend(
+        f"- `{item['location']}` : {item['size_kib']} Kio ({item['count']} blocs)" for item in summary["alloc"]
+    )
+    lines.extend(["", "Fichiers :"])
+    lines.extend(f"- `{path}`" for path in summary["files"])
+    return "\n".join(lines)
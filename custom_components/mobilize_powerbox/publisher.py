@@ -0,0 +1,205 @@
+"""Diffusion des instantanés de la PowerBox vers d'autres consommateurs.
+
+L'intégration devient le seul client de la borne : chaque nouvel instantané
+des coordinateurs est diffusé, en ne transmettant que les valeurs modifiées.
+
+- MQTT : un message JSON des valeurs modifiées sur ``<préfixe>/<hôte>/delta``
+  (non retenu), et l'instantané complet sur ``<préfixe>/<hôte>/snapshot``
+  (retenu) pour qu'un abonné tardif le reçoive dès son abonnement.
+- SSE : ``GET /api/mobilize_powerbox/stream/<entry_id>`` envoie un évènement
+  ``snapshot`` complet à la connexion, puis des évènements ``delta``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+
+from aiohttp import web
+
+from homeassistant.components import mqtt
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import (
+    DOMAIN,
+    DATA_PUBLISHER,
+    DATA_STREAM_VIEW,
+    PUBLISH_MODE_MQTT,
+    PUBLISH_TOPIC_DELTA,
+    PUBLISH_TOPIC_SNAPSHOT,
+    STREAM_HEARTBEAT,
+    STREAM_QUEUE_SIZE,
+    STREAM_URL,
+)
+from .api import flatten_meters
+from .coordinator import PowerBoxConfigCoordinator, PowerBoxRealtimeCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _compact(payload) -> str:
+    """Sérialisation JSON compacte."""
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def _close_queue(queue: asyncio.Queue) -> None:
+    """Signale la fin du flux à un abonné, même si sa file est pleine."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+
+class SnapshotPublisher:
+    """Diffuse les valeurs modifiées des coordinateurs d'une PowerBox."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator_realtime: PowerBoxRealtimeCoordinator,
+        coordinator_config: PowerBoxConfigCoordinator,
+        mode: str,
+        topic_prefix: str,
+        host: str,
+    ) -> None:
+        """Initialisation."""
+        self.hass = hass
+        self.coordinator_realtime = coordinator_realtime
+        self.coordinator_config = coordinator_config
+        self.mode = mode
+        self.topic = f"{topic_prefix}/{host.replace(':', '_')}"
+        self.snapshot: dict = {}
+        self._subscribers: set[asyncio.Queue] = set()
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_start(self) -> None:
+        """S'abonne aux deux coordinateurs."""
+        self._unsubs = [
+            self.coordinator_realtime.async_add_listener(self._handle_update),
+            self.coordinator_config.async_add_listener(self._handle_update),
+        ]
+        self._handle_update()
+
+    @callback
+    def async_stop(self) -> None:
+        """Se désabonne et ferme les flux SSE ouverts."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+        for queue in self._subscribers:
+            _close_queue(queue)
+        self._subscribers.clear()
+
+    def _collect(self) -> dict:
+        """Aplatit les derniers instantanés en {clé: valeur}."""
+        values = {}
+        realtime = self.coordinator_realtime.data
+        if realtime:
+            values.update(flatten_meters(realtime.meters_parsed))
+            values.update({f"derived.{name}": value for name, value in realtime.derived.items()})
+            values["served_from_cache"] = realtime.served_from_cache
+        config = self.coordinator_config.data
+        if config and config.configs:
+            values.update(
+                {f"config.{key}": item.get("config_value") for key, item in config.configs.items()}
+            )
+        return values
+
+    @callback
+    def _handle_update(self) -> None:
+        """Calcule le delta depuis la dernière diffusion et le publie."""
+        values = self._collect()
+        delta = {key: value for key, value in values.items() if self.snapshot.get(key) != value}
+        delta.update({key: None for key in self.snapshot.keys() - values.keys()})
+        if not delta:
+            return
+
+        self.snapshot = values
+        event = {"t": round(time.time(), 3), "v": delta}
+        if self.mode == PUBLISH_MODE_MQTT:
+            self.hass.async_create_task(
+                self._async_publish_mqtt(event, {"t": event["t"], "v": values})
+            )
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Abonné trop lent : on le déconnecte plutôt que d'accumuler
+                _LOGGER.debug("Abonné SSE trop lent, déconnexion")
+                self._subscribers.discard(queue)
+                _close_queue(queue)
+
+    async def _async_publish_mqtt(self, event: dict, snapshot: dict) -> None:
+        """Publie le delta (non retenu) puis l'instantané complet (retenu)."""
+        await mqtt.async_publish(
+            self.hass, f"{self.topic}/{PUBLISH_TOPIC_DELTA}", _compact(event), qos=0, retain=False
+        )
+        await mqtt.async_publish(
+            self.hass, f"{self.topic}/{PUBLISH_TOPIC_SNAPSHOT}", _compact(snapshot), qos=0, retain=True
+        )
+
+    @callback
+    def async_subscribe(self) -> asyncio.Queue:
+        """Ouvre un abonnement aux deltas (SSE)."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    @callback
+    def async_unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Ferme un abonnement."""
+        self._subscribers.discard(queue)
+
+
+class PowerBoxStreamView(HomeAssistantView):
+    """Flux Server-Sent Events des instantanés d'une PowerBox."""
+
+    url = STREAM_URL
+    name = "api:mobilize_powerbox:stream"
+    requires_auth = True
+
+    async def get(self, request: web.Request, entry_id: str) -> web.StreamResponse:
+        """Envoie l'instantané complet puis les deltas au fil de l'eau."""
+        hass: HomeAssistant = request.app["hass"]
+        publisher: SnapshotPublisher | None = (
+            hass.data.get(DOMAIN, {}).get(entry_id, {}).get(DATA_PUBLISHER)
+        )
+        if publisher is None:
+            return web.Response(status=404)
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+        })
+        await response.prepare(request)
+
+        queue = publisher.async_subscribe()
+        try:
+            snapshot = {"t": round(time.time(), 3), "v": publisher.snapshot}
+            await response.write(f"event: snapshot\ndata: {_compact(snapshot)}\n\n".encode())
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    await response.write(b": keepalive\n\n")
+                    continue
+                if event is None:
+                    break
+                await response.write(f"event: delta\ndata: {_compact(event)}\n\n".encode())
+        except ConnectionResetError:
+            pass
+        finally:
+            publisher.async_unsubscribe(queue)
+
+        return response
+
+
+def async_register_stream_view(hass: HomeAssistant) -> None:
+    """Enregistre la vue SSE une seule fois."""
+    if hass.data.get(DATA_STREAM_VIEW):
+        return
+    hass.data[DATA_STREAM_VIEW] = True
+    hass.http.register_view(PowerBoxStreamView)
@@ -0,0 +1,153 @@
+"""File de requêtes sérialisée d'un client PowerBox.
+
+Les deux coordinateurs (et les services) partagent un même client, appelé
+depuis plusieurs threads de l'exécuteur. Toutes les requêtes passent par une
+file unique : une seule s'exécute à la fois, dans l'ordre des priorités
+(temps réel avant configuration), si bien que la session HTTP et le token ne
+sont jamais manipulés par deux threads en même temps. Une requête identique
+déjà en file ou en cours n'est pas renvoyée : l'appelant partage son résultat.
+
+Pendant l'attente entre deux tentatives, la requête libère la file
+(``released``) puis reprend son tour à sa priorité : une borne qui ne répond
+plus sur un endpoint ne bloque pas les autres requêtes pendant le backoff.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+import heapq
+import itertools
+import threading
+from typing import Any
+
+from .clock import SYSTEM_CLOCK, Clock
+from .limiter import CANCEL_POLL_INTERVAL
+
+
+class RequestCancelled(Exception):
+    """La requête a été abandonnée avant son exécution (fermeture du client)."""
+
+
+class _Call:
+    """Requête en file ou en cours, partagée par les appelants identiques."""
+
+    def __init__(self) -> None:
+        self.done = False
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class RequestQueue:
+    """Exécute les requêtes une par une, par priorité, en fusionnant les doublons."""
+
+    def __init__(self, clock: Clock = SYSTEM_CLOCK) -> None:
+        """Initialisation."""
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._calls: dict[str, _Call] = {}
+        self._running = False
+        self._owner: int | None = None
+        self._stats = {"executed": 0, "merged": 0, "cancelled": 0, "released": 0}
+
+    @property
+    def busy(self) -> bool:
+        """Une requête est en cours d'exécution."""
+        with self._cond:
+            return self._running
+
+    def run(
+        self,
+        key: str,
+        priority: int,
+        func: Callable[[], Any],
+        cancel: threading.Event | None = None,
+    ) -> Any:
+        """Exécute ``func`` à son tour, ou partage le résultat d'une requête identique."""
+        with self._cond:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["merged"] += 1
+                self._wait_for(lambda: call.done, cancel)
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+            call = self._calls[key] = _Call()
+            try:
+                self._acquire(priority, cancel)
+            except RequestCancelled:
+                call.error = RequestCancelled()
+                self._finish(key, call)
+                raise
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._cond:
+                # La file n'est plus tenue si la reprise après une attente a été annulée
+                if self._owner == threading.get_ident():
+                    self._running = False
+                    self._owner = None
+                self._stats["executed"] += 1
+                self._finish(key, call)
+
+    @contextmanager
+    def released(self, priority: int, cancel: threading.Event | None = None) -> Iterator[None]:
+        """Libère la file le temps du bloc (attente avant une nouvelle tentative), puis reprend son tour.
+
+        Sans effet si le thread appelant n'exécute pas de requête de la file.
+        """
+        with self._cond:
+            owner = self._owner == threading.get_ident()
+            if owner:
+                self._running = False
+                self._owner = None
+                self._stats["released"] += 1
+                self._cond.notify_all()
+        try:
+            yield
+        finally:
+            if owner:
+                with self._cond:
+                    self._acquire(priority, cancel)
+
+    def _acquire(self, priority: int, cancel: threading.Event | None) -> None:
+        """Attend son tour à ``priority`` puis prend la file (verrou tenu)."""
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._waiting, ticket)
+        try:
+            self._wait_for(lambda: not self._running and self._waiting[0] == ticket, cancel)
+        except RequestCancelled:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            self._cond.notify_all()
+            raise
+        heapq.heappop(self._waiting)
+        self._running = True
+        self._owner = threading.get_ident()
+
+    def _wait_for(self, predicate: Callable[[], bool], cancel: threading.Event | None) -> None:
+        """Attend (verrou tenu) que ``predicate`` soit vrai, ou lève ``RequestCancelled``."""
+        while not predicate():
+            if cancel is not None and cancel.is_set():
+                self._stats["cancelled"] += 1
+                raise RequestCancelled
+            self._clock.wait(self._cond, CANCEL_POLL_INTERVAL if cancel is not None else None)
+
+    def _finish(self, key: str, call: _Call) -> None:
+        """Libère la clé et réveille les appelants en attente (verrou tenu)."""
+        call.done = True
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        self._cond.notify_all()
+
+    def get_stats(self) -> dict:
+        """Retourne les compteurs de la file."""
+        with self._cond:
+            return dict(self._stats, queued=len(self._waiting), running=self._running)
@@ -0,0 +1,154 @@
+"""Rééchantillonnage et compteurs cumulatifs, sans dépendance à Home Assistant.
+
+Les cycles du coordinateur ne tombent jamais exactement à intervalle régulier
+(retards, backoff après erreur). Les séries de puissance, courant et tension sont
+donc reprojetées sur une grille uniforme à partir des horodatages de la borne
+elle-même, et les trous trop longs sont marqués plutôt qu'interpolés. Les
+derniers points de grille sont gardés en mémoire, en colonnes, pour les
+courbes récentes. Les compteurs d'énergie sont rendus monotones : un recul
+parasite est ignoré, une vraie remise à zéro est comptée depuis zéro.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+import math
+
+# Un index qui retombe sous cette fraction du précédent est une remise à zéro
+COUNTER_RESET_RATIO = 0.5
+
+
+class UniformResampler:
+    """Projette une série irrégulière sur une grille de pas ``step`` (secondes).
+
+    Chaque point de grille compris entre deux échantillons est interpolé
+    linéairement ; si les deux échantillons sont séparés de plus de
+    ``max_gap`` secondes, le point vaut None (trou).
+    """
+
+    def __init__(self, step: float, max_gap: float) -> None:
+        """Initialisation."""
+        self.step = step
+        self.max_gap = max_gap
+        self._last: tuple[float, float] | None = None
+
+    def add(self, ts: float, value: float) -> list[tuple[float, float | None]]:
+        """Ajoute un échantillon et retourne les points de grille désormais connus."""
+        if ts <= 0:
+            return []
+        last = self._last
+        if last is not None and ts <= last[0]:
+            # Même mesure relue : la borne n'a pas produit de nouvel échantillon
+            return []
+        self._last = (ts, value)
+        if last is None:
+            return [(ts, value)] if ts % self.step == 0 else []
+
+        last_ts, last_value = last
+        gap = ts - last_ts
+        points = []
+        grid_ts = math.floor(last_ts / self.step) * self.step + self.step
+        while grid_ts <= ts:
+            if grid_ts == ts:
+                points.append((grid_ts, value))
+            elif gap > self.max_gap:
+                points.append((grid_ts, None))
+            else:
+                points.append((grid_ts, last_value + (value - last_value) * (grid_ts - last_ts) / gap))
+            grid_ts += self.step
+        return points
+
+
+def _compact_ts(ts: float) -> float | int:
+    """Horodatage entier quand il l'est (JSON plus court)."""
+    return int(ts) if ts == int(ts) else round(ts, 3)
+
+
+def downsample(times: list[float], values: list, points: int) -> tuple[list, list]:
+    """Réduit une série à ``points`` tranches de durée égale (moyenne par tranche).
+
+    Une tranche sans valeur connue vaut None : les trous restent visibles.
+    """
+    if len(times) <= points:
+        return times, values
+    start = times[0]
+    width = (times[-1] - start) / points
+    if width <= 0:
+        return times[-points:], values[-points:]
+    sums = [0.0] * points
+    counts = [0] * points
+    for ts, value in zip(times, values):
+        if value is None:
+            continue
+        index = min(int((ts - start) / width), points - 1)
+        sums[index] += value
+        counts[index] += 1
+    return (
+        [start + index * width for index in range(points)],
+        [sums[index] / counts[index] if counts[index] else None for index in range(points)],
+    )
+
+
+class RecentSeries:
+    """Derniers points de grille de chaque valeur, en colonnes (horodatages, valeurs)."""
+
+    def __init__(self, max_points: int) -> None:
+        """Initialisation."""
+        self.max_points = max_points
+        self._columns: dict[str, tuple[deque, deque]] = {}
+
+    @property
+    def names(self) -> list[str]:
+        """Valeurs disponibles."""
+        return list(self._columns)
+
+    def extend(self, name: str, points: list[tuple[float, float | None]]) -> None:
+        """Ajoute les nouveaux points de grille d'une valeur."""
+        if not points:
+            return
+        if name not in self._columns:
+            self._columns[name] = (deque(maxlen=self.max_points), deque(maxlen=self.max_points))
+        times, values = self._columns[name]
+        for ts, value in points:
+            times.append(ts)
+            values.append(value)
+
+    def columns(self, name: str, since: float | None = None, points: int | None = None) -> dict:
+        """Série d'une valeur depuis ``since``, réduite à ``points`` au plus : {"t": [...], "v": [...]}."""
+        times, values = self._columns.get(name, ((), ()))
+        times, values = list(times), list(values)
+        if since is not None:
+            start = bisect_left(times, since)
+            times, values = times[start:], values[start:]
+        if points:
+            times, values = downsample(times, values, points)
+        return {
+            "t": [_compact_ts(ts) for ts in times],
+            "v": [round(value, 3) if value is not None else None for value in values],
+        }
+
+
+class CounterTracker:
+    """Index d'un compteur cumulatif, protégé des reculs et des remises à zéro."""
+
+    def __init__(self, last: float | None = None) -> None:
+        """Initialisation, éventuellement depuis un index sauvegardé."""
+        self.last = last
+        self.resets = 0
+
+    def update(self, raw: float) -> float:
+        """Prend en compte un index brut et retourne l'énergie ajoutée depuis le précédent."""
+        previous = self.last
+        if previous is None:
+            self.last = raw
+            return 0.0
+        if raw >= previous:
+            self.last = raw
+            return raw - previous
+        if raw <= previous * COUNTER_RESET_RATIO:
+            # Remise à zéro (nouvelle session, redémarrage) : tout l'index est nouveau
+            self.resets += 1
+            self.last = raw
+            return raw
+        # Recul parasite : l'index retenu ne recule pas
+        return 0.0
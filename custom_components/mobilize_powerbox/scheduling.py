@@ -0,0 +1,40 @@
+"""Politique d'intervalle des coordinateurs, sans dépendance à Home Assistant.
+
+Partagée entre le coordinateur temps réel et le simulateur.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+# Intervalle après erreur (backoff), les intervalles normaux sont des options
+SCAN_INTERVAL_REALTIME_ERROR = timedelta(minutes=2)
+
+# Nombre d'erreurs consécutives à partir duquel la borne est jugée instable
+UNSTABLE_ERROR_COUNT = 3
+
+# En dessous de cette fraction d'intervalle, la bascule visée est sautée
+ALIGN_MIN_FRACTION = 0.5
+
+
+def realtime_interval(scan_interval: timedelta, consecutive_errors: int) -> timedelta:
+    """Intervalle du prochain cycle temps réel selon l'état de la borne."""
+    if consecutive_errors >= UNSTABLE_ERROR_COUNT:
+        # Ralentir les mises à jour en cas de problèmes répétés
+        return max(scan_interval, SCAN_INTERVAL_REALTIME_ERROR)
+    return scan_interval
+
+
+def aligned_interval(now: float, interval: timedelta) -> timedelta:
+    """Délai jusqu'au prochain multiple de ``interval`` de l'horloge murale.
+
+    Les cycles tombent ainsi sur des instants fixes (:00, :30...) au lieu de
+    dériver d'un cycle à l'autre. Une bascule trop proche (moins d'une
+    demi-période) est sautée pour ne pas interroger deux fois de suite.
+    """
+    period = interval.total_seconds()
+    if period <= 0:
+        return interval
+    delay = period - now % period
+    if delay < period * ALIGN_MIN_FRACTION:
+        delay += period
+    return timedelta(seconds=delay)
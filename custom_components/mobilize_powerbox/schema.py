@@ -0,0 +1,196 @@
+"""Schéma des paramètres de configuration de la PowerBox (/configs/modules).
+
+Le schéma (type, unité, bornes, valeurs possibles, lecture seule) ne change
+qu'avec le firmware : il est récupéré une seule fois par version puis mis en
+cache. Il sert à typer les valeurs de /configs et à valider une écriture
+avant de l'envoyer à la borne.
+"""
+from __future__ import annotations
+
+from .const import DEVICE_METADATA_KEYS
+
+TYPE_INT = "int"
+TYPE_FLOAT = "float"
+TYPE_BOOL = "bool"
+TYPE_STRING = "string"
+
+# Noms de types rencontrés selon les firmwares
+_TYPE_ALIASES = {
+    TYPE_INT: ("int", "integer", "int32", "int64", "uint", "uint8", "uint16", "uint32", "uint64", "long"),
+    TYPE_FLOAT: ("float", "double", "number", "decimal", "real"),
+    TYPE_BOOL: ("bool", "boolean"),
+}
+
+_TRUE = ("true", "1", "on", "yes")
+_FALSE = ("false", "0", "off", "no")
+
+
+def _first(item: dict, *names: str, default=None):
+    """Première clé présente parmi ``names``."""
+    for name in names:
+        if name in item and item[name] is not None:
+            return item[name]
+    return default
+
+
+def _normalize_type(raw_type) -> str:
+    """Ramène un nom de type du firmware à l'un des types connus."""
+    raw_type = str(raw_type or "").lower()
+    for normalized, aliases in _TYPE_ALIASES.items():
+        if raw_type in aliases:
+            return normalized
+    return TYPE_STRING
+
+
+def _parse_entry(module: str, item: dict) -> tuple[str, dict] | None:
+    """Transforme une description de paramètre en (clé, définition)."""
+    name = _first(item, "config_name", "name", "Name")
+    if not module or not name:
+        return None
+    options = _first(item, "values", "enum", "options", "allowed_values", default=[])
+    return f"{module}.{name}", {
+        "type": _normalize_type(_first(item, "type", "config_type", "Type")),
+        "unit": _first(item, "unit", "Unit"),
+        "min": _first(item, "min", "minimum", "Min"),
+        "max": _first(item, "max", "maximum", "Max"),
+        "options": [str(option) for option in options] if isinstance(options, list) else [],
+        "read_only": bool(_first(item, "read_only", "readonly", "readOnly", default=False)),
+    }
+
+
+def parse_modules(modules) -> dict[str, dict]:
+    """Transforme la réponse de /configs/modules en {"Module.Paramètre": définition}.
+
+    Accepte une liste de modules portant leurs paramètres, ou une liste plate
+    de paramètres portant leur ``module_name`` (même forme que /configs).
+    """
+    if isinstance(modules, dict):
+        modules = _first(modules, "modules", "Modules", default=[])
+
+    schema = {}
+    for module in modules or []:
+        if not isinstance(module, dict):
+            continue
+        module_name = _first(module, "module_name", "name", "Name")
+        entries = _first(module, "configs", "parameters", "Configs")
+        if not isinstance(entries, list):
+            entries = [module] if "config_name" in module else []
+        for item in entries:
+            parsed = _parse_entry(_first(item, "module_name", default=module_name), item)
+            if parsed:
+                schema[parsed[0]] = parsed[1]
+    return schema
+
+
+def device_metadata(configs: dict) -> dict[str, str]:
+    """Métadonnées de l'appareil (firmware, matériel, modèle) lues dans /configs."""
+    metadata = {}
+    for field, keys in DEVICE_METADATA_KEYS.items():
+        for key in keys:
+            value = configs.get(key, {}).get("config_value")
+            if value:
+                metadata[field] = str(value)
+                break
+    return metadata
+
+
+def firmware_version(configs: dict) -> str | None:
+    """Version du firmware annoncée par la borne, ou None."""
+    return device_metadata(configs).get("sw_version")
+
+
+def _to_number(value, number_type: str):
+    """Convertit en entier ou flottant (``ValueError`` si impossible)."""
+    number = float(value)
+    if number_type == TYPE_INT:
+        if not number.is_integer():
+            raise ValueError(f"{value!r} n'est pas un entier")
+        return int(number)
+    return number
+
+
+def _to_bool(value) -> bool:
+    """Convertit en booléen (``ValueError`` si impossible)."""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"{value!r} n'est pas un booléen")
+
+
+class ConfigSchema:
+    """Schéma des paramètres pour une version de firmware."""
+
+    def __init__(self, firmware: str | None, entries: dict[str, dict]) -> None:
+        """Initialisation."""
+        self.firmware = firmware
+        self.entries = entries
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> dict | None:
+        """Définition d'un paramètre, ou None s'il est inconnu."""
+        return self.entries.get(key)
+
+    def _convert(self, key: str, value):
+        """Convertit une valeur selon le type déclaré (``ValueError`` si impossible)."""
+        value_type = self.entries[key]["type"]
+        if value_type in (TYPE_INT, TYPE_FLOAT):
+            return _to_number(value, value_type)
+        if value_type == TYPE_BOOL:
+            return _to_bool(value)
+        return str(value)
+
+    def coerce(self, key: str, value):
+        """Type une valeur lue dans /configs (valeur brute si inconnue ou invalide)."""
+        if value is None or key not in self.entries:
+            return value
+        try:
+            return self._convert(key, value)
+        except (TypeError, ValueError):
+            return value
+
+    def validate(self, key: str, value):
+        """Vérifie une valeur avant écriture et la retourne typée.
+
+        Un paramètre absent du schéma (forme de /configs/modules non reconnue)
+        n'est pas validé : la valeur est retournée telle quelle, comme sans
+        schéma. Lève ``ValueError`` si le paramètre est en lecture seule, ou si
+        la valeur n'a pas le bon type, sort des bornes ou des valeurs permises.
+        """
+        definition = self.entries.get(key)
+        if definition is None:
+            return value
+        if definition["read_only"]:
+            raise ValueError(f"Paramètre en lecture seule: {key}")
+        try:
+            typed = self._convert(key, value)
+        except (TypeError, ValueError) as err:
+            raise ValueError(f"Valeur invalide pour {key}: {err}") from err
+
+        if definition["options"] and str(value) not in definition["options"]:
+            raise ValueError(
+                f"Valeur {value!r} non permise pour {key} ({', '.join(definition['options'])})"
+            )
+        if definition["type"] in (TYPE_INT, TYPE_FLOAT):
+            if definition["min"] is not None and typed < float(definition["min"]):
+                raise ValueError(f"{key} doit être ≥ {definition['min']}")
+            if definition["max"] is not None and typed > float(definition["max"]):
+                raise ValueError(f"{key} doit être ≤ {definition['max']}")
+        return typed
+
+    def as_dict(self) -> dict:
+        """Contenu persisté."""
+        return {"firmware": self.firmware, "entries": self.entries}
+
+    @classmethod
+    def from_dict(cls, stored: dict) -> ConfigSchema:
+        """Restaure un schéma persisté."""
+        return cls(stored.get("firmware"), stored.get("entries", {}))
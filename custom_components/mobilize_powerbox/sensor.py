@@ -1,22 +1,45 @@
 """Capteurs pour Mobilize PowerBox."""
 from __future__ import annotations
 
+from collections.abc import Callable
 import logging
 
 from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
 from homeassistant.const import (
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfTime,
     UnitOfElectricCurrent,
     UnitOfElectricPotential,
     UnitOfPower,
     UnitOfEnergy,
 )
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 from homeassistant.config_entries import ConfigEntry
 
-from .const import DOMAIN
-from .coordinator import PowerBoxRealtimeCoordinator, PowerBoxConfigCoordinator
+from .const import (
+    DOMAIN,
+    DERIVED_HOUSEHOLD_POWER,
+    DERIVED_POWER_FACTOR,
+    DERIVED_POWER_RATE,
+    TARIFF_PERIODS,
+    TARIFF_UNATTRIBUTED,
+    CURRENCY_EURO,
+    CHARGE_STATES,
+    DATA_SCHEDULER,
+    INTEGRATION_MANUFACTURER,
+    SITE_DEVICE_ID,
+    SITE_DEVICE_NAME,
+)
+from .aggregate import SiteAggregator, get_site_aggregator
+from .charge_scheduler import ChargeScheduler
+from .fleet_allocator import FleetAllocator, get_fleet_allocator
+from .coordinator import PowerBoxRealtimeCoordinator, PowerBoxConfigCoordinator, PowerBoxTokensCoordinator
+from .tokens import UNKNOWN_TOKEN
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -36,26 +59,94 @@ async def async_setup_entry(
     
     # Créer les capteurs temps réel (10s)
     realtime_sensors = [
-        PowerBoxCurrentSensor(coordinator_realtime, device_info),
-        PowerBoxVoltageSensor(coordinator_realtime, device_info),
-        PowerBoxPowerSensor(coordinator_realtime, device_info),
-        PowerBoxSessionEnergySensor(coordinator_realtime, device_info),
-        PowerBoxTotalEnergySensor(coordinator_realtime, device_info),
-        PowerBoxTicCurrentSensor(coordinator_realtime, device_info),
-        PowerBoxTicPowerSensor(coordinator_realtime, device_info),
+        PowerBoxCurrentSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxVoltageSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxPowerSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxSessionEnergySensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxTotalEnergySensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxTicCurrentSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxTicPowerSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxHouseholdPowerSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxPowerFactorSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxPowerRateSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxChargeStateSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxDataAgeSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxChargeEndSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxEnergyTargetTimeSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxProjectedEnergySensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxTariffPeriodSensor(coordinator_realtime, entry.entry_id, device_info),
+        PowerBoxTotalCostSensor(coordinator_realtime, entry.entry_id, device_info),
     ]
+    for period in TARIFF_PERIODS:
+        realtime_sensors.append(PowerBoxTariffEnergySensor(coordinator_realtime, entry.entry_id, device_info, period))
+        realtime_sensors.append(PowerBoxTariffCostSensor(coordinator_realtime, entry.entry_id, device_info, period))
+    realtime_sensors.append(PowerBoxUnattributedEnergySensor(coordinator_realtime, entry.entry_id, device_info))
     
     # Créer les capteurs de configuration (5min)
     config_sensors = [
-        PowerBoxMaxCurrentSensor(coordinator_config, device_info),
-        PowerBoxHouseholdPowerLimitSensor(coordinator_config, device_info),
-        PowerBoxDynamicLoadModeSensor(coordinator_config, device_info),
-        PowerBoxChargerModeSensor(coordinator_config, device_info),
-        PowerBoxCountrySensor(coordinator_config, device_info),
-        PowerBoxInstallationTypeSensor(coordinator_config, device_info),
+        PowerBoxMaxCurrentSensor(coordinator_config, entry.entry_id, device_info),
+        PowerBoxHouseholdPowerLimitSensor(coordinator_config, entry.entry_id, device_info),
+        PowerBoxDynamicLoadModeSensor(coordinator_config, entry.entry_id, device_info),
+        PowerBoxChargerModeSensor(coordinator_config, entry.entry_id, device_info),
+        PowerBoxCountrySensor(coordinator_config, entry.entry_id, device_info),
+        PowerBoxInstallationTypeSensor(coordinator_config, entry.entry_id, device_info),
     ]
     
+    # Prochaine bascule de la planification de charge (si activée)
+    scheduler: ChargeScheduler | None = domain_data.get(DATA_SCHEDULER)
+    if scheduler is not None:
+        config_sensors.append(PowerBoxChargeScheduleSensor(scheduler, entry.entry_id, device_info))
+    
+    # Consigne de la flotte (si la borne en fait partie)
+    allocator = get_fleet_allocator(hass)
+    if allocator.get_box(entry.entry_id) is not None:
+        config_sensors.append(PowerBoxFleetSetpointSensor(allocator, entry.entry_id, device_info))
+    
     async_add_entities(realtime_sensors + config_sensors, True)
+    
+    # Badge de la session en cours (état initial depuis l'inventaire, sans requête)
+    coordinator_tokens: PowerBoxTokensCoordinator = domain_data["coordinator_tokens"]
+    async_add_entities([PowerBoxSessionTokenSensor(coordinator_tokens, entry.entry_id, device_info)])
+    
+    # Un capteur d'énergie par badge, ajouté dès qu'un badge apparaît dans l'inventaire
+    known_tokens: set[str] = set()
+    
+    @callback
+    def _async_add_token_sensors() -> None:
+        inventory = coordinator_tokens.inventory
+        new_tokens = [
+            token_id for token_id in (*inventory.tokens, *inventory.totals)
+            if token_id not in known_tokens
+        ]
+        if not new_tokens:
+            return
+        known_tokens.update(new_tokens)
+        async_add_entities(
+            PowerBoxTokenEnergySensor(coordinator_tokens, entry.entry_id, device_info, token_id)
+            for token_id in new_tokens
+        )
+    
+    _async_add_token_sensors()
+    entry.async_on_unload(coordinator_tokens.async_add_listener(_async_add_token_sensors))
+    
+    # Capteurs de site, créés automatiquement dès que plusieurs PowerBox sont chargées
+    get_site_aggregator(hass).async_register_platform(
+        entry.entry_id, async_add_entities, _create_site_sensors
+    )
+
+
+def _create_site_sensors(aggregator: SiteAggregator) -> list[SensorEntity]:
+    """Crée les capteurs agrégés du site."""
+    device_info = DeviceInfo(
+        identifiers={(DOMAIN, SITE_DEVICE_ID)},
+        name=SITE_DEVICE_NAME,
+        manufacturer=INTEGRATION_MANUFACTURER,
+    )
+    return [
+        PowerBoxSitePowerSensor(aggregator, device_info),
+        PowerBoxSiteSessionEnergySensor(aggregator, device_info),
+        PowerBoxSiteHeadroomSensor(aggregator, device_info),
+    ]
 
 
 # ============================================================================
@@ -65,11 +156,11 @@ async def async_setup_entry(
 class PowerBoxCurrentSensor(CoordinatorEntity, SensorEntity):
     """Capteur de courant de charge actuel."""
 
-    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Courant"
-        self._attr_unique_id = f"powerbox_current"
+        self._attr_unique_id = f"{entry_id}_current"
         self._attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
         self._attr_device_class = SensorDeviceClass.CURRENT
         self._attr_state_class = SensorStateClass.MEASUREMENT
@@ -94,11 +185,11 @@ class PowerBoxCurrentSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxVoltageSensor(CoordinatorEntity, SensorEntity):
     """Capteur de tension."""
 
-    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Tension"
-        self._attr_unique_id = f"powerbox_voltage"
+        self._attr_unique_id = f"{entry_id}_voltage"
         self._attr_native_unit_of_measurement = UnitOfElectricPotential.VOLT
         self._attr_device_class = SensorDeviceClass.VOLTAGE
         self._attr_state_class = SensorStateClass.MEASUREMENT
@@ -123,11 +214,11 @@ class PowerBoxVoltageSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxPowerSensor(CoordinatorEntity, SensorEntity):
     """Capteur de puissance active."""
 
-    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Puissance"
-        self._attr_unique_id = f"powerbox_power"
+        self._attr_unique_id = f"{entry_id}_power"
         self._attr_native_unit_of_measurement = UnitOfPower.WATT
         self._attr_device_class = SensorDeviceClass.POWER
         self._attr_state_class = SensorStateClass.MEASUREMENT
@@ -152,11 +243,11 @@ class PowerBoxPowerSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxSessionEnergySensor(CoordinatorEntity, SensorEntity):
     """Capteur d'énergie de la session de charge en cours."""
 
-    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Énergie Session"
-        self._attr_unique_id = f"powerbox_session_energy"
+        self._attr_unique_id = f"{entry_id}_session_energy"
         self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
         self._attr_device_class = SensorDeviceClass.ENERGY
         self._attr_state_class = SensorStateClass.TOTAL_INCREASING
@@ -165,7 +256,7 @@ class PowerBoxSessionEnergySensor(CoordinatorEntity, SensorEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Mise à jour du capteur avec les données du coordinateur."""
-        value = self.coordinator.get_meter_value("EVPLCCom-Virtual-Meter", "SessionTotalEnergy_Ws")
+        value = self.coordinator.get_counter_value("SessionTotalEnergy_Ws")
         if value is not None:
             self._attr_native_value = round(value / 3600 / 1000, 2)  # Ws vers kWh
         else:
@@ -181,11 +272,11 @@ class PowerBoxSessionEnergySensor(CoordinatorEntity, SensorEntity):
 class PowerBoxTotalEnergySensor(CoordinatorEntity, SensorEntity):
     """Capteur d'énergie totale de la borne (depuis l'installation)."""
 
-    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Énergie Totale"
-        self._attr_unique_id = f"powerbox_total_energy"
+        self._attr_unique_id = f"{entry_id}_total_energy"
         self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
         self._attr_device_class = SensorDeviceClass.ENERGY
         self._attr_state_class = SensorStateClass.TOTAL_INCREASING
@@ -194,7 +285,7 @@ class PowerBoxTotalEnergySensor(CoordinatorEntity, SensorEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Mise à jour du capteur avec les données du coordinateur."""
-        value = self.coordinator.get_meter_value("Power Board Meter", "ActiveEnergy_Ws")
+        value = self.coordinator.get_counter_value("ActiveEnergy_Ws")
         if value is not None:
             self._attr_native_value = round(value / 3600 / 1000, 1)  # Ws vers kWh
         else:
@@ -210,11 +301,11 @@ class PowerBoxTotalEnergySensor(CoordinatorEntity, SensorEntity):
 class PowerBoxTicCurrentSensor(CoordinatorEntity, SensorEntity):
     """Capteur de courant TiC (téléinformation client)."""
 
-    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Courant TiC"
-        self._attr_unique_id = f"powerbox_tic_current"
+        self._attr_unique_id = f"{entry_id}_tic_current"
         self._attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
         self._attr_device_class = SensorDeviceClass.CURRENT
         self._attr_state_class = SensorStateClass.MEASUREMENT
@@ -239,11 +330,11 @@ class PowerBoxTicCurrentSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxTicPowerSensor(CoordinatorEntity, SensorEntity):
     """Capteur de puissance apparente TiC."""
 
-    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Puissance TiC"
-        self._attr_unique_id = f"powerbox_tic_power"
+        self._attr_unique_id = f"{entry_id}_tic_power"
         self._attr_native_unit_of_measurement = "VA"  # Volt-Ampère
         self._attr_device_class = SensorDeviceClass.APPARENT_POWER
         self._attr_state_class = SensorStateClass.MEASUREMENT
@@ -265,6 +356,351 @@ class PowerBoxTicPowerSensor(CoordinatorEntity, SensorEntity):
         return self.coordinator.last_update_success
 
 
+# ============================================================================
+# CAPTEURS DÉRIVÉS (calculés par le coordinateur temps réel)
+# ============================================================================
+
+class PowerBoxHouseholdPowerSensor(CoordinatorEntity, SensorEntity):
+    """Capteur de consommation du foyer hors borne (TiC - borne)."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_name = "PowerBox Consommation Foyer"
+        self._attr_unique_id = f"{entry_id}_household_power"
+        self._attr_native_unit_of_measurement = UnitOfPower.WATT
+        self._attr_device_class = SensorDeviceClass.POWER
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        self._attr_device_info = device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec les données du coordinateur."""
+        value = self.coordinator.get_derived_value(DERIVED_HOUSEHOLD_POWER)
+        self._attr_native_value = round(value, 0) if value is not None else None
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxPowerFactorSensor(CoordinatorEntity, SensorEntity):
+    """Capteur de facteur de puissance instantané."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_name = "PowerBox Facteur de Puissance"
+        self._attr_unique_id = f"{entry_id}_power_factor"
+        self._attr_native_unit_of_measurement = PERCENTAGE
+        self._attr_device_class = SensorDeviceClass.POWER_FACTOR
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        self._attr_device_info = device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec les données du coordinateur."""
+        value = self.coordinator.get_derived_value(DERIVED_POWER_FACTOR)
+        self._attr_native_value = round(value * 100, 1) if value is not None else None
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxPowerRateSensor(CoordinatorEntity, SensorEntity):
+    """Capteur de variation de puissance (dP/dt)."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_name = "PowerBox Variation Puissance"
+        self._attr_unique_id = f"{entry_id}_power_rate"
+        self._attr_native_unit_of_measurement = "W/s"
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        self._attr_icon = "mdi:chart-line-variant"
+        self._attr_device_info = device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec les données du coordinateur."""
+        value = self.coordinator.get_derived_value(DERIVED_POWER_RATE)
+        self._attr_native_value = round(value, 1) if value is not None else None
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxChargeStateSensor(CoordinatorEntity, SensorEntity):
+    """Capteur de l'état de charge (écrit uniquement sur changement d'état)."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_name = "PowerBox État de Charge"
+        self._attr_unique_id = f"{entry_id}_charge_state"
+        self._attr_device_class = SensorDeviceClass.ENUM
+        self._attr_options = CHARGE_STATES
+        self._attr_icon = "mdi:ev-plug-type2"
+        self._attr_device_info = device_info
+        self._written = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur, uniquement sur changement."""
+        self._attr_native_value = self.coordinator.data.charge_state if self.coordinator.data else None
+        written = (self._attr_native_value, self.available)
+        if written != self._written:
+            self._written = written
+            self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxDataAgeSensor(CoordinatorEntity, SensorEntity):
+    """Capteur de l'âge des mesures (0 tant qu'elles sont fraîches)."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_name = "PowerBox Âge des Mesures"
+        self._attr_unique_id = f"{entry_id}_data_age"
+        self._attr_native_unit_of_measurement = UnitOfTime.SECONDS
+        self._attr_device_class = SensorDeviceClass.DURATION
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_icon = "mdi:timer-sand"
+        self._attr_device_info = device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec la fraîcheur de l'instantané."""
+        data = self.coordinator.data
+        self._attr_native_value = data.data_age if data else None
+        self._attr_extra_state_attributes = {
+            "served_from_cache": data.served_from_cache if data else None,
+            "max_age": self.coordinator.stale.max_age,
+        }
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+# ============================================================================
+# ESTIMATION DE FIN DE CHARGE (recalculée seulement sur un nouvel échantillon)
+# ============================================================================
+
+class PowerBoxEtaSensor(CoordinatorEntity, SensorEntity):
+    """Base des capteurs d'estimation, écrits uniquement quand l'estimation change."""
+
+    eta_key: str
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_device_info = device_info
+        self._written = None
+
+    def _convert(self, value):
+        """Valeur du capteur à partir de l'estimation."""
+        return value
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur, uniquement sur changement."""
+        value = self.coordinator.get_eta_value(self.eta_key)
+        written = (value, self.available)
+        if written != self._written:
+            self._written = written
+            self._attr_native_value = self._convert(value) if value is not None else None
+            self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxChargeEndSensor(PowerBoxEtaSensor):
+    """Capteur de l'heure estimée de fin de charge."""
+
+    eta_key = "end"
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator, device_info)
+        self._attr_name = "PowerBox Fin de Charge Estimée"
+        self._attr_unique_id = f"{entry_id}_charge_end"
+        self._attr_device_class = SensorDeviceClass.TIMESTAMP
+        self._attr_icon = "mdi:battery-clock"
+
+    def _convert(self, value):
+        """Horodatage Unix vers datetime."""
+        return dt_util.utc_from_timestamp(value)
+
+
+class PowerBoxEnergyTargetTimeSensor(PowerBoxChargeEndSensor):
+    """Capteur de l'heure estimée d'atteinte de l'objectif d'énergie."""
+
+    eta_key = "target"
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator, device_info)
+        self._attr_name = "PowerBox Objectif d'Énergie Estimé"
+        self._attr_unique_id = f"{entry_id}_energy_target_time"
+        self._attr_icon = "mdi:flag-checkered"
+
+
+class PowerBoxProjectedEnergySensor(PowerBoxEtaSensor):
+    """Capteur de l'énergie projetée de la session."""
+
+    eta_key = "projected_energy_kwh"
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator, device_info)
+        self._attr_name = "PowerBox Énergie Session Projetée"
+        self._attr_unique_id = f"{entry_id}_projected_session_energy"
+        self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+        self._attr_device_class = SensorDeviceClass.ENERGY
+        self._attr_icon = "mdi:battery-charging-high"
+
+
+# ============================================================================
+# CAPTEURS TARIFAIRES (cumuls HP/HC persistants)
+# ============================================================================
+
+class PowerBoxTariffPeriodSensor(CoordinatorEntity, SensorEntity):
+    """Capteur de la période tarifaire en cours."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_name = "PowerBox Période Tarifaire"
+        self._attr_unique_id = f"{entry_id}_tariff_period"
+        self._attr_icon = "mdi:clock-time-eight-outline"
+        self._attr_device_info = device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec les données du coordinateur."""
+        tariff = self.coordinator.data.tariff if self.coordinator.data else {}
+        period = tariff.get("period")
+        self._attr_native_value = period.upper() if period else "unknown"
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxTariffEnergySensor(CoordinatorEntity, SensorEntity):
+    """Capteur d'énergie cumulée sur une période tarifaire."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info, period: str):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._period = period
+        self._attr_name = f"PowerBox Énergie {period.upper()}"
+        self._attr_unique_id = f"{entry_id}_energy_{period}"
+        self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+        self._attr_device_class = SensorDeviceClass.ENERGY
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        self._attr_device_info = device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec les données du coordinateur."""
+        value = self.coordinator.get_tariff_value("energy_kwh", self._period)
+        self._attr_native_value = round(value, 3) if value is not None else None
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxUnattributedEnergySensor(PowerBoxTariffEnergySensor):
+    """Capteur d'énergie comptée pendant une interruption, sans période connue."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator, entry_id, device_info, TARIFF_UNATTRIBUTED)
+        self._attr_name = "PowerBox Énergie Non Attribuée"
+        self._attr_icon = "mdi:help-circle-outline"
+
+
+class PowerBoxTariffCostSensor(CoordinatorEntity, SensorEntity):
+    """Capteur de coût cumulé sur une période tarifaire."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info, period: str):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._period = period
+        self._attr_name = f"PowerBox Coût {period.upper()}"
+        self._attr_unique_id = f"{entry_id}_cost_{period}"
+        self._attr_native_unit_of_measurement = CURRENCY_EURO
+        self._attr_device_class = SensorDeviceClass.MONETARY
+        self._attr_state_class = SensorStateClass.TOTAL
+        self._attr_device_info = device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec les données du coordinateur."""
+        value = self.coordinator.get_tariff_value("cost", self._period)
+        self._attr_native_value = round(value, 2) if value is not None else None
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
+class PowerBoxTotalCostSensor(CoordinatorEntity, SensorEntity):
+    """Capteur de coût total cumulé (toutes périodes)."""
+
+    def __init__(self, coordinator: PowerBoxRealtimeCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_name = "PowerBox Coût Total"
+        self._attr_unique_id = f"{entry_id}_cost_total"
+        self._attr_native_unit_of_measurement = CURRENCY_EURO
+        self._attr_device_class = SensorDeviceClass.MONETARY
+        self._attr_state_class = SensorStateClass.TOTAL
+        self._attr_device_info = device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec les données du coordinateur."""
+        tariff = self.coordinator.data.tariff if self.coordinator.data else {}
+        if tariff:
+            self._attr_native_value = round(sum(tariff["cost"].values()), 2)
+        else:
+            self._attr_native_value = None
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Retourne si l'entité est disponible."""
+        return self.coordinator.last_update_success
+
+
 # ============================================================================
 # CAPTEURS DE CONFIGURATION (depuis /configs) - Coordinateur 5min
 # ============================================================================
@@ -272,11 +708,11 @@ class PowerBoxTicPowerSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxMaxCurrentSensor(CoordinatorEntity, SensorEntity):
     """Capteur de courant maximum configuré."""
 
-    def __init__(self, coordinator: PowerBoxConfigCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxConfigCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Courant Maximum"
-        self._attr_unique_id = f"powerbox_max_current"
+        self._attr_unique_id = f"{entry_id}_max_current"
         self._attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
         self._attr_device_class = SensorDeviceClass.CURRENT
         self._attr_state_class = SensorStateClass.MEASUREMENT
@@ -285,8 +721,8 @@ class PowerBoxMaxCurrentSensor(CoordinatorEntity, SensorEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Mise à jour du capteur avec les données du coordinateur."""
-        value = self.coordinator.get_config_value("ChargerApp.ACCharging.maxCurrent_mA")
-        if value:
+        value = self.coordinator.get_typed_config_value("ChargerApp.ACCharging.maxCurrent_mA")
+        if value is not None:
             try:
                 self._attr_native_value = round(int(value) / 1000, 2)  # mA vers A
             except (ValueError, TypeError):
@@ -304,11 +740,11 @@ class PowerBoxMaxCurrentSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxHouseholdPowerLimitSensor(CoordinatorEntity, SensorEntity):
     """Capteur de limite de puissance du foyer."""
 
-    def __init__(self, coordinator: PowerBoxConfigCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxConfigCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Limite Puissance Foyer"
-        self._attr_unique_id = f"powerbox_household_power_limit"
+        self._attr_unique_id = f"{entry_id}_household_power_limit"
         self._attr_native_unit_of_measurement = UnitOfPower.WATT
         self._attr_device_class = SensorDeviceClass.POWER
         self._attr_state_class = SensorStateClass.MEASUREMENT
@@ -317,8 +753,8 @@ class PowerBoxHouseholdPowerLimitSensor(CoordinatorEntity, SensorEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Mise à jour du capteur avec les données du coordinateur."""
-        value = self.coordinator.get_config_value("ihal.household.PowerLimit_W")
-        if value:
+        value = self.coordinator.get_typed_config_value("ihal.household.PowerLimit_W")
+        if value is not None:
             try:
                 self._attr_native_value = int(value)
             except (ValueError, TypeError):
@@ -336,11 +772,11 @@ class PowerBoxHouseholdPowerLimitSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxDynamicLoadModeSensor(CoordinatorEntity, SensorEntity):
     """Capteur du mode de gestion dynamique de charge."""
 
-    def __init__(self, coordinator: PowerBoxConfigCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxConfigCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Mode Gestion Dynamique"
-        self._attr_unique_id = f"powerbox_dynamic_load_mode"
+        self._attr_unique_id = f"{entry_id}_dynamic_load_mode"
         self._attr_icon = "mdi:sync"
         self._attr_device_info = device_info
 
@@ -360,11 +796,11 @@ class PowerBoxDynamicLoadModeSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxChargerModeSensor(CoordinatorEntity, SensorEntity):
     """Capteur du mode de charge."""
 
-    def __init__(self, coordinator: PowerBoxConfigCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxConfigCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Mode de Charge"
-        self._attr_unique_id = f"powerbox_charger_mode"
+        self._attr_unique_id = f"{entry_id}_charger_mode"
         self._attr_icon = "mdi:ev-station"
         self._attr_device_info = device_info
 
@@ -384,11 +820,11 @@ class PowerBoxChargerModeSensor(CoordinatorEntity, SensorEntity):
 class PowerBoxCountrySensor(CoordinatorEntity, SensorEntity):
     """Capteur du pays configuré."""
 
-    def __init__(self, coordinator: PowerBoxConfigCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxConfigCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Pays"
-        self._attr_unique_id = f"powerbox_country"
+        self._attr_unique_id = f"{entry_id}_country"
         self._attr_icon = "mdi:flag"
         self._attr_device_info = device_info
 
@@ -408,11 +844,11 @@ class PowerBoxCountrySensor(CoordinatorEntity, SensorEntity):
 class PowerBoxInstallationTypeSensor(CoordinatorEntity, SensorEntity):
     """Capteur du type d'installation."""
 
-    def __init__(self, coordinator: PowerBoxConfigCoordinator, device_info):
+    def __init__(self, coordinator: PowerBoxConfigCoordinator, entry_id: str, device_info):
         """Initialisation."""
         super().__init__(coordinator)
         self._attr_name = "PowerBox Type d'Installation"
-        self._attr_unique_id = f"powerbox_installation_type"
+        self._attr_unique_id = f"{entry_id}_installation_type"
         self._attr_icon = "mdi:home-lightning-bolt"
         self._attr_device_info = device_info
 
@@ -427,3 +863,256 @@ class PowerBoxInstallationTypeSensor(CoordinatorEntity, SensorEntity):
     def available(self) -> bool:
         """Retourne si l'entité est disponible."""
         return self.coordinator.last_update_success
+
+
+# ============================================================================
+# BADGES (inventaire /tokens et cumuls par badge)
+# ============================================================================
+
+class PowerBoxTokenEnergySensor(CoordinatorEntity, SensorEntity):
+    """Capteur d'énergie cumulée des sessions attribuées à un badge."""
+
+    def __init__(self, coordinator: PowerBoxTokensCoordinator, entry_id: str, device_info, token_id: str):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self.token_id = token_id
+        name = "Inconnu" if token_id == UNKNOWN_TOKEN else coordinator.inventory.token_name(token_id)
+        self._attr_name = f"PowerBox Badge {name} Énergie"
+        self._attr_unique_id = f"{entry_id}_token_{token_id}_energy"
+        self._attr_icon = "mdi:card-account-details"
+        self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+        self._attr_device_class = SensorDeviceClass.ENERGY
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        self._attr_device_info = device_info
+
+    async def async_added_to_hass(self) -> None:
+        """État initial depuis l'inventaire en cache."""
+        await super().async_added_to_hass()
+        self._handle_coordinator_update()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec les cumuls du coordinateur."""
+        inventory = self.coordinator.inventory
+        token = inventory.tokens.get(self.token_id)
+        self._attr_native_value = round(self.coordinator.get_token_energy(self.token_id), 3)
+        self._attr_extra_state_attributes = {
+            "sessions": inventory.totals.get(self.token_id, {}).get("sessions", 0),
+            "enabled": token["enabled"] if token else None,
+        }
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Toujours disponible : les cumuls sont tenus localement, même sans /tokens."""
+        return True
+
+
+class PowerBoxSessionTokenSensor(CoordinatorEntity, SensorEntity):
+    """Capteur du badge de la session en cours."""
+
+    def __init__(self, coordinator: PowerBoxTokensCoordinator, entry_id: str, device_info):
+        """Initialisation."""
+        super().__init__(coordinator)
+        self._attr_name = "PowerBox Badge Session"
+        self._attr_unique_id = f"{entry_id}_session_token"
+        self._attr_icon = "mdi:card-account-details-outline"
+        self._attr_device_info = device_info
+
+    async def async_added_to_hass(self) -> None:
+        """État initial depuis l'inventaire en cache."""
+        await super().async_added_to_hass()
+        self._handle_coordinator_update()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Mise à jour du capteur avec la session en cours."""
+        inventory = self.coordinator.inventory
+        session = inventory.session
+        self._attr_native_value = inventory.token_name(session["token"]) if session else None
+        self._attr_extra_state_attributes = {
+            "session_active": session is not None,
+            "attributed": bool(session and session["token"]),
+        }
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Disponible tant que les sessions sont suivies (mesures temps réel), même sans /tokens."""
+        return self.coordinator.coordinator_realtime.last_update_success
+
+
+# ============================================================================
+# PLANIFICATION DE LA CHARGE (heures creuses)
+# ============================================================================
+
+class PowerBoxChargeScheduleSensor(SensorEntity):
+    """Capteur de la prochaine bascule de la planification de charge."""
+
+    _attr_should_poll = False
+
+    def __init__(self, scheduler: ChargeScheduler, entry_id: str, device_info):
+        """Initialisation."""
+        self.scheduler = scheduler
+        self._attr_name = "PowerBox Planification Prochaine Bascule"
+        self._attr_unique_id = f"{entry_id}_charge_schedule_next"
+        self._attr_icon = "mdi:calendar-clock"
+        self._attr_device_class = SensorDeviceClass.TIMESTAMP
+        self._attr_device_info = device_info
+
+    async def async_added_to_hass(self) -> None:
+        """Abonnement aux bascules du planificateur."""
+        self.async_on_remove(self.scheduler.async_add_listener(self._handle_schedule_update))
+        self._update_from_scheduler()
+
+    def _update_from_scheduler(self) -> None:
+        """Recopie l'état du planificateur."""
+        self._attr_native_value = self.scheduler.next_boundary
+        self._attr_extra_state_attributes = {
+            "active": self.scheduler.active,
+            "target_reached": self.scheduler.target_reached,
+            "setpoint": self.scheduler.setpoint,
+        }
+
+    @callback
+    def _handle_schedule_update(self) -> None:
+        """Mise à jour du capteur après une bascule ou l'atteinte de l'objectif."""
+        self._update_from_scheduler()
+        self.async_write_ha_state()
+
+
+# ============================================================================
+# FLOTTE (répartition du courant sous la limite de site)
+# ============================================================================
+
+class PowerBoxFleetSetpointSensor(SensorEntity):
+    """Capteur du courant alloué à la borne par la flotte."""
+
+    _attr_should_poll = False
+
+    def __init__(self, allocator: FleetAllocator, entry_id: str, device_info):
+        """Initialisation."""
+        self.allocator = allocator
+        self.entry_id = entry_id
+        self._attr_name = "PowerBox Courant Alloué"
+        self._attr_unique_id = f"{entry_id}_fleet_setpoint"
+        self._attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
+        self._attr_device_class = SensorDeviceClass.CURRENT
+        self._attr_icon = "mdi:transmission-tower-export"
+        self._attr_device_info = device_info
+        self._written = None
+
+    async def async_added_to_hass(self) -> None:
+        """Abonnement aux consignes de l'allocateur."""
+        self.async_on_remove(self.allocator.async_add_listener(self.entry_id, self._handle_fleet_update))
+        self._update_from_allocator()
+
+    def _update_from_allocator(self) -> None:
+        """Recopie la consigne de la borne."""
+        box = self.allocator.get_box(self.entry_id)
+        self._attr_native_value = box.setpoint
+        self._attr_extra_state_attributes = {
+            "active": box.active,
+            "weight": box.weight,
+            "share_w": round(box.share_w),
+            "reserved_w": round(box.reserved_w),
+            "available_power_w": self.allocator.available_power,
+        }
+
+    @callback
+    def _handle_fleet_update(self) -> None:
+        """Mise à jour du capteur, uniquement sur changement de consigne."""
+        self._update_from_allocator()
+        written = (self._attr_native_value, self._attr_extra_state_attributes["active"])
+        if written != self._written:
+            self._written = written
+            self.async_write_ha_state()
+
+
+# ============================================================================
+# CAPTEURS DE SITE (agrégats incrémentaux sur plusieurs PowerBox)
+# ============================================================================
+
+def _site_power(aggregator: SiteAggregator) -> float:
+    """Somme des puissances des bornes."""
+    return round(aggregator.total_power, 0)
+
+
+def _site_session_energy(aggregator: SiteAggregator) -> float:
+    """Somme des énergies de session des bornes."""
+    return round(aggregator.total_session_energy_wh / 1000, 2)
+
+
+def _site_headroom(aggregator: SiteAggregator) -> float | None:
+    """Limite du site moins la puissance de charge totale (None sans limite)."""
+    headroom = aggregator.headroom
+    return round(headroom, 0) if headroom is not None else None
+
+
+class PowerBoxSiteSensor(SensorEntity):
+    """Base des capteurs de site, mis à jour par l'agrégateur."""
+
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        aggregator: SiteAggregator,
+        device_info,
+        value_fn: Callable[[SiteAggregator], float | None],
+    ):
+        """Initialisation."""
+        self.aggregator = aggregator
+        self._value_fn = value_fn
+        self._attr_device_info = device_info
+
+    async def async_added_to_hass(self) -> None:
+        """Abonnement aux totaux du site."""
+        self.async_on_remove(self.aggregator.async_add_listener(self._handle_site_update))
+        self._attr_native_value = self._value_fn(self.aggregator)
+
+    @callback
+    def _handle_site_update(self) -> None:
+        """Mise à jour du capteur avec les totaux du site."""
+        self._attr_native_value = self._value_fn(self.aggregator)
+        self.async_write_ha_state()
+
+
+class PowerBoxSitePowerSensor(PowerBoxSiteSensor):
+    """Capteur de puissance de charge totale du site."""
+
+    def __init__(self, aggregator: SiteAggregator, device_info):
+        """Initialisation."""
+        super().__init__(aggregator, device_info, _site_power)
+        self._attr_name = "Site PowerBox Puissance"
+        self._attr_unique_id = f"powerbox_site_power"
+        self._attr_native_unit_of_measurement = UnitOfPower.WATT
+        self._attr_device_class = SensorDeviceClass.POWER
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+
+
+class PowerBoxSiteSessionEnergySensor(PowerBoxSiteSensor):
+    """Capteur d'énergie totale des sessions en cours sur le site."""
+
+    def __init__(self, aggregator: SiteAggregator, device_info):
+        """Initialisation."""
+        super().__init__(aggregator, device_info, _site_session_energy)
+        self._attr_name = "Site PowerBox Énergie Sessions"
+        self._attr_unique_id = f"powerbox_site_session_energy"
+        self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+        self._attr_device_class = SensorDeviceClass.ENERGY
+        # La somme baisse à chaque fin de session ou déchargement d'une borne :
+        # une baisse est une remise à zéro, pas une consommation négative
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+
+class PowerBoxSiteHeadroomSensor(PowerBoxSiteSensor):
+    """Capteur de marge de puissance par rapport à la limite du site."""
+
+    def __init__(self, aggregator: SiteAggregator, device_info):
+        """Initialisation."""
+        super().__init__(aggregator, device_info, _site_headroom)
+        self._attr_name = "Site PowerBox Marge Puissance"
+        self._attr_unique_id = f"powerbox_site_headroom"
+        self._attr_native_unit_of_measurement = UnitOfPower.WATT
+        self._attr_device_class = SensorDeviceClass.POWER
+        self._attr_state_class = SensorStateClass.MEASUREMENT
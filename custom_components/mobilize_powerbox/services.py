@@ -0,0 +1,252 @@
+"""Services pour Mobilize PowerBox."""
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+from datetime import datetime
+
+import voluptuous as vol
+
+from homeassistant.components import persistent_notification
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+
+from .const import (
+    DOMAIN,
+    SERVICE_BURST_SAMPLE,
+    SERVICE_PROFILE,
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_DURATION,
+    ATTR_INTERVAL,
+    ATTR_FORMAT,
+    ATTR_CYCLES,
+    ATTR_COORDINATOR,
+    ATTR_TIMEOUT,
+    ATTR_TOP,
+    BURST_DEFAULT_DURATION,
+    BURST_MAX_DURATION,
+    BURST_DEFAULT_INTERVAL,
+    BURST_MIN_INTERVAL,
+    BURST_MAX_INTERVAL,
+    BURST_EXPORT_DIR,
+    EXPORT_MAX_KEPT,
+    FORMAT_CSV,
+    FORMAT_JSON,
+    DATA_PROFILER,
+    PROFILE_DEFAULT_CYCLES,
+    PROFILE_MAX_CYCLES,
+    PROFILE_DEFAULT_TIMEOUT,
+    PROFILE_MAX_TIMEOUT,
+    PROFILE_DEFAULT_TOP,
+    PROFILE_COORDINATOR_REALTIME,
+    PROFILE_COORDINATOR_CONFIG,
+    PROFILE_COORDINATOR_ALL,
+    PROFILE_COORDINATORS,
+    PROFILE_NOTIFICATION_ID,
+)
+from .profiling import RefreshProfiler, format_summary
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICES = [SERVICE_BURST_SAMPLE, SERVICE_PROFILE]
+
+BURST_SAMPLE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    vol.Optional(ATTR_DURATION, default=BURST_DEFAULT_DURATION): vol.All(
+        vol.Coerce(float), vol.Range(min=1, max=BURST_MAX_DURATION)
+    ),
+    vol.Optional(ATTR_INTERVAL, default=BURST_DEFAULT_INTERVAL): vol.All(
+        vol.Coerce(float), vol.Range(min=BURST_MIN_INTERVAL, max=BURST_MAX_INTERVAL)
+    ),
+    vol.Optional(ATTR_FORMAT, default=FORMAT_CSV): vol.In([FORMAT_CSV, FORMAT_JSON]),
+})
+
+PROFILE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    vol.Optional(ATTR_CYCLES, default=PROFILE_DEFAULT_CYCLES): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=PROFILE_MAX_CYCLES)
+    ),
+    vol.Optional(ATTR_COORDINATOR, default=PROFILE_COORDINATOR_REALTIME): vol.In(PROFILE_COORDINATORS),
+    vol.Optional(ATTR_TIMEOUT, default=PROFILE_DEFAULT_TIMEOUT): vol.All(
+        vol.Coerce(float), vol.Range(min=1, max=PROFILE_MAX_TIMEOUT)
+    ),
+    vol.Optional(ATTR_TOP, default=PROFILE_DEFAULT_TOP): vol.All(vol.Coerce(int), vol.Range(min=1, max=50)),
+})
+
+
+def get_entry_data(hass: HomeAssistant, call: ServiceCall) -> dict:
+    """Retourne les données de l'entrée ciblée par un appel de service."""
+    entries = hass.data.get(DOMAIN, {})
+    entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+
+    if entry_id:
+        if entry_id not in entries:
+            raise HomeAssistantError(f"PowerBox inconnue ou non chargée: {entry_id}")
+        return entries[entry_id]
+
+    if len(entries) != 1:
+        raise HomeAssistantError(
+            "Plusieurs PowerBox sont configurées, précisez config_entry_id"
+        )
+    return next(iter(entries.values()))
+
+
+def _export_samples(path: str, samples: list[dict], export_format: str) -> None:
+    """Écrit les échantillons compressés (exécuté dans un executor)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if export_format == FORMAT_JSON:
+        payload = json.dumps(samples, separators=(",", ":"))
+    else:
+        # Union des colonnes : un compteur peut apparaître en cours de route
+        columns = ["time"]
+        for sample in samples:
+            columns.extend(key for key in sample if key not in columns)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(samples)
+        payload = buffer.getvalue()
+
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        file.write(payload)
+
+
+def _prune_exports(directory: str, prefix: str) -> None:
+    """Ne garde que les EXPORT_MAX_KEPT derniers exports d'un service (exécuté dans un executor).
+
+    Les fichiers d'un même export (``profile_<date>.prof`` et ``.txt``) partagent
+    leur nom avant le premier point ; la date dans le nom donne l'ordre.
+    """
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith(prefix)]
+    except FileNotFoundError:
+        return
+    exports = sorted({name.split(".", 1)[0] for name in names}, reverse=True)
+    expired = set(exports[EXPORT_MAX_KEPT:])
+    for name in names:
+        if name.split(".", 1)[0] in expired:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError as err:
+                _LOGGER.debug("Suppression de l'ancien export %s impossible: %s", name, err)
+
+
+async def _async_burst_sample(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Gère le service burst_sample."""
+    entry_data = get_entry_data(hass, call)
+    coordinator = entry_data["coordinator_realtime"]
+    export_format = call.data[ATTR_FORMAT]
+
+    samples = await coordinator.async_burst_sample(
+        call.data[ATTR_DURATION], call.data[ATTR_INTERVAL]
+    )
+    if not samples:
+        raise HomeAssistantError("Aucun échantillon n'a pu être collecté")
+
+    filename = f"burst_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}.gz"
+    path = hass.config.path(BURST_EXPORT_DIR, filename)
+    await hass.async_add_executor_job(_export_samples, path, samples, export_format)
+    await hass.async_add_executor_job(_prune_exports, os.path.dirname(path), "burst_")
+    _LOGGER.info("Échantillonnage rapide exporté dans %s", path)
+
+    if not call.return_response:
+        return None
+
+    response = {"file": path, "count": len(samples)}
+    if export_format == FORMAT_JSON:
+        response["samples"] = samples
+    return response
+
+
+async def _async_profile(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Gère le service profile."""
+    entry_data = get_entry_data(hass, call)
+    # cProfile et tracemalloc sont globaux au processus : un seul profilage à la fois
+    if any(data.get(DATA_PROFILER) for data in hass.data.get(DOMAIN, {}).values()):
+        raise HomeAssistantError("Un profilage est déjà en cours")
+
+    target = call.data[ATTR_COORDINATOR]
+    coordinators = []
+    if target in (PROFILE_COORDINATOR_REALTIME, PROFILE_COORDINATOR_ALL):
+        coordinators.append(entry_data["coordinator_realtime"])
+    if target in (PROFILE_COORDINATOR_CONFIG, PROFILE_COORDINATOR_ALL):
+        coordinators.append(entry_data["coordinator_config"])
+
+    profiler = RefreshProfiler(call.data[ATTR_CYCLES])
+    entry_data[DATA_PROFILER] = profiler
+    try:
+        await hass.async_add_executor_job(profiler.start_tracing)
+        profiler.attach(coordinators, entry_data["api_client"])
+        try:
+            await asyncio.wait_for(profiler.done.wait(), call.data[ATTR_TIMEOUT])
+        except asyncio.TimeoutError:
+            _LOGGER.warning(
+                "Profilage interrompu après %ss: %d/%d cycles",
+                call.data[ATTR_TIMEOUT], profiler.completed, profiler.cycles
+            )
+        finally:
+            profiler.detach()
+            await hass.async_add_executor_job(profiler.stop_tracing)
+    finally:
+        entry_data.pop(DATA_PROFILER, None)
+
+    if not profiler.completed:
+        raise HomeAssistantError("Aucun cycle de rafraîchissement n'a eu lieu pendant le profilage")
+
+    filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof"
+    path = hass.config.path(BURST_EXPORT_DIR, filename)
+    summary = await hass.async_add_executor_job(profiler.write_report, path, call.data[ATTR_TOP])
+    await hass.async_add_executor_job(_prune_exports, os.path.dirname(path), "profile_")
+    _LOGGER.info("Profil des rafraîchissements exporté dans %s", path)
+
+    persistent_notification.async_create(
+        hass,
+        format_summary(summary),
+        title="Profilage Mobilize PowerBox",
+        notification_id=PROFILE_NOTIFICATION_ID,
+    )
+    return summary if call.return_response else None
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Enregistre les services de l'intégration."""
+    if hass.services.has_service(DOMAIN, SERVICE_BURST_SAMPLE):
+        return
+
+    async def burst_sample(call: ServiceCall) -> ServiceResponse:
+        return await _async_burst_sample(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BURST_SAMPLE,
+        burst_sample,
+        schema=BURST_SAMPLE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def profile(call: ServiceCall) -> ServiceResponse:
+        return await _async_profile(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Supprime les services quand plus aucune PowerBox n'est chargée."""
+    if hass.data.get(DOMAIN):
+        return
+
+    for service in SERVICES:
+        hass.services.async_remove(DOMAIN, service)
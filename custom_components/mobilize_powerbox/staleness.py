@@ -0,0 +1,77 @@
+"""Politique « stale-while-revalidate » des coordinateurs.
+
+Après un échec de rafraîchissement, le dernier instantané réussi reste servi
+tant que son âge ne dépasse pas une limite : les entités restent disponibles
+pendant une coupure brève, le rafraîchissement continue d'être retenté (avec
+le ralentissement des coordinateurs) et, au-delà de la limite, le
+coordinateur échoue pour que les entités deviennent indisponibles. Une
+valeur servie depuis le cache est marquée (``served_from_cache``) avec son
+âge (``data_age``) : une automatisation sait si elle peut s'y fier sans
+interroger la borne.
+
+Les instantanés sont des dataclasses portant les champs ``fetched_at``,
+``data_age`` et ``served_from_cache``.
+"""
+from __future__ import annotations
+
+from dataclasses import replace
+from typing import Generic, TypeVar
+
+from .clock import Clock
+
+T = TypeVar("T")
+
+
+class StaleWhileRevalidate(Generic[T]):
+    """Dernier instantané réussi, servi tant qu'il n'est pas trop ancien."""
+
+    def __init__(self, max_age: float, clock: Clock) -> None:
+        """Initialisation."""
+        self.max_age = max_age
+        self.clock = clock
+        self._data: T | None = None
+        self.served = 0  # cycles servis depuis le cache
+        self.expired = 0  # échecs au-delà de l'âge maximal
+
+    @property
+    def has_data(self) -> bool:
+        """Un instantané réussi a déjà été obtenu."""
+        return self._data is not None
+
+    @property
+    def age(self) -> float | None:
+        """Âge (s) du dernier instantané réussi."""
+        if self._data is None:
+            return None
+        return max(0.0, self.clock.time() - self._data.fetched_at)
+
+    def store(self, data: T) -> T:
+        """Mémorise un instantané frais et le retourne, horodaté."""
+        self._data = replace(data, fetched_at=self.clock.time(), data_age=0.0, served_from_cache=False)
+        return self._data
+
+    def serve(self, **changes) -> T | None:
+        """Copie du dernier instantané marquée comme servie depuis le cache.
+
+        Retourne None s'il n'y en a pas ou s'il est trop ancien. ``changes``
+        remplace des champs de la copie (ex. vider ce qui ne doit être traité
+        qu'une fois).
+        """
+        age = self.age
+        if age is None:
+            return None
+        if age > self.max_age:
+            self.expired += 1
+            return None
+        self.served += 1
+        return replace(self._data, data_age=round(age, 1), served_from_cache=True, **changes)
+
+    def get_stats(self) -> dict:
+        """Statistiques pour les diagnostics."""
+        age = self.age
+        return {
+            "max_age": self.max_age,
+            "data_age": round(age, 1) if age is not None else None,
+            "served": self.served,
+            "expired": self.expired,
+        }
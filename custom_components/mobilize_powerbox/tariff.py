@@ -0,0 +1,100 @@
+"""Cumul incrémental de l'énergie et du coût par période tarifaire."""
+from __future__ import annotations
+
+from .const import (
+    METER_MODEL_POWER_BOARD,
+    METER_MODEL_TIC,
+    TARIFF_PERIOD_HC,
+    TARIFF_PERIOD_HP,
+    TARIFF_MAX_GAP,
+    TARIFF_PERIODS,
+    TARIFF_UNATTRIBUTED,
+    TIC_TARIFF_VALUE_NAMES,
+)
+from .derived import meter_sample
+from .sampling import CounterTracker
+
+
+def tariff_period(meters_parsed: dict) -> str | None:
+    """Détermine la période tarifaire en cours depuis la TiC (None si inconnue)."""
+    for name in TIC_TARIFF_VALUE_NAMES:
+        sample = meter_sample(meters_parsed, METER_MODEL_TIC, name)
+        if sample is None:
+            continue
+        label = str(sample[0]).upper()
+        # "HC..", "HEURE CREUSE", "HEURES CREUSES" selon le mode du Linky
+        if label.startswith("HC") or "CREUSE" in label:
+            return TARIFF_PERIOD_HC
+        return TARIFF_PERIOD_HP
+    return None
+
+
+class TariffAccumulator:
+    """Répartit chaque delta du compteur d'énergie sur la période en cours.
+
+    Seul le dernier index du compteur est conservé : les cumuls survivent aux
+    redémarrages sans relire l'historique. Après une interruption (Home
+    Assistant arrêté, borne injoignable), la période en cours à la reprise
+    n'est pas forcément celle de l'énergie consommée entre-temps : le delta
+    est cumulé à part, comme énergie non attribuée et sans coût.
+    """
+
+    def __init__(self, prices: dict[str, float], stored: dict | None = None) -> None:
+        """Initialisation, éventuellement depuis un état sauvegardé."""
+        self.prices = prices
+        stored = stored or {}
+        self.energy_wh = {period: 0.0 for period in [*TARIFF_PERIODS, TARIFF_UNATTRIBUTED]}
+        self.cost = {period: 0.0 for period in TARIFF_PERIODS}
+        self.energy_wh.update(stored.get("energy_wh", {}))
+        self.cost.update(stored.get("cost", {}))
+        self._counter = CounterTracker(stored.get("last_counter_ws"))
+        # Horodatage (borne) de la dernière mesure, pour détecter les interruptions
+        self.last_ts: float | None = stored.get("last_ts")
+        self.period: str | None = None
+
+    def update(self, meters_parsed: dict) -> bool:
+        """Ajoute le delta d'énergie depuis le dernier cycle. Retourne True si modifié."""
+        sample = meter_sample(meters_parsed, METER_MODEL_POWER_BOARD, "ActiveEnergy_Ws")
+        if sample is None:
+            return False
+
+        # Sans information TiC, tout est compté en heures pleines
+        self.period = tariff_period(meters_parsed) or TARIFF_PERIOD_HP
+        previous = self.last_counter_ws
+        # Après une remise à zéro, l'énergie comptée depuis zéro n'est pas perdue
+        delta_wh = self._counter.update(float(sample[0])) / 3600
+        gap = bool(sample[1] and self.last_ts and sample[1] - self.last_ts > TARIFF_MAX_GAP)
+        if sample[1]:
+            self.last_ts = sample[1]
+        if delta_wh == 0:
+            return previous != self.last_counter_ws
+
+        if gap:
+            self.energy_wh[TARIFF_UNATTRIBUTED] += delta_wh
+            return True
+
+        self.energy_wh[self.period] += delta_wh
+        self.cost[self.period] += delta_wh / 1000 * self.prices.get(self.period, 0.0)
+        return True
+
+    @property
+    def last_counter_ws(self) -> float | None:
+        """Dernier index retenu du compteur d'énergie."""
+        return self._counter.last
+
+    def as_dict(self) -> dict:
+        """État sérialisable pour le stockage persistant."""
+        return {
+            "energy_wh": dict(self.energy_wh),
+            "cost": dict(self.cost),
+            "last_counter_ws": self.last_counter_ws,
+            "last_ts": self.last_ts,
+        }
+
+    def snapshot(self) -> dict:
+        """Cumuls publiés dans l'instantané du coordinateur."""
+        return {
+            "period": self.period,
+            "energy_kwh": {period: wh / 1000 for period, wh in self.energy_wh.items()},
+            "cost": dict(self.cost),
+        }
@@ -0,0 +1,168 @@
+"""Inventaire des badges (RFID) et attribution des sessions de charge.
+
+La liste des badges (``/tokens``) change rarement : elle est synchronisée
+peu souvent, et seules les différences avec l'inventaire en cache (ajouts,
+suppressions, modifications) sont appliquées. Chaque session de charge est
+attribuée au badge présenté juste avant ou pendant son début, d'après la
+date de dernière utilisation annoncée par la borne. L'énergie de la session
+est ajoutée au cumul du badge au fil des mesures : la facturation par
+conducteur ne relit jamais l'historique.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from .derived import timestamp_seconds
+from .sampling import CounterTracker
+
+# Cumul des sessions qu'aucun badge n'a pu revendiquer
+UNKNOWN_TOKEN = "unknown"
+
+
+def _first(item: dict, *names: str, default=None):
+    """Première clé présente parmi ``names``."""
+    for name in names:
+        if name in item and item[name] is not None:
+            return item[name]
+    return default
+
+
+def _timestamp(value) -> float | None:
+    """Horodatage de la borne (secondes, millisecondes ou ISO 8601) en secondes."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return timestamp_seconds(value) or None
+
+
+def parse_tokens(response) -> dict[str, dict]:
+    """Transforme la réponse de /tokens en {identifiant: badge}.
+
+    Accepte une liste de badges ou un objet qui la contient, avec les noms de
+    champs rencontrés selon les firmwares.
+    """
+    if isinstance(response, dict):
+        response = _first(response, "tokens", "Tokens", "items", default=[])
+
+    tokens = {}
+    for item in response or []:
+        if not isinstance(item, dict):
+            continue
+        token_id = _first(item, "token_id", "uid", "id", "token", "TokenId")
+        if token_id is None:
+            continue
+        enabled = _first(item, "enabled", "active", "Enabled", default=True)
+        if isinstance(enabled, str):
+            enabled = enabled.lower() not in ("false", "0", "disabled", "inactive")
+        tokens[str(token_id)] = {
+            "name": str(_first(item, "name", "label", "owner", "description", "Name", default=token_id)),
+            "enabled": bool(enabled),
+            "last_used": _timestamp(_first(item, "last_used", "lastUsed", "last_seen", "LastUsed")),
+        }
+    return tokens
+
+
+class TokenInventory:
+    """Badges connus, session en cours et cumuls d'énergie par badge."""
+
+    def __init__(self, stored: dict | None = None) -> None:
+        """Initialisation, éventuellement depuis un état sauvegardé."""
+        stored = stored or {}
+        self.tokens: dict[str, dict] = dict(stored.get("tokens", {}))
+        # Les cumuls survivent à la suppression d'un badge (facturation)
+        self.totals: dict[str, dict] = {
+            token_id: dict(total) for token_id, total in stored.get("totals", {}).items()
+        }
+        self.session: dict | None = stored.get("session")
+        self._session_counter = CounterTracker(self.session["energy_ws"] if self.session else None)
+
+    def apply(self, tokens: dict[str, dict]) -> dict[str, list[str]]:
+        """Applique uniquement les différences avec l'inventaire en cache."""
+        changes = {
+            "added": [token_id for token_id in tokens if token_id not in self.tokens],
+            "removed": [token_id for token_id in self.tokens if token_id not in tokens],
+            "changed": [
+                token_id for token_id, token in tokens.items()
+                if token_id in self.tokens and self.tokens[token_id] != token
+            ],
+        }
+        for token_id in changes["removed"]:
+            del self.tokens[token_id]
+        for token_id in changes["added"] + changes["changed"]:
+            self.tokens[token_id] = tokens[token_id]
+        return changes
+
+    def start_session(self, started: float) -> None:
+        """Ouvre une session (véhicule branché), encore sans badge."""
+        self.session = {"token": None, "started": started, "energy_ws": None, "pending_wh": 0.0}
+        self._session_counter = CounterTracker()
+
+    def attribute(self, window: float) -> str | None:
+        """Attribue la session au badge utilisé le plus récemment autour de son début.
+
+        Retourne le badge nouvellement attribué, ou None.
+        """
+        if self.session is None or self.session["token"] is not None:
+            return None
+        candidates = [
+            (token["last_used"], token_id)
+            for token_id, token in self.tokens.items()
+            if token["last_used"] is not None and token["last_used"] >= self.session["started"] - window
+        ]
+        if not candidates:
+            return None
+
+        token_id = max(candidates)[1]
+        self.session["token"] = token_id
+        total = self._total(token_id)
+        total["sessions"] += 1
+        # Énergie comptée avant que le badge soit connu
+        total["energy_wh"] += self.session["pending_wh"]
+        self.session["pending_wh"] = 0.0
+        return token_id
+
+    def add_session_energy(self, session_energy_ws: float) -> bool:
+        """Ajoute au badge de la session l'énergie produite depuis la dernière mesure."""
+        if self.session is None:
+            return False
+        delta_wh = self._session_counter.update(session_energy_ws) / 3600
+        self.session["energy_ws"] = self._session_counter.last
+        if delta_wh == 0:
+            return False
+        if self.session["token"] is None:
+            self.session["pending_wh"] += delta_wh
+        else:
+            self._total(self.session["token"])["energy_wh"] += delta_wh
+        return True
+
+    def end_session(self) -> None:
+        """Ferme la session (véhicule débranché)."""
+        if self.session is None:
+            return
+        if self.session["token"] is None and self.session["pending_wh"]:
+            total = self._total(UNKNOWN_TOKEN)
+            total["sessions"] += 1
+            total["energy_wh"] += self.session["pending_wh"]
+        self.session = None
+
+    def _total(self, token_id: str) -> dict:
+        """Cumul d'un badge (créé au besoin)."""
+        return self.totals.setdefault(token_id, {"energy_wh": 0.0, "sessions": 0})
+
+    def token_name(self, token_id: str | None) -> str | None:
+        """Nom d'un badge (son identifiant s'il n'est plus dans l'inventaire)."""
+        if token_id is None:
+            return None
+        return self.tokens.get(token_id, {}).get("name", token_id)
+
+    def as_dict(self) -> dict:
+        """État sérialisable pour le stockage persistant."""
+        return {
+            "tokens": dict(self.tokens),
+            "totals": {token_id: dict(total) for token_id, total in self.totals.items()},
+            "session": dict(self.session) if self.session else None,
+        }
@@ -0,0 +1,71 @@
+"""API websocket des courbes récentes pour les cartes du tableau de bord.
+
+``mobilize_powerbox/recent_series`` renvoie les derniers points de grille
+gardés en mémoire par le coordinateur temps réel, en colonnes compactes
+(horodatages et valeurs), éventuellement réduits côté serveur à un nombre
+de points. Ni le recorder ni la borne ne sont sollicités.
+
+    {"type": "mobilize_powerbox/recent_series", "values": ["ActivePower_W"], "points": 200}
+"""
+from __future__ import annotations
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    DATA_WEBSOCKET,
+    DOMAIN,
+    RESAMPLED_VALUES,
+    SERIES_MAX_POINTS,
+    WS_TYPE_RECENT_SERIES,
+)
+
+
+@callback
+def async_register_websocket_api(hass: HomeAssistant) -> None:
+    """Enregistre les commandes websocket une seule fois."""
+    if hass.data.get(DATA_WEBSOCKET):
+        return
+    hass.data[DATA_WEBSOCKET] = True
+    websocket_api.async_register_command(hass, ws_recent_series)
+
+
+@websocket_api.websocket_command({
+    vol.Required("type"): WS_TYPE_RECENT_SERIES,
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): str,
+    vol.Optional("values", default=list(RESAMPLED_VALUES)): [vol.In(RESAMPLED_VALUES)],
+    vol.Optional("since"): vol.Coerce(float),
+    vol.Optional("points"): vol.All(vol.Coerce(int), vol.Range(min=2, max=SERIES_MAX_POINTS)),
+})
+@callback
+def ws_recent_series(hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict) -> None:
+    """Courbes récentes d'une PowerBox, en colonnes."""
+    entries = hass.data.get(DOMAIN, {})
+    entry_id = msg.get(ATTR_CONFIG_ENTRY_ID)
+
+    if entry_id:
+        if entry_id not in entries:
+            connection.send_error(
+                msg["id"], websocket_api.ERR_NOT_FOUND, f"PowerBox inconnue ou non chargée: {entry_id}"
+            )
+            return
+        entry_data = entries[entry_id]
+    elif len(entries) == 1:
+        entry_data = next(iter(entries.values()))
+    else:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_INVALID_FORMAT, "Plusieurs PowerBox sont configurées, précisez config_entry_id"
+        )
+        return
+
+    coordinator = entry_data["coordinator_realtime"]
+    connection.send_result(msg["id"], {
+        "step": coordinator.scan_interval.total_seconds(),
+        "series": {
+            name: coordinator.series.columns(name, msg.get("since"), msg.get("points"))
+            for name in msg["values"]
+        },
+    })
@@ -0,0 +1,24 @@
+"""Import des modules du composant sans Home Assistant.
+
+Le ``__init__`` du composant requiert Home Assistant ; les modules sans
+dépendance HA (client HTTP, parsing, limiteur, ...) sont importés via un
+paquet vide pointant sur le répertoire du composant.
+"""
+from __future__ import annotations
+
+import importlib
+from pathlib import Path
+import sys
+import types
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "mobilize_powerbox"
+PACKAGE = "mobilize_powerbox"
+
+
+def load_component(*modules: str) -> list[types.ModuleType]:
+    """Importe des modules du composant sans exécuter son ``__init__``."""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(COMPONENT_DIR)]
+        sys.modules[PACKAGE] = package
+    return [importlib.import_module(f"{PACKAGE}.{module}") for module in modules]
@@ -0,0 +1,177 @@
+"""Collecteur autonome (sans Home Assistant) des mesures de PowerBox.
+
+Interroge ``/meters`` d'une ou plusieurs bornes à haute fréquence et écrit
+chaque valeur numérique dans une base SQLite à rétention par paliers (brut
+1 jour, agrégats minute 90 jours, agrégats heure indéfiniment), sans passer
+par le recorder de Home Assistant. Réutilise le client HTTP et le parsing
+du composant (même retries, même limiteur par borne).
+
+Usage :
+    python tools/collector.py run --config collector.json --db powerbox.db
+    python tools/collector.py query --db powerbox.db --host 192.168.1.50 \\
+        --name EVPLCCom-Virtual-Meter.ActivePower_W --since 3600
+
+``collector.json`` :
+    {"interval": 1, "boxes": [{"host": "192.168.1.50", "username": "...",
+                               "password": "...", "verify_ssl": false}]}
+
+Seul ``requests`` est nécessaire.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import queue
+import signal
+import threading
+import time
+
+import requests
+
+from _component import load_component
+from timeseries import TIERS, TimeSeriesStore
+
+api, const, derived, limiter = load_component("api", "const", "derived", "limiter")
+
+_LOGGER = logging.getLogger("powerbox.collector")
+
+DEFAULT_INTERVAL = 1.0  # secondes (le limiteur de la borne plafonne à 1 req/s en continu)
+PRUNE_INTERVAL = 600  # secondes entre deux purges des paliers expirés
+QUEUE_SIZE = 1000  # lots en attente d'écriture
+
+
+def meter_samples(meters_parsed: dict, polled_at: float) -> list[tuple[str, float, float]]:
+    """Valeurs numériques des compteurs connectés, horodatées par la borne."""
+    samples = []
+    for model, meter in meters_parsed.items():
+        if not meter["connected"]:
+            continue
+        for name, value_data in meter["values"].items():
+            try:
+                value = float(value_data["value"])
+            except (TypeError, ValueError):
+                continue
+            ts = derived.timestamp_seconds(value_data.get("timestamp")) or polled_at
+            samples.append((f"{model}.{name}", ts, value))
+    return samples
+
+
+def poll_box(client, interval: float, samples: queue.Queue, stop: threading.Event) -> None:
+    """Boucle d'interrogation d'une borne (un thread par borne)."""
+    _LOGGER.info("Collecte de %s toutes les %ss", client.host, interval)
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            meters = client.fetch_data(const.ENDPOINT_METERS, limiter.PRIORITY_REALTIME)
+            samples.put((client.host, meter_samples(api.parse_meters(meters), time.time())))
+        except api.PowerBoxApiError as err:
+            if not stop.is_set():
+                _LOGGER.warning("%s: %s", client.host, err)
+        stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+
+def run(args: argparse.Namespace) -> None:
+    """Lance la collecte jusqu'à SIGINT/SIGTERM."""
+    with open(args.config, encoding="utf-8") as config_file:
+        config = json.load(config_file)
+    interval = float(args.interval or config.get("interval", DEFAULT_INTERVAL))
+
+    store = TimeSeriesStore(args.db)
+    samples: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    requests.packages.urllib3.disable_warnings(
+        requests.packages.urllib3.exceptions.InsecureRequestWarning
+    )
+    clients = [
+        api.PowerBoxAPIClient(
+            f"https://{box['host']}/v1.0", box["username"], box["password"], box.get("verify_ssl", False)
+        )
+        for box in config["boxes"]
+    ]
+    threads = [
+        threading.Thread(target=poll_box, args=(client, interval, samples, stop), daemon=True)
+        for client in clients
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Seul ce thread écrit dans SQLite
+    inserted = 0
+    last_prune = last_report = time.monotonic()
+    try:
+        while not stop.is_set():
+            try:
+                host, batch = samples.get(timeout=1)
+            except queue.Empty:
+                continue
+            inserted += store.add_samples(host, batch)
+
+            now = time.monotonic()
+            if now - last_prune >= PRUNE_INTERVAL:
+                pruned = store.prune()
+                _LOGGER.debug("Purge des paliers expirés: %s", pruned)
+                last_prune = now
+            if now - last_report >= 60:
+                _LOGGER.info("%d échantillons écrits", inserted)
+                last_report = now
+    finally:
+        # Interrompt les retries et attentes en cours
+        stop.set()
+        for client in clients:
+            client.shutdown()
+        for thread in threads:
+            thread.join(timeout=5)
+        while not samples.empty():
+            host, batch = samples.get_nowait()
+            store.add_samples(host, batch)
+        store.close()
+
+
+def query(args: argparse.Namespace) -> None:
+    """Affiche les points d'une série (palier choisi automatiquement par défaut)."""
+    store = TimeSeriesStore(args.db)
+    try:
+        if not args.name:
+            for host, name in store.series():
+                print(f"{host}\t{name}")
+            return
+        end = time.time()
+        for row in store.query(args.host, args.name, end - args.since, end, args.tier):
+            print("\t".join(str(round(item, 3)) for item in row))
+    finally:
+        store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Collecte en continu")
+    run_parser.add_argument("--config", required=True, help="Fichier JSON des bornes")
+    run_parser.add_argument("--db", default="powerbox.db")
+    run_parser.add_argument("--interval", type=float, help="Période d'interrogation (s)")
+    run_parser.set_defaults(func=run)
+
+    query_parser = commands.add_parser("query", help="Lecture d'une série (liste des séries sans --name)")
+    query_parser.add_argument("--db", default="powerbox.db")
+    query_parser.add_argument("--host")
+    query_parser.add_argument("--name")
+    query_parser.add_argument("--since", type=float, default=3600, help="Profondeur (s)")
+    query_parser.add_argument("--tier", choices=["raw", *TIERS])
+    query_parser.set_defaults(func=query)
+
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
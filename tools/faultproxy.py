@@ -0,0 +1,386 @@
+"""Proxy TCP/TLS d'injection de pannes devant une PowerBox (réelle ou factice).
+
+Le proxy termine le TLS côté client (certificat auto-signé généré avec
+``openssl``), relaie la requête HTTP vers la borne puis altère la réponse.
+Le client de l'intégration envoie ``Connection: close`` : une requête = une
+connexion, chaque requête reçoit donc sa propre panne tirée au sort.
+
+Pannes réseau :
+    refuse      RST dès l'acceptation de la connexion
+    stall       connexion acceptée, poignée de main TLS jamais terminée
+    slowloris   quelques octets de réponse goutte à goutte, puis plus rien
+    truncate    fermeture propre au milieu du corps (Content-Length non atteint)
+    reset       RST au milieu du corps
+Pannes HTTP :
+    http_401    token refusé
+    http_503    borne indisponible
+    bad_json    JSON tronqué avec un Content-Length cohérent
+
+Usage :
+    python tools/faultproxy.py                                # borne factice, proxy sur 127.0.0.1:8443
+    python tools/faultproxy.py --upstream 192.168.1.50:443 --rate 0.3 --faults reset,stall
+
+Seule la bibliothèque standard est nécessaire (``openssl`` pour le TLS ;
+sans lui, le proxy sert en HTTP simple).
+"""
+from __future__ import annotations
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import multiprocessing
+import random
+import shutil
+import socket
+import socketserver
+import ssl
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from _component import load_component
+
+(const,) = load_component("const")
+
+NETWORK_FAULTS = ("refuse", "stall", "slowloris", "truncate", "reset")
+HTTP_FAULTS = ("http_401", "http_503", "bad_json")
+FAULTS = NETWORK_FAULTS + HTTP_FAULTS
+
+# Modes du proxy, modifiables à chaud par un autre processus
+MODE_HEALTHY = 0  # aucune panne
+MODE_CHAOS = 1  # une panne tirée au sort avec la probabilité configurée
+MODE_OUTAGE_RESET = 2  # coupure : toute connexion est refusée
+MODE_OUTAGE_STALL = 3  # coupure : toute connexion reste sans réponse
+
+STALL_MAX = 30.0  # durée maximale de maintien d'une connexion bloquée
+SLOWLORIS_BYTES = 8
+SLOWLORIS_INTERVAL = 0.1
+IO_TIMEOUT = 10.0
+API_PREFIX = "/v1.0"
+
+
+def generate_certificate(directory: Path) -> tuple[Path, Path] | None:
+    """Certificat auto-signé pour ``localhost``, ou None sans ``openssl``."""
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        return None
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    result = subprocess.run(
+        [openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", str(key), "-out", str(cert)],
+        capture_output=True,
+        check=False,
+    )
+    return (cert, key) if result.returncode == 0 else None
+
+
+class FakePowerBox(ThreadingHTTPServer):
+    """Borne factice saine : tokens, compteurs et configuration."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int]) -> None:
+        super().__init__(address, _FakePowerBoxHandler)
+        self.tokens: set[str] = set()
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def issue_token(self) -> str:
+        with self._lock:
+            self._sequence += 1
+            token = f"token-{self._sequence}"
+            self.tokens.add(token)
+            return token
+
+    def meters(self) -> list:
+        timestamp = int(time.time() * 1000)
+        values = {
+            "ActivePower_W": 7200, "Current_mA": 31300, "Voltage_mV": 230000,
+            "SessionTotalEnergy_Ws": 36_000_000, "TotalEnergy_Ws": 3_600_000_000,
+        }
+        return [{
+            "Model": const.METER_MODEL_VIRTUAL,
+            "Connected": "true",
+            "Values": [{"Name": name, "Value": value, "Timestamp": timestamp} for name, value in values.items()],
+        }]
+
+
+class _FakePowerBoxHandler(BaseHTTPRequestHandler):
+    server: FakePowerBox
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(self, status: int, payload=None) -> None:
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == f"{API_PREFIX}/{const.ENDPOINT_AUTH}":
+            self._send(200, {"id_token": self.server.issue_token()})
+        else:
+            self._send(404)
+
+    def do_GET(self) -> None:
+        token = self.headers.get("authorization", "").removeprefix("Bearer ")
+        if token not in self.server.tokens:
+            self._send(401)
+        elif self.path == f"{API_PREFIX}/{const.ENDPOINT_METERS}":
+            self._send(200, self.server.meters())
+        elif self.path == f"{API_PREFIX}/{const.ENDPOINT_CONFIGS}":
+            self._send(200, [{"module_name": "EVSE", "config_name": "MaxCurrent", "config_value": "32000"}])
+        else:
+            self._send(404)
+
+
+class FaultPlan:
+    """Tirage de la panne de chaque connexion selon le mode courant.
+
+    ``mode`` et ``counters`` peuvent être partagés entre processus
+    (``multiprocessing.Value`` et ``Array``) pour piloter le proxy depuis un test.
+    """
+
+    def __init__(self, rate: float, faults: tuple[str, ...], seed: int | None, mode=None, counters=None) -> None:
+        self.rate = rate
+        self.faults = faults
+        self.mode = mode if mode is not None else multiprocessing.Value("i", MODE_CHAOS, lock=False)
+        self.counters = counters if counters is not None else multiprocessing.Array("i", len(FAULTS) + 1, lock=False)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self) -> str | None:
+        """Panne de la prochaine connexion, ou None."""
+        mode = self.mode.value
+        with self._lock:
+            if mode == MODE_OUTAGE_RESET:
+                fault = "refuse"
+            elif mode == MODE_OUTAGE_STALL:
+                fault = "stall"
+            elif mode == MODE_CHAOS and self.faults and self._rng.random() < self.rate:
+                fault = self._rng.choice(self.faults)
+            else:
+                fault = None
+            self.counters[FAULTS.index(fault) if fault else len(FAULTS)] += 1
+        return fault
+
+
+def fault_counts(counters) -> dict[str, int]:
+    """Connexions servies par panne (``none`` : sans panne)."""
+    return {name: counters[index] for index, name in enumerate(FAULTS + ("none",))}
+
+
+class FaultProxy(socketserver.ThreadingTCPServer):
+    """Proxy qui applique une panne par connexion entre le client et la borne."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        upstream: tuple[str, int],
+        plan: FaultPlan,
+        tls: ssl.SSLContext | None = None,
+        upstream_tls: bool = False,
+    ) -> None:
+        super().__init__(address, _FaultProxyHandler)
+        self.upstream = upstream
+        self.plan = plan
+        self.tls = tls
+        self.upstream_tls = upstream_tls
+
+    def forward(self, request: bytes) -> bytes:
+        """Relaie une requête vers la borne et renvoie sa réponse brute complète."""
+        sock = socket.create_connection(self.upstream, timeout=IO_TIMEOUT)
+        if self.upstream_tls:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(sock, server_hostname=self.upstream[0])
+        with sock:
+            sock.sendall(request)
+            chunks = []
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+
+def _http_response(status: int, reason: str, body: bytes) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+def _reset(sock: socket.socket) -> None:
+    """Ferme la connexion par un RST (SO_LINGER à 0)."""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+    except OSError:
+        pass
+    sock.close()
+
+
+def _hold(sock: socket.socket) -> None:
+    """Garde la connexion ouverte sans répondre jusqu'à ce que le client abandonne."""
+    deadline = time.monotonic() + STALL_MAX
+    try:
+        while (remaining := deadline - time.monotonic()) > 0:
+            sock.settimeout(remaining)
+            if not sock.recv(4096):
+                break
+    except OSError:
+        pass
+
+
+def _read_request(sock: socket.socket) -> bytes:
+    """Lit une requête HTTP complète (en-têtes et corps selon Content-Length)."""
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return b""
+        data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value.strip())
+    while len(body) < length:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        body += chunk
+    return head + b"\r\n\r\n" + body
+
+
+class _FaultProxyHandler(socketserver.BaseRequestHandler):
+    server: FaultProxy
+
+    def handle(self) -> None:
+        sock: socket.socket = self.request
+        fault = self.server.plan.pick()
+        if fault == "refuse":
+            _reset(sock)
+            return
+        if fault == "stall":
+            _hold(sock)
+            return
+        sock.settimeout(IO_TIMEOUT)
+        try:
+            if self.server.tls is not None:
+                sock = self.server.tls.wrap_socket(sock, server_side=True)
+            request = _read_request(sock)
+            if request:
+                self._respond(sock, fault, request)
+        except (OSError, ValueError):
+            pass
+        finally:
+            sock.close()
+
+    def _respond(self, sock: socket.socket, fault: str | None, request: bytes) -> None:
+        if fault == "http_401":
+            sock.sendall(_http_response(401, "Unauthorized", b""))
+            return
+        if fault == "http_503":
+            sock.sendall(_http_response(503, "Service Unavailable", b""))
+            return
+
+        response = self.server.forward(request)
+        head, _, body = response.partition(b"\r\n\r\n")
+        head += b"\r\n\r\n"
+        if fault == "bad_json" and body:
+            status_line = head.split(b"\r\n", 1)[0].decode(errors="replace")
+            _, status, reason = (status_line.split(" ", 2) + [""])[:3]
+            sock.sendall(_http_response(int(status), reason, body[: len(body) // 2]))
+        elif fault == "slowloris":
+            for index in range(min(SLOWLORIS_BYTES, len(response))):
+                sock.sendall(response[index:index + 1])
+                time.sleep(SLOWLORIS_INTERVAL)
+            _hold(sock)
+        elif fault in ("truncate", "reset"):
+            sock.sendall(head + body[: len(body) // 2])
+            if fault == "reset":
+                _reset(sock)
+        else:
+            sock.sendall(response)
+
+
+def serve(
+    port: int,
+    plan: FaultPlan,
+    upstream: tuple[str, int] | None = None,
+    upstream_tls: bool = True,
+    use_tls: bool = True,
+    ready=None,
+) -> None:
+    """Démarre la borne factice (sans ``upstream``) et le proxy, jusqu'à interruption.
+
+    ``ready`` (``multiprocessing`` Connection) reçoit ``(port, tls)`` une fois le proxy à l'écoute.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        context = None
+        certificate = generate_certificate(Path(directory)) if use_tls else None
+        if certificate is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(*certificate)
+
+        box = None
+        if upstream is None:
+            box = FakePowerBox(("127.0.0.1", 0))
+            threading.Thread(target=box.serve_forever, daemon=True).start()
+            upstream, upstream_tls = box.server_address[:2], False
+
+        proxy = FaultProxy(("127.0.0.1", port), upstream, plan, context, upstream_tls)
+        if ready is not None:
+            ready.send((proxy.server_address[1], context is not None))
+        try:
+            proxy.serve_forever()
+        finally:
+            proxy.server_close()
+            if box is not None:
+                box.shutdown()
+                box.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--upstream", help="Borne réelle hôte:port (borne factice par défaut)")
+    parser.add_argument("--rate", type=float, default=0.2, help="Probabilité de panne par connexion")
+    parser.add_argument("--faults", default=",".join(FAULTS), help=f"Pannes à injecter parmi {', '.join(FAULTS)}")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--plain", action="store_true", help="HTTP simple côté client")
+    args = parser.parse_args()
+
+    faults = tuple(fault for fault in args.faults.split(",") if fault)
+    unknown = [fault for fault in faults if fault not in FAULTS]
+    if unknown:
+        parser.error(f"Panne inconnue: {', '.join(unknown)}")
+    upstream = None
+    if args.upstream:
+        host, _, port = args.upstream.rpartition(":")
+        upstream = (host, int(port))
+
+    plan = FaultPlan(args.rate, faults, args.seed)
+    scheme = "http" if args.plain else "https"
+    print(f"Proxy sur {scheme}://127.0.0.1:{args.port}{API_PREFIX} ({args.rate:.0%} de pannes: {', '.join(faults)})")
+    try:
+        serve(args.port, plan, upstream, use_tls=not args.plain)
+    except KeyboardInterrupt:
+        print(json.dumps(fault_counts(plan.counters), indent=2))
+
+
+if __name__ == "__main__":
+    main()
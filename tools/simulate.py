@@ -0,0 +1,392 @@
+"""Simulateur de journées de fonctionnement en temps virtuel.
+
+Rejoue des scénarios scriptés (coupures, rafales de 503, expiration de
+token, redémarrages, Wi-Fi instable) contre une PowerBox simulée, avec le
+vrai ``PowerBoxAPIClient``, le vrai limiteur et la même politique
+d'intervalle que les coordinateurs. Une journée de 24 h se joue en quelques
+secondes.
+
+Usage :
+    python tools/simulate.py                  # tous les scénarios, 24 h
+    python tools/simulate.py outage reboot    # scénarios choisis
+    python tools/simulate.py --hours 72 --seed 3 --json
+
+Seul ``requests`` est nécessaire (Home Assistant n'est pas importé).
+"""
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, field
+from datetime import timedelta
+import json
+import logging
+import random
+
+import requests
+
+from _component import load_component
+
+# Horodatage Unix de l'instant 0 de la simulation
+SIM_EPOCH = 1_767_225_600.0  # 2026-01-01 00:00 UTC
+BASE_URL = "https://powerbox.sim"
+HOUR = 3600
+
+api, const, limiter, scheduling = load_component("api", "const", "limiter", "scheduling")
+
+
+class VirtualClock:
+    """Horloge virtuelle : chaque attente fait avancer le temps instantanément."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def time(self) -> float:
+        return SIM_EPOCH + self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def wait(self, waitable, timeout: float | None) -> bool:
+        is_set = getattr(waitable, "is_set", None)
+        if is_set is not None and is_set():
+            return True
+        if timeout is None:
+            raise RuntimeError("Attente sans délai impossible en temps virtuel")
+        self.now += timeout
+        return False
+
+    def advance_to(self, instant: float) -> None:
+        self.now = max(self.now, instant)
+
+
+@dataclass
+class Fault:
+    """Panne active sur ``[start, end[`` (secondes depuis le début)."""
+
+    start: float
+    end: float
+    kind: str  # "offline", "refused", "http_503", "reboot", "lossy", "slow"
+    probability: float = 1.0
+    latency: float = 0.0  # temps de réponse pendant une panne "slow"
+
+
+@dataclass
+class Scenario:
+    """Scénario scripté."""
+
+    name: str
+    description: str
+    faults: list[Fault] = field(default_factory=list)
+    token_ttl: float = 24 * HOUR
+
+
+def _response(status: int, payload=None) -> requests.Response:
+    """Construit une vraie ``requests.Response`` (même comportement que la borne)."""
+    response = requests.Response()
+    response.status_code = status
+    response.reason = {200: "OK", 401: "Unauthorized", 503: "Service Unavailable"}.get(status, "")
+    response.url = BASE_URL
+    response._content = json.dumps(payload).encode() if payload is not None else b""
+    return response
+
+
+class SimulatedPowerBox:
+    """PowerBox simulée : tokens à durée de vie limitée et pannes scriptées."""
+
+    latency = 0.2  # secondes par requête servie
+
+    def __init__(self, clock: VirtualClock, scenario: Scenario, rng: random.Random) -> None:
+        self.clock = clock
+        self.scenario = scenario
+        self.rng = rng
+        self.tokens: dict[str, float] = {}
+        self.requests: dict[str, int] = {}
+        self._token_sequence = 0
+        self._rebooted: set[int] = set()
+
+    def session(self) -> "SimulatedSession":
+        """Fabrique de sessions injectée dans le client."""
+        return SimulatedSession(self)
+
+    def _active_fault(self) -> Fault | None:
+        now = self.clock.now
+        for index, fault in enumerate(self.scenario.faults):
+            if fault.kind == "reboot" and now >= fault.end and index not in self._rebooted:
+                # Au redémarrage, la borne oublie tous les tokens émis
+                self._rebooted.add(index)
+                self.tokens.clear()
+            if fault.start <= now < fault.end and self.rng.random() < fault.probability:
+                return fault
+        return None
+
+    def handle(self, method: str, endpoint: str, headers: dict, timeout) -> requests.Response:
+        """Traite une requête HTTP du client."""
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        fault = self._active_fault()
+        if fault is not None and fault.kind in ("offline", "reboot", "lossy"):
+            self.clock.now += connect_timeout
+            raise requests.exceptions.ConnectTimeout(f"Délai dépassé ({fault.kind})")
+        if fault is not None and fault.kind == "refused":
+            self.clock.now += 0.01
+            raise requests.exceptions.ConnectionError("Connexion refusée")
+
+        latency = fault.latency if fault is not None and fault.kind == "slow" else self.latency
+        if latency > read_timeout:
+            self.clock.now += read_timeout
+            raise requests.exceptions.ReadTimeout(f"Pas de réponse en {read_timeout}s")
+        self.clock.now += latency
+        if fault is not None and fault.kind == "http_503":
+            return _response(503)
+
+        if method == "POST" and endpoint == const.ENDPOINT_AUTH:
+            self._token_sequence += 1
+            token = f"token-{self._token_sequence}"
+            self.tokens[token] = self.clock.now
+            return _response(200, {"id_token": token})
+
+        token = headers.get("authorization", "").removeprefix("Bearer ")
+        issued = self.tokens.get(token)
+        if issued is None or self.clock.now - issued > self.scenario.token_ttl:
+            return _response(401)
+        if endpoint == const.ENDPOINT_METERS:
+            return _response(200, self._meters())
+        if endpoint == const.ENDPOINT_CONFIGS:
+            return _response(200, [
+                {"module_name": "EVSE", "config_name": "MaxCurrent", "config_value": "32"}
+            ])
+        return _response(404)
+
+    def _meters(self) -> list:
+        timestamp = int(self.clock.time() * 1000)
+        return [{
+            "Model": const.METER_MODEL_VIRTUAL,
+            "Connected": "true",
+            "Values": [
+                {"Name": "ActivePower_W", "Value": 7200, "Timestamp": timestamp},
+            ],
+        }]
+
+
+class SimulatedSession:
+    """Remplace ``requests.Session`` en routant vers la borne simulée."""
+
+    def __init__(self, box: SimulatedPowerBox) -> None:
+        self.box = box
+        self.headers: dict = {}
+
+    def _endpoint(self, url: str) -> str:
+        return url.removeprefix(f"{BASE_URL}/")
+
+    def post(self, url, json=None, headers=None, verify=True, timeout=None):
+        return self.box.handle("POST", self._endpoint(url), headers or {}, timeout)
+
+    def get(self, url, headers=None, verify=True, timeout=None):
+        return self.box.handle("GET", self._endpoint(url), headers or {}, timeout)
+
+    def close(self) -> None:
+        pass
+
+
+class SimulatedCoordinator:
+    """Reproduit la boucle d'un coordinateur : intervalle, fetch, replanification.
+
+    Comme dans Home Assistant, l'intervalle est fixé au début du cycle ; pour
+    le temps réel, il vise la prochaine bascule de l'horloge murale.
+    """
+
+    def __init__(self, client, endpoint: str, priority: int, scan_interval: float, adaptive: bool) -> None:
+        self.client = client
+        self.endpoint = endpoint
+        self.priority = priority
+        self.scan_interval = timedelta(seconds=scan_interval)
+        self.adaptive = adaptive
+        self.next_run = 0.0
+        self.cycles = 0
+        self.failures = 0
+        self.successes: list[float] = []
+
+    def run(self, clock: VirtualClock) -> None:
+        interval = self.scan_interval
+        if self.adaptive:
+            # Coordinateur temps réel : backoff puis calage sur l'horloge murale
+            interval = scheduling.realtime_interval(interval, self.client.get_consecutive_errors())
+            interval = scheduling.aligned_interval(clock.time(), interval)
+        started = clock.now
+        self.cycles += 1
+        try:
+            self.client.fetch_data(self.endpoint, self.priority)
+            self.successes.append(clock.now)
+        except api.PowerBoxApiError:
+            self.failures += 1
+        # Délai compté depuis le début du cycle, comme le calage du coordinateur
+        self.next_run = max(clock.now, started + interval.total_seconds())
+
+
+def _staleness(successes: list[float], duration: float, threshold: float) -> tuple[float, float]:
+    """Âge maximal des données et temps passé avec des données plus vieilles que ``threshold``."""
+    max_age = 0.0
+    stale_time = 0.0
+    previous = 0.0
+    for instant in [*successes, duration]:
+        gap = instant - previous
+        max_age = max(max_age, gap)
+        stale_time += max(0.0, gap - threshold)
+        previous = instant
+    return max_age, stale_time
+
+
+def _recovery_times(successes: list[float], faults: list[Fault]) -> list[float | None]:
+    """Délai entre la fin de chaque panne et le premier succès suivant."""
+    recoveries = []
+    for fault in faults:
+        after = [instant for instant in successes if instant >= fault.end]
+        recoveries.append(after[0] - fault.end if after else None)
+    return recoveries
+
+
+def run_scenario(scenario: Scenario, hours: float, seed: int, scan_interval: float) -> dict:
+    """Joue un scénario et retourne son rapport."""
+    clock = VirtualClock()
+    box = SimulatedPowerBox(clock, scenario, random.Random(seed))
+    client = api.PowerBoxAPIClient(
+        BASE_URL, "sim", "sim", False,
+        clock=clock,
+        session_factory=box.session,
+        limiter=limiter.TokenBucketLimiter(clock=clock),
+    )
+    client.configure(const.DEFAULT_TIMEOUT, const.MAX_RETRIES)
+
+    realtime = SimulatedCoordinator(
+        client, const.ENDPOINT_METERS, limiter.PRIORITY_REALTIME, scan_interval, adaptive=True
+    )
+    config = SimulatedCoordinator(
+        client, const.ENDPOINT_CONFIGS, limiter.PRIORITY_CONFIG,
+        const.DEFAULT_SCAN_INTERVAL_CONFIG, adaptive=False,
+    )
+
+    duration = hours * HOUR
+    while True:
+        coordinator = min((realtime, config), key=lambda item: item.next_run)
+        if coordinator.next_run >= duration:
+            break
+        clock.advance_to(coordinator.next_run)
+        coordinator.run(clock)
+
+    stats = client.get_stats()
+    max_age, stale_time = _staleness(realtime.successes, duration, 2 * scan_interval)
+    recoveries = [
+        None if value is None else round(value, 1)
+        for value in _recovery_times(
+            realtime.successes, [fault for fault in scenario.faults if fault.end < duration]
+        )
+    ]
+    return {
+        "scenario": scenario.name,
+        "hours": hours,
+        "http_requests": sum(box.requests.values()),
+        "requests_by_endpoint": dict(sorted(box.requests.items())),
+        "auth": stats["auth"],
+        "errors": stats["errors"],
+        "retries": stats["retries"],
+        "realtime_cycles": realtime.cycles,
+        "realtime_failures": realtime.failures,
+        "config_failures": config.failures,
+        "staleness_max_s": round(max_age, 1),
+        "stale_time_s": round(stale_time, 1),
+        "availability_pct": round(100 * (1 - stale_time / duration), 2),
+        "time_to_recover_s": recoveries,
+        "timeouts": {
+            endpoint: list(values["timeouts"]) for endpoint, values in client.get_timeout_stats().items()
+        },
+    }
+
+
+def build_scenarios(hours: float) -> dict[str, Scenario]:
+    """Scénarios disponibles (les pannes au-delà de la durée simulée sont ignorées)."""
+    day = 24 * HOUR
+    repeat = range(int(hours * HOUR // day) + 1)
+
+    def daily(
+        start_h: float, duration_s: float, kind: str, probability: float = 1.0, latency: float = 0.0
+    ) -> list[Fault]:
+        return [
+            Fault(n * day + start_h * HOUR, n * day + start_h * HOUR + duration_s, kind, probability, latency)
+            for n in repeat
+        ]
+
+    scenarios = [
+        Scenario("nominal", "Aucune panne"),
+        Scenario("outage", "Borne injoignable 2 h par jour", daily(10, 2 * HOUR, "offline")),
+        Scenario(
+            "storm_503", "Rafales de 503 de 30 min",
+            daily(8, 1800, "http_503") + daily(14, 1800, "http_503") + daily(20, 1800, "http_503"),
+        ),
+        Scenario("token_expiry", "Tokens valables 15 min", token_ttl=900),
+        Scenario(
+            "reboot", "Redémarrages de 2 min (tokens perdus)",
+            daily(3, 120, "reboot") + daily(15, 120, "reboot"),
+        ),
+        Scenario(
+            "slow_box", "Réponses en 6 s pendant 1 h",
+            daily(12, HOUR, "slow", latency=6.0),
+        ),
+        Scenario(
+            "flaky_wifi", "10 % de paquets perdus et micro-coupures",
+            daily(0, day, "lossy", 0.1) + daily(7, 300, "refused") + daily(19, 300, "refused"),
+            token_ttl=2 * HOUR,
+        ),
+    ]
+    return {scenario.name: scenario for scenario in scenarios}
+
+
+def _print_report(report: dict) -> None:
+    recoveries = [value for value in report["time_to_recover_s"] if value is not None]
+    never = report["time_to_recover_s"].count(None)
+    print(f"== {report['scenario']} ({report['hours']:g} h)")
+    print(f"   requêtes HTTP      {report['http_requests']}  {report['requests_by_endpoint']}")
+    print(f"   authentifications  {report['auth']}")
+    print(f"   erreurs / retries  {report['errors']} / {report['retries']}")
+    print(f"   cycles temps réel  {report['realtime_cycles']} (échecs {report['realtime_failures']})")
+    print(f"   fraîcheur          max {report['staleness_max_s']}s, "
+          f"périmée {report['stale_time_s']}s, disponibilité {report['availability_pct']}%")
+    print(f"   timeouts (c, l)    {report['timeouts']}")
+    if recoveries or never:
+        print(f"   reprise            max {max(recoveries, default=0)}s, "
+              f"moyenne {sum(recoveries) / len(recoveries) if recoveries else 0:.1f}s"
+              + (f", {never} sans reprise" if never else ""))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help="Scénarios à jouer (tous par défaut)")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scan-interval", type=float, default=const.DEFAULT_SCAN_INTERVAL_REALTIME)
+    parser.add_argument("--json", action="store_true", help="Rapport JSON")
+    parser.add_argument("--verbose", action="store_true", help="Logs du client")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL)
+    available = build_scenarios(args.hours)
+    names = args.scenarios or list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        parser.error(f"Scénario inconnu: {', '.join(unknown)} (disponibles: {', '.join(available)})")
+
+    reports = []
+    for name in names:
+        scenario = available[name]
+        duration = args.hours * HOUR
+        scenario.faults = [fault for fault in scenario.faults if fault.start < duration]
+        reports.append(run_scenario(scenario, args.hours, args.seed, args.scan_interval))
+
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+    else:
+        for report in reports:
+            _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Endurance du client HTTP à travers le proxy d'injection de pannes.
+
+La borne factice et le proxy de ``tools/faultproxy.py`` tournent dans un
+processus séparé ; le vrai ``PowerBoxAPIClient`` enchaîne des milliers de
+cycles (compteurs et configuration en parallèle depuis un pool de threads,
+comme l'executor de Home Assistant). Le client est régulièrement reconstruit
+pendant une requête (``shutdown`` puis nouveau client) et des coupures
+franches (RST) ou silencieuses (TLS bloqué) sont suivies d'un retour à la
+normale.
+
+Après une phase de chauffe, vérifie que restent bornés :
+  - le délai de reprise après chaque coupure ;
+  - les descripteurs de fichiers ouverts (Linux, macOS) ;
+  - le nombre de threads ;
+  - la mémoire allouée (tracemalloc) ;
+  - les sessions HTTP jamais fermées.
+
+Usage :
+    python tools/soak.py                                  # 2000 cycles, environ 7 minutes
+    python tools/soak.py --cycles 10000 --rate 0.2 --seed 3 --json
+    python tools/soak.py --faults reset,truncate,bad_json --plain
+
+Code de sortie 1 si une borne est dépassée. Seul ``requests`` est nécessaire.
+"""
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+import requests
+
+from _component import load_component
+from faultproxy import (
+    API_PREFIX,
+    FAULTS,
+    MODE_CHAOS,
+    MODE_HEALTHY,
+    MODE_OUTAGE_RESET,
+    MODE_OUTAGE_STALL,
+    FaultPlan,
+    fault_counts,
+    serve,
+)
+
+api, const, limiter = load_component("api", "const", "limiter")
+
+WARMUP_CYCLES = 50
+OUTAGE_FAILURES = 3  # cycles en échec avant le retour de la borne
+RETRY_WAIT_MAX = 0.01  # les attentes entre tentatives sont écourtées
+FD_MARGIN = 8
+THREAD_MARGIN = 0
+MEMORY_MARGIN = 2 * 1024 * 1024
+
+
+class FastRetryClock:
+    """Temps réel, mais attentes entre tentatives écourtées.
+
+    Seuls les timeouts réseau coûtent du temps réel : les backoffs du client
+    ne dominent pas la durée de l'essai.
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def wait(self, waitable, timeout: float | None) -> bool:
+        if isinstance(waitable, threading.Event):
+            timeout = RETRY_WAIT_MAX if timeout is None else min(timeout, RETRY_WAIT_MAX)
+        return waitable.wait(timeout)
+
+
+class TrackedSession(requests.Session):
+    """Session qui compte ses créations et ses fermetures."""
+
+    opened = 0
+    closed = 0
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._tracked_closed = False
+        with TrackedSession._lock:
+            TrackedSession.opened += 1
+
+    def close(self) -> None:
+        with TrackedSession._lock:
+            if not self._tracked_closed:
+                self._tracked_closed = True
+                TrackedSession.closed += 1
+        super().close()
+
+    @classmethod
+    def unclosed(cls) -> int:
+        return cls.opened - cls.closed
+
+
+def open_fds() -> int | None:
+    """Descripteurs de fichiers ouverts par le processus, ou None si inconnu."""
+    for path in ("/proc/self/fd", "/dev/fd"):
+        if os.path.isdir(path):
+            return len(os.listdir(path))
+    return None
+
+
+def _serve_proxy(rate, faults, seed, mode, counters, use_tls, ready) -> None:
+    """Cible du processus proxy (le plan de pannes y est construit)."""
+    serve(0, FaultPlan(rate, faults, seed, mode, counters), use_tls=use_tls, ready=ready)
+
+
+class Soak:
+    """Boucle de cycles contre le proxy."""
+
+    def __init__(self, base_url: str, args: argparse.Namespace, mode) -> None:
+        self.base_url = base_url
+        self.args = args
+        self.mode = mode
+        self.rng = random.Random(args.seed)
+        self.clock = FastRetryClock()
+        # Limiteur propre à l'essai, assez large pour ne jamais ralentir les cycles
+        self.limiter = limiter.TokenBucketLimiter(rate=1000, capacity=1000, clock=self.clock)
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="executor")
+        self.outcomes: Counter[str] = Counter()
+        self.rebuilds = 0
+        self.client = self._new_client()
+
+    def _new_client(self):
+        client = api.PowerBoxAPIClient(
+            self.base_url, "installer", "secret", False,
+            clock=self.clock, session_factory=TrackedSession, limiter=self.limiter,
+        )
+        client.configure(timeout=self.args.timeout, max_retries=self.args.max_retries)
+        return client
+
+    def cycle(self, rebuild: bool = False) -> bool:
+        """Un rafraîchissement des deux coordinateurs ; True si tout a réussi."""
+        client = self.client
+        futures = [
+            self.executor.submit(client.fetch_data, const.ENDPOINT_METERS, limiter.PRIORITY_REALTIME),
+            self.executor.submit(client.fetch_data, const.ENDPOINT_CONFIGS, limiter.PRIORITY_CONFIG),
+        ]
+        if rebuild:
+            # Fermeture pendant la requête, comme un rechargement de l'entrée
+            time.sleep(self.rng.uniform(0, 0.005))
+            client.shutdown()
+            self.client = self._new_client()
+            self.rebuilds += 1
+        success = True
+        for future in futures:
+            try:
+                future.result()
+                self.outcomes["ok"] += 1
+            except api.PowerBoxApiError as err:
+                success = False
+                cause = err.__cause__
+                self.outcomes[type(cause).__name__ if cause is not None else str(err)] += 1
+            except Exception as err:  # noqa: BLE001 - toute autre exception est un défaut du client
+                success = False
+                self.outcomes[f"unexpected {type(err).__name__}"] += 1
+        return success
+
+    def outage(self, outage_mode: int) -> float | None:
+        """Coupure jusqu'à ``OUTAGE_FAILURES`` cycles en échec, puis délai de reprise (s)."""
+        self.mode.value = outage_mode
+        failures = 0
+        for _ in range(OUTAGE_FAILURES * 10):
+            if not self.cycle():
+                failures += 1
+                if failures >= OUTAGE_FAILURES:
+                    break
+        self.mode.value = MODE_HEALTHY
+        started = time.monotonic()
+        while time.monotonic() - started < self.args.recovery_max * 10:
+            if self.cycle():
+                return round(time.monotonic() - started, 3)
+        return None
+
+    def close(self) -> None:
+        self.client.shutdown()
+        self.executor.shutdown(wait=True)
+        self.client.close()
+
+
+def _measure() -> dict:
+    gc.collect()
+    return {
+        "fds": open_fds(),
+        "threads": threading.active_count(),
+        "memory": tracemalloc.get_traced_memory()[0],
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    faults = tuple(fault for fault in args.faults.split(",") if fault)
+    mode = multiprocessing.Value("i", MODE_HEALTHY, lock=False)
+    counters = multiprocessing.Array("i", len(FAULTS) + 1, lock=False)
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_serve_proxy,
+        args=(args.rate, faults, args.seed, mode, counters, not args.plain, sender),
+        daemon=True,
+    )
+    process.start()
+    try:
+        if not receiver.poll(30):
+            raise RuntimeError("Le proxy n'a pas démarré")
+        port, tls = receiver.recv()
+        base_url = f"{'https' if tls else 'http'}://127.0.0.1:{port}{API_PREFIX}"
+        return _run_soak(args, base_url, tls, mode, counters)
+    finally:
+        process.terminate()
+        process.join(5)
+
+
+def _run_soak(args, base_url, tls, mode, counters) -> dict:
+    tracemalloc.start()
+    started = time.monotonic()
+    soak = Soak(base_url, args, mode)
+    warmup_failures = sum(not soak.cycle() for _ in range(WARMUP_CYCLES))
+    baseline = _measure()
+
+    mode.value = MODE_CHAOS
+    recoveries: list[float | None] = []
+    outage_modes = [MODE_OUTAGE_RESET, MODE_OUTAGE_STALL]
+    cycle_failures = 0
+    for index in range(1, args.cycles + 1):
+        if not soak.cycle(rebuild=index % args.rebuild_every == 0):
+            cycle_failures += 1
+        if index % args.outage_every == 0:
+            recoveries.append(soak.outage(outage_modes[len(recoveries) % 2]))
+            mode.value = MODE_CHAOS
+
+    # Retour à la normale : plus aucune panne, les compteurs doivent revenir au niveau de base
+    mode.value = MODE_HEALTHY
+    drain_failures = sum(not soak.cycle() for _ in range(WARMUP_CYCLES))
+    final = _measure()
+    live_unclosed = TrackedSession.unclosed()
+    soak.close()
+    tracemalloc.stop()
+
+    checks = {
+        "warmup": warmup_failures == 0,
+        "recovery": all(value is not None and value <= args.recovery_max for value in recoveries),
+        "drain": drain_failures == 0,
+        "fds": final["fds"] is None or final["fds"] <= baseline["fds"] + FD_MARGIN,
+        "threads": final["threads"] <= baseline["threads"] + THREAD_MARGIN,
+        "memory": final["memory"] <= baseline["memory"] + MEMORY_MARGIN,
+        # Seule la session du client encore actif peut rester ouverte
+        "sessions": live_unclosed <= 1 and TrackedSession.unclosed() == 0,
+        "unexpected": not any(name.startswith("unexpected") for name in soak.outcomes),
+    }
+    return {
+        "tls": tls,
+        "cycles": args.cycles,
+        "duration_s": round(time.monotonic() - started, 1),
+        "cycle_failures": cycle_failures,
+        "rebuilds": soak.rebuilds,
+        "outcomes": dict(soak.outcomes.most_common()),
+        "faults": fault_counts(counters),
+        "time_to_recover_s": recoveries,
+        "baseline": baseline,
+        "final": final,
+        "sessions": {"opened": TrackedSession.opened, "unclosed": TrackedSession.unclosed()},
+        "client": soak.client.get_stats(),
+        "checks": checks,
+        "passed": all(checks.values()),
+    }
+
+
+def _print_report(report: dict) -> None:
+    baseline, final = report["baseline"], report["final"]
+    print(f"== {report['cycles']} cycles en {report['duration_s']}s ({'TLS' if report['tls'] else 'HTTP'})")
+    print(f"   pannes injectées   {report['faults']}")
+    print(f"   résultats          {report['outcomes']}")
+    print(f"   cycles en échec    {report['cycle_failures']}, reconstructions {report['rebuilds']}")
+    print(f"   reprise            {report['time_to_recover_s']}")
+    print(f"   descripteurs       {baseline['fds']} -> {final['fds']}")
+    print(f"   threads            {baseline['threads']} -> {final['threads']}")
+    print(f"   mémoire            {baseline['memory'] / 1024:.0f} -> {final['memory'] / 1024:.0f} Kio")
+    print(f"   sessions           {report['sessions']}")
+    failed = [name for name, passed in report["checks"].items() if not passed]
+    print(f"   {'ÉCHEC: ' + ', '.join(failed) if failed else 'OK'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=0.05, help="Probabilité de panne par connexion")
+    parser.add_argument("--faults", default=",".join(FAULTS), help=f"Pannes parmi {', '.join(FAULTS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=2.0, help="Timeout de lecture maximal du client")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--rebuild-every", type=int, default=25, help="Reconstruction du client tous les N cycles")
+    parser.add_argument("--outage-every", type=int, default=500, help="Coupure tous les N cycles")
+    parser.add_argument("--recovery-max", type=float, default=2.0, help="Délai de reprise maximal (s)")
+    parser.add_argument("--plain", action="store_true", help="HTTP simple (sans TLS)")
+    parser.add_argument("--json", action="store_true", help="Rapport JSON")
+    parser.add_argument("--verbose", action="store_true", help="Logs du client")
+    args = parser.parse_args()
+
+    unknown = [fault for fault in args.faults.split(",") if fault and fault not in FAULTS]
+    if unknown:
+        parser.error(f"Panne inconnue: {', '.join(unknown)}")
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL)
+    # Le proxy présente un certificat auto-signé, comme la borne
+    requests.packages.urllib3.disable_warnings(
+        requests.packages.urllib3.exceptions.InsecureRequestWarning
+    )
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        _print_report(report)
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Stockage SQLite des séries de la PowerBox, à rétention par paliers.
+
+- ``raw`` : chaque échantillon, conservé 1 jour ;
+- ``rollup_1m`` : agrégats par minute (nombre, somme, min, max, dernière
+  valeur), conservés 90 jours ;
+- ``rollup_1h`` : agrégats par heure, conservés indéfiniment.
+
+Les agrégats sont maintenus incrémentalement à l'insertion (UPSERT), sans
+jamais relire les échantillons bruts. La purge des paliers expirés est
+faite périodiquement par ``prune``.
+"""
+from __future__ import annotations
+
+import sqlite3
+import time
+
+RAW_RETENTION = 24 * 3600  # secondes
+MINUTE_RETENTION = 90 * 24 * 3600  # secondes
+
+# Palier -> (table, largeur d'un intervalle en secondes)
+TIERS = {
+    "1m": ("rollup_1m", 60),
+    "1h": ("rollup_1h", 3600),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (host, name)
+);
+CREATE TABLE IF NOT EXISTS raw (
+    series_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+"""
+
+_ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    series_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    last_ts REAL NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (series_id, bucket)
+) WITHOUT ROWID;
+"""
+
+_ROLLUP_UPSERT = """
+INSERT INTO {table} (series_id, bucket, count, sum, min, max, last_ts, last)
+VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT (series_id, bucket) DO UPDATE SET
+    count = count + 1,
+    sum = sum + excluded.sum,
+    min = min(min, excluded.min),
+    max = max(max, excluded.max),
+    last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+    last_ts = max(last_ts, excluded.last_ts)
+"""
+
+
+class TimeSeriesStore:
+    """Séries temporelles par (borne, valeur) avec agrégats incrémentaux."""
+
+    def __init__(self, path: str) -> None:
+        """Ouvre (ou crée) la base."""
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        for table, _width in TIERS.values():
+            self._db.executescript(_ROLLUP_SCHEMA.format(table=table))
+        self._series: dict[tuple[str, str], int] = {
+            (host, name): series_id
+            for series_id, host, name in self._db.execute("SELECT id, host, name FROM series")
+        }
+        # Dernier horodatage inséré par série : les relectures d'une valeur inchangée sont ignorées
+        self._last_ts: dict[int, float] = dict(
+            self._db.execute("SELECT series_id, max(ts) FROM raw GROUP BY series_id")
+        )
+
+    def _series_id(self, host: str, name: str) -> int:
+        """Identifiant d'une série (créée au premier échantillon)."""
+        key = (host, name)
+        if key not in self._series:
+            cursor = self._db.execute("INSERT INTO series (host, name) VALUES (?, ?)", key)
+            self._series[key] = cursor.lastrowid
+        return self._series[key]
+
+    def add_samples(self, host: str, samples: list[tuple[str, float, float]]) -> int:
+        """Ajoute des échantillons (nom, horodatage, valeur) et retourne le nombre inséré."""
+        inserted = 0
+        with self._db:
+            for name, ts, value in samples:
+                series_id = self._series_id(host, name)
+                if ts <= self._last_ts.get(series_id, float("-inf")):
+                    continue
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO raw (series_id, ts, value) VALUES (?, ?, ?)",
+                    (series_id, ts, value),
+                )
+                if cursor.rowcount != 1:
+                    continue
+                self._last_ts[series_id] = ts
+                for table, width in TIERS.values():
+                    self._db.execute(
+                        _ROLLUP_UPSERT.format(table=table),
+                        (series_id, int(ts // width) * width, value, value, value, ts, value),
+                    )
+                inserted += 1
+        return inserted
+
+    def prune(self, now: float | None = None) -> dict[str, int]:
+        """Supprime les échantillons bruts et agrégats minute expirés."""
+        now = time.time() if now is None else now
+        with self._db:
+            raw = self._db.execute("DELETE FROM raw WHERE ts < ?", (now - RAW_RETENTION,)).rowcount
+            minutes = self._db.execute(
+                "DELETE FROM rollup_1m WHERE bucket < ?", (now - MINUTE_RETENTION,)
+            ).rowcount
+        return {"raw": raw, "1m": minutes}
+
+    def series(self) -> list[tuple[str, str]]:
+        """Séries connues (borne, valeur)."""
+        return sorted(self._series)
+
+    def query(self, host: str, name: str, start: float, end: float, tier: str | None = None) -> list[tuple]:
+        """Points d'une série sur ``[start, end[``.
+
+        Sans palier imposé, le plus fin encore disponible sur toute la plage
+        est choisi. Retourne ``(ts, valeur)`` pour le brut, et
+        ``(début d'intervalle, nombre, moyenne, min, max, dernière valeur)``
+        pour les agrégats.
+        """
+        series_id = self._series.get((host, name))
+        if series_id is None:
+            return []
+        if tier is None:
+            age = time.time() - start
+            tier = "raw" if age <= RAW_RETENTION else "1m" if age <= MINUTE_RETENTION else "1h"
+        if tier == "raw":
+            return self._db.execute(
+                "SELECT ts, value FROM raw WHERE series_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (series_id, start, end),
+            ).fetchall()
+        table, width = TIERS[tier]
+        return self._db.execute(
+            f"SELECT bucket, count, sum / count, min, max, last FROM {table} "
+            "WHERE series_id = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+            (series_id, int(start // width) * width, end),
+        ).fetchall()
+
+    def close(self) -> None:
+        """Ferme la base."""
+        self._db.close()